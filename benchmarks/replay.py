@@ -0,0 +1,213 @@
+"""Record an editor session, or replay a recording headlessly and report frame times, allocations and memory"""
+from typing import Any, Dict, List, Optional
+import argparse
+import contextlib
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def record(path: str) -> None:
+    """Run the editor normally (with a display) and write every event batch to path"""
+    from src.gui.main_window import MainWindow
+    window = MainWindow(record_path=os.path.abspath(path))
+    window.run()
+    window.close_recorder()
+
+
+def prepare_window(header: Dict[str, Any]):
+    """Headless MainWindow in a scratch directory, in the state the recording started from"""
+    import pygame
+    from src.gui.main_window import MainWindow
+    from src.export.edit_journal import restore_canvas_state
+
+    workdir = tempfile.mkdtemp(prefix="replay-")
+    backgrounds = os.path.join(REPO_ROOT, "track_backgrounds")
+    if os.path.isdir(backgrounds):
+        os.symlink(backgrounds, os.path.join(workdir, "track_backgrounds"))
+    os.chdir(workdir)
+
+    window = MainWindow(project_dir=os.path.join(workdir, "project"))
+    if list(header['window']) != [window.width, window.height]:
+        print(f"Warning: recorded at {header['window']}, replaying at {[window.width, window.height]}")
+    canvas = window.track_canvas
+
+    # Let the startup background finish first, so it doesn't land mid-replay
+    deadline = time.perf_counter() + 30.0
+    while canvas.background_loading and time.perf_counter() < deadline:
+        canvas.update()
+        time.sleep(0.001)
+    if header.get('background') and getattr(canvas, 'background_image_path', None) != header['background']:
+        if os.path.exists(header['background']):
+            canvas.set_background(header['background'], *canvas.read_background(header['background']))
+        else:
+            print(f"Warning: recorded background {header['background']} not found")
+
+    journal, canvas.journal = canvas.journal, None
+    restore_canvas_state(canvas, header['canvas'])
+    canvas.journal = journal
+    canvas.zoom_level = header['zoom_level']
+    canvas.offset = list(header['offset'])
+    window.draw()
+    pygame.event.clear()
+    return window
+
+
+def replay(path: str, loops: int = 1, trace_memory: bool = False) -> Dict[str, Any]:
+    """
+    Feed the recorded batches to a headless MainWindow, one loop iteration
+    each, as fast as possible. Returns per-frame records and a summary.
+    """
+    import pygame
+    from src.gui.event_recorder import load_recording
+
+    header, batches = load_recording(path)
+    window = prepare_window(header)
+
+    # The canvas and control panel read the mouse position while handling
+    # events; answer with the position recorded for the current batch
+    mouse = {'pos': (0, 0)}
+    real_get_pos = pygame.mouse.get_pos
+    pygame.mouse.get_pos = lambda: mouse['pos']
+
+    if trace_memory:
+        tracemalloc.start()
+    frames = []
+    devnull = open(os.devnull, 'w')
+    try:
+        # The canvas logs every segment; keep the output readable (printing still costs the same)
+        with contextlib.redirect_stdout(devnull):
+            replay_frames(window, batches, loops, trace_memory, mouse, frames)
+    finally:
+        devnull.close()
+        pygame.mouse.get_pos = real_get_pos
+        if trace_memory:
+            tracemalloc.stop()
+        window.exporter.shutdown()
+        window.journal.close()
+
+    return {'recording': os.path.abspath(path), 'loops': loops, 'trace_memory': trace_memory,
+            'summary': summarize(frames), 'frames': frames}
+
+
+def replay_frames(window, batches: List[Dict[str, Any]], loops: int, trace_memory: bool,
+                  mouse: Dict[str, Any], frames: List[Dict[str, Any]]) -> None:
+    """Run the loop body of MainWindow.run once per batch, appending one record per frame"""
+    import pygame
+    for loop in range(loops):
+        for batch in batches:
+            events = batch['events']
+            # Leaving is not part of the measurement: QUIT saves and ESC exits
+            if any(event.type == pygame.QUIT or
+                   (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE) for event in events):
+                break
+            mouse['pos'] = tuple(batch['mouse'])
+            if trace_memory:
+                tracemalloc.reset_peak()
+            blocks = sys.getallocatedblocks()
+
+            start = time.perf_counter()
+            window.profiler.begin_frame()
+            with window.profiler.phase('events'):
+                window.handle_events(events)
+            with window.profiler.phase('update'):
+                window.update()
+            drawn = window.needs_redraw()
+            if drawn:
+                window.draw()
+                profile = window.profiler.end_frame()
+            else:
+                profile = None
+                window.profiler.cancel_frame()
+            elapsed = time.perf_counter() - start
+
+            frame = {
+                'loop': loop,
+                't': batch['t'],
+                'events': len(events),
+                'drawn': drawn,
+                'ms': elapsed * 1000,
+                'phases_ms': {name: seconds * 1000 for name, seconds in profile['phases'].items()}
+                if profile else {},
+                'net_blocks': sys.getallocatedblocks() - blocks,
+                'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                'segments': len(window.track_canvas.track_elements),
+            }
+            if trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                frame['traced_mb'] = current / 2 ** 20
+                frame['frame_peak_mb'] = peak / 2 ** 20
+            frames.append(frame)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(frames: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if not frames:
+        return {'frames': 0}
+    times = [frame['ms'] for frame in frames]
+    # Drift between the first and the last tenth shows sessions that slow down
+    tenth = max(1, len(times) // 10)
+    summary = {
+        'frames': len(frames),
+        'drawn': sum(frame['drawn'] for frame in frames),
+        'total_s': sum(times) / 1000,
+        'mean_ms': statistics.mean(times),
+        'median_ms': statistics.median(times),
+        'p95_ms': percentile(times, 0.95),
+        'p99_ms': percentile(times, 0.99),
+        'max_ms': max(times),
+        'first_tenth_mean_ms': statistics.mean(times[:tenth]),
+        'last_tenth_mean_ms': statistics.mean(times[-tenth:]),
+        'net_blocks': sum(frame['net_blocks'] for frame in frames),
+        'peak_rss_mb': max(frame['max_rss_mb'] for frame in frames),
+        'final_segments': frames[-1]['segments'],
+    }
+    if 'frame_peak_mb' in frames[0]:
+        summary['peak_traced_mb'] = max(frame['frame_peak_mb'] for frame in frames)
+        summary['final_traced_mb'] = frames[-1]['traced_mb']
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record_parser = subparsers.add_parser("record", help="Use the editor and record the session")
+    record_parser.add_argument("recording")
+    replay_parser = subparsers.add_parser("replay", help="Replay a recording headlessly")
+    replay_parser.add_argument("recording")
+    replay_parser.add_argument("--loops", type=int, default=1,
+                               help="Play the recording this many times in a row, e.g. to build long tracks")
+    replay_parser.add_argument("--trace-memory", action="store_true",
+                               help="Track Python heap use with tracemalloc (slows every frame down)")
+    replay_parser.add_argument("--json", help="Write per-frame records and the summary to this file")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        record(args.recording)
+        return
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    json_path = os.path.abspath(args.json) if args.json else None  # Replay runs in a scratch directory
+    result = replay(args.recording, args.loops, args.trace_memory)
+    for key, value in result['summary'].items():
+        print(f"{key:<20} {value:.2f}" if isinstance(value, float) else f"{key:<20} {value}")
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
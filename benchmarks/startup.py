@@ -0,0 +1,89 @@
+"""Editor startup benchmark: time to import, construct MainWindow, draw the first frame and show the background"""
+from typing import Dict, List
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+METRICS = ['import_s', 'construct_s', 'first_frame_s', 'background_s']
+
+
+def measure_startup() -> Dict[str, float]:
+    """One cold start, run in a fresh interpreter by run_startup()"""
+    start = time.perf_counter()
+    from src.gui.main_window import MainWindow
+    imported = time.perf_counter()
+
+    window = MainWindow(project_dir=os.path.join(tempfile.mkdtemp(), "project"))
+    constructed = time.perf_counter()
+
+    window.handle_events()
+    window.update()
+    window.draw()
+    first_frame = time.perf_counter()
+
+    # Keep the loop going until the default background is on screen
+    canvas = window.track_canvas
+    deadline = first_frame + 30.0
+    while canvas.background_image is None and time.perf_counter() < deadline:
+        window.handle_events()
+        window.update()
+        if window.needs_redraw():
+            window.draw()
+        time.sleep(0.001)
+    background = time.perf_counter()
+    window.exporter.shutdown()
+
+    return {
+        'import_s': imported - start,
+        'construct_s': constructed - imported,
+        'first_frame_s': first_frame - start,
+        'background_s': background - start,
+    }
+
+
+def run_startup() -> Dict[str, float]:
+    """Measure one start in a subprocess, in a scratch directory so outputs don't land in the repo"""
+    workdir = tempfile.mkdtemp(prefix="startup-bench-")
+    os.symlink(os.path.join(REPO_ROOT, "track_backgrounds"), os.path.join(workdir, "track_backgrounds"))
+    env = dict(os.environ, SDL_VIDEODRIVER=os.environ.get("SDL_VIDEODRIVER", "dummy"),
+               SDL_AUDIODRIVER="dummy", PYTHONPATH=REPO_ROOT,
+               PYGAME_HIDE_SUPPORT_PROMPT="1")
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"],
+                            cwd=workdir, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(runs: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    return {metric: {'median': statistics.median(run[metric] for run in runs),
+                     'min': min(run[metric] for run in runs)}
+            for metric in METRICS}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", help="Write the summary to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_startup()))
+        return
+
+    runs = [run_startup() for _ in range(args.runs)]
+    summary = summarize(runs)
+    for metric, values in summary.items():
+        print(f"{metric:<14} median {values['median'] * 1000:8.1f} ms   min {values['min'] * 1000:8.1f} ms")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'runs': runs, 'summary': summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
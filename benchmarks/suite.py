@@ -0,0 +1,250 @@
+"""Benchmarks of the editor and generator hot paths, with JSON baselines and regression checks"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+import pygame
+
+WIDTH, HEIGHT = 1200, 800
+
+# A benchmark is (setup, run, units): setup() builds fresh state outside the
+# timed region, run(state) is timed, and units is how many items one run
+# handles (segments, frames, samples), used to report a rate
+Benchmark = Tuple[Callable[[], Any], Callable[[Any], None], int]
+
+
+DEVNULL = open(os.devnull, 'w')
+
+
+def quiet():
+    """The canvas and generator print on every segment; keep that out of the report"""
+    return contextlib.redirect_stdout(DEVNULL)
+
+
+def make_canvas():
+    from src.gui.track_canvas import TrackCanvas
+    pygame.init()
+    screen = pygame.Surface((WIDTH, HEIGHT))
+    return TrackCanvas(screen, WIDTH, HEIGHT)
+
+
+def segment_list(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Repeatable mix of straights and curves, like generate_track_params draws"""
+    rng = np.random.default_rng(seed)
+    segments = []
+    for _ in range(count):
+        if rng.random() < 0.4:
+            segments.append({'type': 'straight', 'length': int(rng.integers(50, 150))})
+        else:
+            segments.append({'type': 'curve', 'direction': str(rng.choice(['left', 'right'])),
+                             'angle': int(rng.choice([45, 90])), 'radius': int(rng.integers(30, 70))})
+    return segments
+
+
+def add_segments(canvas, segments: List[Dict[str, Any]]) -> None:
+    for segment in segments:
+        if segment['type'] == 'straight':
+            canvas.add_straight_segment(segment['length'])
+        else:
+            canvas.add_curve_segment(segment['direction'], segment['angle'], segment['radius'])
+
+
+def canvas_with_track(count: int, zoom: float = 1.0):
+    canvas = make_canvas()
+    with quiet():
+        add_segments(canvas, segment_list(count))
+    canvas.zoom_level = zoom
+    # Keep the start of the track in view whatever the zoom
+    canvas.offset = [WIDTH / 2 * (1 - zoom), HEIGHT / 2 * (1 - zoom)]
+    return canvas
+
+
+def bench_add_segments(count: int) -> Benchmark:
+    segments = segment_list(count)
+
+    def run(canvas) -> None:
+        with quiet():
+            add_segments(canvas, segments)
+
+    return make_canvas, run, count
+
+
+def bench_track_points(count: int) -> Benchmark:
+    return lambda: canvas_with_track(count), lambda canvas: canvas.get_track_points(), 1
+
+
+def bench_draw(count: int, zoom: float, frames: int = 5) -> Benchmark:
+    def run(canvas) -> None:
+        for _ in range(frames):
+            canvas.draw()
+
+    return lambda: canvas_with_track(count, zoom), run, frames
+
+
+def make_generator():
+    from src.data_generation.track_generator import TrackDataGenerator
+    return TrackDataGenerator(tempfile.mkdtemp(prefix="bench-generate-"))
+
+
+def bench_validate(tracks: int = 20) -> Benchmark:
+    def setup():
+        generator = make_generator()
+        np.random.seed(0)
+        return generator, [generator.generate_track_params() for _ in range(tracks)]
+
+    def run(state) -> None:
+        generator, params_list = state
+        with quiet():
+            for track_params in params_list:
+                generator.validate_track(track_params)
+
+    return setup, run, tracks
+
+
+def bench_generate(samples: int = 5) -> Benchmark:
+    def setup():
+        np.random.seed(0)
+        return make_generator()
+
+    def run(generator) -> None:
+        with quiet():
+            generator.generate_dataset(samples)
+
+    return setup, run, samples
+
+
+def bench_startup() -> Benchmark:
+    from startup import run_startup
+    return lambda: None, lambda _: run_startup(), 1
+
+
+# Name -> factory; names are stable so baselines stay comparable across runs
+BENCHMARKS: Dict[str, Callable[[], Benchmark]] = {
+    **{f"canvas.add_segments[n={n}]": (lambda n=n: bench_add_segments(n)) for n in (100, 1000, 5000)},
+    **{f"canvas.get_track_points[n={n}]": (lambda n=n: bench_track_points(n)) for n in (100, 1000, 5000)},
+    **{f"canvas.draw[n={n},zoom={zoom}]": (lambda n=n, zoom=zoom: bench_draw(n, zoom))
+       for n in (50, 500) for zoom in (0.5, 1.0, 3.0)},
+    "generator.validate_track": bench_validate,
+    "generator.generate_dataset": bench_generate,
+    "startup.cold_start": bench_startup,
+}
+
+
+def time_benchmark(benchmark: Benchmark, repeat: int) -> Dict[str, Any]:
+    """Median and min of repeat timed runs, each on fresh state; GC is off while timing, as in timeit"""
+    setup, run, units = benchmark
+    times = []
+    for _ in range(repeat):
+        state = setup()
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            run(state)
+            times.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+    median = statistics.median(times)
+    return {
+        'median_s': median,
+        'min_s': min(times),
+        'repeat': repeat,
+        'units': units,
+        'units_per_s': units / median if median else None,
+    }
+
+
+def run_suite(names: List[str], repeat: int) -> Dict[str, Any]:
+    results = {}
+    for name in names:
+        results[name] = time_benchmark(BENCHMARKS[name](), repeat)
+        result = results[name]
+        print(f"{name:<40} median {result['median_s'] * 1000:9.2f} ms   "
+              f"min {result['min_s'] * 1000:9.2f} ms   {result['units_per_s']:10.1f}/s")
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'system': platform.platform(),
+            'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        'results': results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Print each benchmark against the baseline; returns the names slower by more than threshold"""
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:<40} (not in baseline)")
+            continue
+        ratio = result['median_s'] / base['median_s']
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        print(f"{name:<40} {base['median_s'] * 1000:9.2f} -> {result['median_s'] * 1000:9.2f} ms "
+              f"({ratio:5.2f}x){flag}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--filter", action="append", default=[],
+                        help="Only run benchmarks whose name contains this (repeatable)")
+    parser.add_argument("--skip", action="append", default=[],
+                        help="Skip benchmarks whose name contains this, e.g. startup (repeatable)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark")
+    parser.add_argument("--list", action="store_true", help="List benchmark names and exit")
+    parser.add_argument("--save", help="Write results as a JSON baseline to this file")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Relative slowdown that counts as a regression (default 0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    names = [name for name in BENCHMARKS
+             if (not args.filter or any(part in name for part in args.filter))
+             and not any(part in name for part in args.skip)]
+    if args.list:
+        print("\n".join(names))
+        return
+
+    current = run_suite(names, args.repeat)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"Saved {len(names)} results to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.compare} (threshold {args.threshold:.0%}):")
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
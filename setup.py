@@ -26,6 +26,11 @@ setup(
     entry_points={
         "console_scripts": [
             "track-builder=main:main",
+            "track-batch-export=src.export.batch_export:main",
+            "track-index=src.data_generation.track_index:main",
+            "track-shards=src.data_generation.shards:main",
+            "track-service=src.data_generation.service:main",
+            "track-import=src.export.track_import:main",
         ],
     },
 )
@@ -0,0 +1 @@
+# This makes the data_generation directory a Python package
@@ -0,0 +1,198 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import copy
+import math
+import numpy as np
+from utils.geometry import build_track_elements, track_bounds
+
+# Pose-level augmentation of generator params. Variants are rigid (or
+# uniformly scaled) copies of a base track: its built elements are mirrored,
+# rotated, scaled and shifted point for point, arc angles included, and
+# stored under 'elements', which take precedence over the segment list
+# wherever a track is built (see params_elements). The start pose and the
+# segments are transformed alongside, so descriptions and metadata match:
+# mirrors swap every turn direction and scaling multiplies lengths and radii.
+# Variants are bounds-checked analytically, without sampling or rendering.
+
+Pose = Tuple[Tuple[float, float], float]
+
+
+def start_pose(track_params: Dict[str, Any], default_pos: Tuple[float, float],
+               default_direction: float) -> Pose:
+    """Start position and heading of a track; params without 'start' use the defaults"""
+    start = track_params.get('start')
+    if start is None:
+        return default_pos, default_direction
+    return (start['pos'][0], start['pos'][1]), start['direction']
+
+
+def params_elements(track_params: Dict[str, Any], default_pos: Tuple[float, float],
+                    default_direction: float) -> List[Dict[str, Any]]:
+    """
+    Track elements of params: a variant's stored 'elements', else the
+    segments built from the start pose with the canvas' element builder
+    """
+    if track_params.get('elements') is not None:
+        # JSON turns the point tuples into lists
+        return [{key: tuple(value) if isinstance(value, list) else value for key, value in element.items()}
+                for element in track_params['elements']]
+    pos, direction = start_pose(track_params, default_pos, default_direction)
+    return build_track_elements(track_params['segments'], pos, direction)
+
+
+def with_start(track_params: Dict[str, Any], pos: Tuple[float, float], direction: float) -> Dict[str, Any]:
+    variant = copy.deepcopy(track_params)
+    variant['start'] = {'pos': [round(pos[0], 3), round(pos[1], 3)], 'direction': round(direction % 360, 6)}
+    return variant
+
+
+def map_elements(elements: List[Dict[str, Any]], point: Callable[[Tuple[float, float]], Tuple[float, float]],
+                 angle: Callable[[float], float], radius: float = 1.0,
+                 mirror: bool = False) -> List[Dict[str, Any]]:
+    """
+    Elements with every point mapped by point and every arc angle by angle
+    (pygame.draw.arc angles, y up). Mirroring reverses the sweep, so the arc
+    ends swap; its lane sides swap with the straights' (see element_polyline),
+    so 'direction' flips too.
+    """
+    mapped = []
+    for element in elements:
+        if element['type'] == 'straight':
+            mapped.append({**element, 'start': point(element['start']), 'end': point(element['end'])})
+            continue
+        start_angle, end_angle = angle(element['start_angle']), angle(element['end_angle'])
+        direction = element['direction']
+        if mirror:
+            start_angle, end_angle = end_angle, start_angle
+            direction = 'left' if direction == 'right' else 'right'
+        mapped.append({**element, 'start': point(element['start']), 'center': point(element['center']),
+                       'radius': element['radius'] * radius, 'start_angle': start_angle,
+                       'end_angle': end_angle, 'direction': direction})
+    return mapped
+
+
+def mirror_params(track_params: Dict[str, Any], pose: Pose, axis_x: float) -> Dict[str, Any]:
+    """Mirror across the vertical line x = axis_x: left and right turns swap"""
+    (x, y), direction = pose
+    variant = with_start(track_params, (2 * axis_x - x, y), 180 - direction)
+    for segment in variant['segments']:
+        if segment['type'] == 'curve':
+            segment['direction'] = 'left' if segment['direction'] == 'right' else 'right'
+    if variant.get('elements') is not None:
+        variant['elements'] = map_elements(variant['elements'], lambda p: (2 * axis_x - p[0], p[1]),
+                                           lambda a: math.pi - a, mirror=True)
+    return variant
+
+
+def rotate_params(track_params: Dict[str, Any], pose: Pose, angle: float,
+                  center: Tuple[float, float]) -> Dict[str, Any]:
+    """Rotate the start pose by angle degrees (clockwise on screen) about center"""
+    (x, y), direction = pose
+    rad = math.radians(angle)
+    cos, sin = math.cos(rad), math.sin(rad)
+
+    def rotate(p: Tuple[float, float]) -> Tuple[float, float]:
+        dx, dy = p[0] - center[0], p[1] - center[1]
+        return (center[0] + dx * cos - dy * sin, center[1] + dx * sin + dy * cos)
+
+    variant = with_start(track_params, rotate((x, y)), direction + angle)
+    if variant.get('elements') is not None:
+        # Clockwise on screen is clockwise for the y-up arc angles too
+        variant['elements'] = map_elements(variant['elements'], rotate, lambda a: a - rad)
+    return variant
+
+
+def translate_params(track_params: Dict[str, Any], pose: Pose,
+                     offset: Tuple[float, float]) -> Dict[str, Any]:
+    (x, y), direction = pose
+    variant = with_start(track_params, (x + offset[0], y + offset[1]), direction)
+    if variant.get('elements') is not None:
+        variant['elements'] = map_elements(variant['elements'], lambda p: (p[0] + offset[0], p[1] + offset[1]),
+                                           lambda a: a)
+    return variant
+
+
+def scale_params(track_params: Dict[str, Any], pose: Pose, factor: float,
+                 center: Tuple[float, float]) -> Dict[str, Any]:
+    """Scale lengths, radii and the start position about center; angles are kept"""
+    (x, y), direction = pose
+
+    def scale(p: Tuple[float, float]) -> Tuple[float, float]:
+        return (center[0] + (p[0] - center[0]) * factor, center[1] + (p[1] - center[1]) * factor)
+
+    variant = with_start(track_params, scale((x, y)), direction)
+    for segment in variant['segments']:
+        key = 'length' if segment['type'] == 'straight' else 'radius'
+        segment[key] = round(segment[key] * factor, 1)
+    if variant.get('elements') is not None:
+        variant['elements'] = map_elements(variant['elements'], scale, lambda a: a, radius=factor)
+    return variant
+
+
+class TrackAugmenter:
+    """
+    Derives in-bounds variants of an accepted track.
+
+    Each variant draws a random mirror flag, rotation, uniform scale and shift
+    and is kept only if its drawn geometry stays margin pixels inside the
+    canvas. The transforms are applied to the base track's elements, stored
+    in the variant under 'elements'; what was applied is recorded under
+    'augmentation'.
+    """
+
+    def __init__(self, width: int = 1200, height: int = 800, margin: float = 100,
+                 default_direction: float = -90, max_rotation: float = 180,
+                 scale_range: Tuple[float, float] = (0.8, 1.2), max_shift: float = 150,
+                 max_tries: int = 8, seed: Optional[int] = None) -> None:
+        self.width = width
+        self.height = height
+        self.margin = margin
+        self.center = (width // 2, height // 2)
+        self.default_direction = default_direction
+        self.max_rotation = max_rotation
+        self.scale_range = scale_range
+        self.max_shift = max_shift
+        self.max_tries = max_tries
+        self.rng = np.random.default_rng(seed)
+
+    def pose(self, track_params: Dict[str, Any]) -> Pose:
+        return start_pose(track_params, self.center, self.default_direction)
+
+    def in_bounds(self, track_params: Dict[str, Any]) -> bool:
+        """Analytic bounds check of the track as the canvas would draw it"""
+        elements = params_elements(track_params, self.center, self.default_direction)
+        min_x, min_y, max_x, max_y = track_bounds(elements)
+        return (min_x >= self.margin and max_x <= self.width - self.margin and
+                min_y >= self.margin and max_y <= self.height - self.margin)
+
+    def random_variant(self, track_params: Dict[str, Any]) -> Dict[str, Any]:
+        mirror = bool(self.rng.random() < 0.5)
+        rotation = float(self.rng.uniform(-self.max_rotation, self.max_rotation))
+        scale = float(self.rng.uniform(*self.scale_range))
+        shift = self.rng.uniform(-self.max_shift, self.max_shift, size=2)
+
+        variant = dict(track_params,
+                       elements=params_elements(track_params, self.center, self.default_direction))
+        if mirror:
+            variant = mirror_params(variant, self.pose(variant), self.center[0])
+        variant = rotate_params(variant, self.pose(variant), rotation, self.center)
+        variant = scale_params(variant, self.pose(variant), scale, self.center)
+        variant = translate_params(variant, self.pose(variant), (float(shift[0]), float(shift[1])))
+        variant['augmentation'] = {
+            'base': track_params.get('timestamp'),
+            'mirror': mirror,
+            'rotation': round(rotation, 3),
+            'scale': round(scale, 4),
+            'shift': [round(float(v), 3) for v in shift],
+        }
+        return variant
+
+    def variants(self, track_params: Dict[str, Any], count: int) -> List[Dict[str, Any]]:
+        """Up to count in-bounds variants, trying max_tries random draws for each"""
+        results = []
+        for _ in range(count):
+            for _ in range(self.max_tries):
+                variant = self.random_variant(track_params)
+                if self.in_bounds(variant):
+                    results.append(variant)
+                    break
+        return results
@@ -0,0 +1,211 @@
+from typing import Any, Dict, Optional, Sequence
+from multiprocessing import shared_memory
+import multiprocessing
+import os
+import queue
+import time
+import numpy as np
+from src.data_generation.augmentation import params_elements
+from src.data_generation.rasterizer import TrackRasterizer
+from src.export.async_exporter import replace_atomically
+from src.export.encoders import make_encoder
+from utils.geometry import LANE_OFFSET
+
+# Multi-process rendering for TrackDataGenerator. Render workers draw frames
+# straight into a fixed pool of shared-memory slots and hand the writer
+# processes nothing but a slot number and an output path; the writers encode
+# the frame in place and return the slot. Frames are never pickled, and the
+# pool size caps the memory held by frames in flight.
+
+
+class FramePool:
+    """
+    num_slots frames of one shape in a single shared-memory block.
+
+    acquire() takes a free slot, blocking while every slot is in use, and
+    release() hands it back from whichever process finished with it. The pool
+    can be passed to worker processes, which attach to the same memory.
+    """
+
+    def __init__(self, num_slots: int, shape: Sequence[int], dtype: str = 'uint8',
+                 context: Optional[Any] = None) -> None:
+        context = context or multiprocessing.get_context()
+        self.num_slots = num_slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=self.frame_bytes * num_slots)
+        self.free = context.Queue()
+        for slot in range(num_slots):
+            self.free.put(slot)
+        self.owner_pid = os.getpid()  # Only the creating process unlinks the memory
+        self.frames = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state['frames'] = None  # Views can't cross processes; rebuilt on attach
+        return state
+
+    def frame(self, slot: int) -> np.ndarray:
+        """Writable view of one slot, no copy"""
+        if self.frames is None:
+            self.frames = np.ndarray((self.num_slots,) + self.shape, dtype=self.dtype, buffer=self.shm.buf)
+        return self.frames[slot]
+
+    def acquire(self, timeout: Optional[float] = None) -> int:
+        return self.free.get(timeout=timeout)
+
+    def release(self, slot: int) -> None:
+        self.free.put(slot)
+
+    def close(self) -> None:
+        """Detach this process; every view from frame() must be gone by now"""
+        self.frames = None
+        self.shm.close()
+        if os.getpid() == self.owner_pid:
+            self.shm.unlink()
+
+
+def render_worker(pool: FramePool, jobs, frames, settings: Dict[str, Any]) -> None:
+    """Render (sample_id, track_params, path) jobs into pool slots until a None job"""
+    width, height = settings['size']
+    rasterizer = TrackRasterizer(width, height, world_size=(width, height),
+                                 lane_offset=settings['lane_offset'])
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        sample_id, track_params, path = job
+        slot = pool.acquire()
+        start = time.perf_counter()
+        try:
+            elements = params_elements(track_params, (width // 2, height // 2), -90)
+            pool.frame(slot)[...] = rasterizer.render(elements)
+        except Exception as e:
+            pool.release(slot)
+            frames.put((None, sample_id, path, f"render failed: {e}", 0.0))
+            continue
+        frames.put((slot, sample_id, path, None, time.perf_counter() - start))
+    pool.close()
+
+
+def writer_worker(pool: FramePool, frames, results, image_format: str) -> None:
+    """Encode rendered slots to their paths and free the slots, until a None frame"""
+    encoder = make_encoder(image_format)
+    while True:
+        item = frames.get()
+        if item is None:
+            break
+        slot, sample_id, path, error, render_seconds = item
+        encode_seconds = 0.0
+        if error is None:
+            start = time.perf_counter()
+            try:
+                frame = pool.frame(slot)
+                replace_atomically(path, lambda tmp_path: encoder.write(tmp_path, frame))
+            except Exception as e:
+                error = f"encoding failed: {e}"
+            finally:
+                frame = None
+                pool.release(slot)
+            encode_seconds = time.perf_counter() - start
+        results.put((sample_id, path, error, render_seconds, encode_seconds))
+    pool.close()
+
+
+class RenderPipeline:
+    """
+    Render workers -> shared-memory slots -> writer processes.
+
+    submit() queues one track and blocks once queue_size jobs are waiting, so
+    a fast producer can't run ahead of rendering. Slots bound the frames
+    between rendering and writing: with every slot in use the render workers
+    wait for a writer to finish. close() drains everything and returns stats.
+    """
+
+    def __init__(self, width: int = 1200, height: int = 800, lane_offset: float = LANE_OFFSET,
+                 image_format: str = "png", render_workers: int = 2, writer_workers: int = 1,
+                 slots: int = 8, queue_size: Optional[int] = None) -> None:
+        self.extension = make_encoder(image_format).extension
+        context = multiprocessing.get_context()
+        self.pool = FramePool(slots, (height, width, 3), context=context)
+        self.jobs = context.Queue(maxsize=queue_size or 2 * slots)
+        self.frames = context.Queue()
+        self.results = context.Queue()
+        settings = {'size': (width, height), 'lane_offset': lane_offset}
+
+        self.render_processes = [
+            context.Process(target=render_worker, args=(self.pool, self.jobs, self.frames, settings),
+                            name=f"render-{i}", daemon=True)
+            for i in range(render_workers)]
+        self.writer_processes = [
+            context.Process(target=writer_worker, args=(self.pool, self.frames, self.results, image_format),
+                            name=f"write-{i}", daemon=True)
+            for i in range(writer_workers)]
+        for process in self.render_processes + self.writer_processes:
+            process.start()
+
+        self.submitted = 0
+        self.written = 0
+        self.failed = 0
+        self.render_seconds = 0.0
+        self.encode_seconds = 0.0
+
+    def path_for(self, root: str) -> str:
+        return root + self.extension
+
+    def submit(self, sample_id: str, track_params: Dict[str, Any], root: str) -> str:
+        """Queue a track for rendering to root + the format's extension; returns that path"""
+        path = self.path_for(root)
+        self.jobs.put((sample_id, track_params, path))
+        self.submitted += 1
+        self.poll()
+        return path
+
+    def poll(self, timeout: Optional[float] = None) -> int:
+        """Collect finished samples without blocking (or waiting up to timeout for one)"""
+        collected = 0
+        while self.written + self.failed < self.submitted:
+            try:
+                result = self.results.get(block=timeout is not None and collected == 0, timeout=timeout)
+            except queue.Empty:
+                break
+            sample_id, path, error, render_seconds, encode_seconds = result
+            if error is None:
+                self.written += 1
+            else:
+                self.failed += 1
+                print(f"Image for {sample_id} failed: {error}")
+            self.render_seconds += render_seconds
+            self.encode_seconds += encode_seconds
+            collected += 1
+        return collected
+
+    def close(self) -> Dict[str, Any]:
+        """Wait for every submitted image, stop the workers and free the shared memory"""
+        for _ in self.render_processes:
+            self.jobs.put(None)
+        while self.written + self.failed < self.submitted:
+            if not self.poll(timeout=1.0) and not any(p.is_alive() for p in self.writer_processes):
+                print("Writer processes exited with images outstanding")
+                break
+        for process in self.render_processes:
+            process.join()
+        for _ in self.writer_processes:
+            self.frames.put(None)
+        for process in self.writer_processes:
+            process.join()
+        self.pool.close()
+        return self.stats()
+
+    def stats(self) -> Dict[str, Any]:
+        done = self.written + self.failed
+        return {
+            'submitted': self.submitted,
+            'written': self.written,
+            'failed': self.failed,
+            'slots': self.pool.num_slots,
+            'shared_mb': self.pool.frame_bytes * self.pool.num_slots / 2 ** 20,
+            'mean_render_ms': 1000 * self.render_seconds / done if done else 0.0,
+            'mean_encode_ms': 1000 * self.encode_seconds / done if done else 0.0,
+        }
@@ -0,0 +1,187 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import math
+import numpy as np
+from utils.geometry import LANE_OFFSET, arc_span
+
+# Per-pixel labels for segmentation and planning models: the drivable area
+# between the lane boundaries, and the signed distance from every pixel to the
+# centerline. Both are computed analytically from the track elements (a few
+# straights and arcs), vectorized over pixels and over all elements of a batch
+# of tracks at once, so they are exact at any resolution and nothing is drawn.
+
+
+def element_arrays(tracks: Sequence[List[Dict[str, Any]]]) -> Dict[str, np.ndarray]:
+    """
+    Flat per-element parameters of many tracks, straights and arcs apart,
+    each with the index of its track:
+      straights: start (K, 2), direction (K, 2) unit vectors, length (K,)
+      arcs: center (K, 2), radius, start angle, span, side (+1 right, -1 left)
+    """
+    straights = {'track': [], 'start': [], 'direction': [], 'length': []}
+    arcs = {'track': [], 'center': [], 'radius': [], 'start_angle': [], 'span': [], 'side': []}
+    for track_index, elements in enumerate(tracks):
+        for element in elements:
+            if element['type'] == 'straight':
+                start = np.asarray(element['start'], dtype=np.float64)
+                delta = np.asarray(element['end'], dtype=np.float64) - start
+                length = math.hypot(delta[0], delta[1])
+                straights['track'].append(track_index)
+                straights['start'].append(start)
+                straights['direction'].append(delta / length if length else np.array([1.0, 0.0]))
+                straights['length'].append(length)
+            else:
+                start, stop = arc_span(element)
+                arcs['track'].append(track_index)
+                arcs['center'].append(np.asarray(element['center'], dtype=np.float64))
+                arcs['radius'].append(element['radius'])
+                arcs['start_angle'].append(start)
+                arcs['span'].append(stop - start)
+                arcs['side'].append(1.0 if element['direction'] == 'right' else -1.0)
+
+    arrays = {}
+    for prefix, fields in (('straight', straights), ('arc', arcs)):
+        for name, values in fields.items():
+            dtype = np.int64 if name == 'track' else np.float64
+            shape = (0, 2) if name in ('start', 'direction', 'center') else (0,)
+            arrays[f"{prefix}_{name}"] = np.array(values, dtype=dtype) if values else np.zeros(shape, dtype)
+
+    # Pixel math runs in float32: world coordinates are a few thousand pixels at most
+    return {name: array if name.endswith('_track') else array.astype(np.float32)
+            for name, array in arrays.items()}
+
+
+def straight_distances(points: np.ndarray, start: np.ndarray, direction: np.ndarray,
+                       length: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (distance, lateral, alongside) of (N, 2) points against K straights, each
+    (K, N): distance to the segment, signed offset from its line (positive
+    on the right lane side, as in element_polyline) and whether the point
+    projects onto the segment.
+    """
+    vx = points[None, :, 0] - start[:, None, 0]
+    vy = points[None, :, 1] - start[:, None, 1]
+    along = vx * direction[:, None, 0] + vy * direction[:, None, 1]
+    lateral = vy * direction[:, None, 0] - vx * direction[:, None, 1]
+    alongside = (along >= 0) & (along <= length[:, None])
+    beyond = np.where(along < 0, along, np.maximum(along - length[:, None], 0.0))
+    return np.hypot(beyond, lateral), lateral, alongside
+
+
+def arc_distances(points: np.ndarray, center: np.ndarray, radius: np.ndarray,
+                  start_angle: np.ndarray, span: np.ndarray,
+                  side: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """straight_distances for K arcs; angles follow pygame.draw.arc (y up)"""
+    qx = points[None, :, 0] - center[:, None, 0]
+    qy = center[:, None, 1] - points[None, :, 1]  # y up, like the arc angles
+    lateral = (np.hypot(qx, qy) - radius[:, None]) * side[:, None]
+
+    # Inside the swept span: counterclockwise of the start ray and clockwise
+    # of the end ray (either of the two for spans over half a turn)
+    start_x, start_y = np.cos(start_angle)[:, None], np.sin(start_angle)[:, None]
+    end_x, end_y = np.cos(start_angle + span)[:, None], np.sin(start_angle + span)[:, None]
+    after_start = start_x * qy - start_y * qx >= 0
+    before_end = qx * end_y - qy * end_x >= 0
+    alongside = np.where((span <= math.pi)[:, None], after_start & before_end, after_start | before_end)
+
+    # Off the swept span the nearest point is one of the arc's ends
+    r = radius[:, None]
+    to_start = (qx - r * start_x) ** 2 + (qy - r * start_y) ** 2
+    to_end = (qx - r * end_x) ** 2 + (qy - r * end_y) ** 2
+    distance = np.where(alongside, np.abs(lateral), np.sqrt(np.minimum(to_start, to_end)))
+    return distance, lateral, alongside
+
+
+class TrackLabeler:
+    """
+    Drivable-area masks and centerline distance fields as NumPy arrays.
+
+    The output grid maps onto the world rect the same way TrackRasterizer
+    does (fit, aspect ratio kept), and every pixel is evaluated at its
+    center. A pixel is drivable if it lies alongside some element within
+    lane_offset of its centerline. The signed distance is the distance to
+    the nearest element, positive on the right lane side and negative on
+    the left, multiplied by distance_scale (e.g. 1 / pixels_per_meter for
+    meters) and clipped to +-max_distance if given.
+    """
+
+    def __init__(self, width: int = 1200, height: int = 800,
+                 world_size: Tuple[float, float] = (1200, 800), lane_offset: float = LANE_OFFSET,
+                 distance_scale: float = 1.0, max_distance: Optional[float] = None,
+                 max_batch: int = 16, block_budget: int = 1 << 22) -> None:
+        self.width = width
+        self.height = height
+        self.world_size = world_size
+        self.lane_offset = lane_offset  # In world pixels, see TrackCanvas.lane_offset
+        self.distance_scale = distance_scale
+        self.max_distance = max_distance
+        self.max_batch = max_batch  # Tracks labelled per chunk
+        self.block_budget = block_budget  # Elements x pixels evaluated at once, bounds scratch memory
+
+        # Same world -> output pixel transform as TrackRasterizer
+        self.scale = min(width / world_size[0], height / world_size[1])
+        self.origin = ((width - world_size[0] * self.scale) / 2,
+                       (height - world_size[1] * self.scale) / 2)
+
+    def pixel_centers(self) -> np.ndarray:
+        """World coordinates of every output pixel center, (H * W, 2) in row-major order"""
+        xs = (np.arange(self.width) + 0.5 - self.origin[0]) / self.scale
+        ys = (np.arange(self.height) + 0.5 - self.origin[1]) / self.scale
+        grid_x, grid_y = np.meshgrid(xs, ys)
+        return np.stack([grid_x.ravel(), grid_y.ravel()], axis=1).astype(np.float32)
+
+    def label(self, track_elements: List[Dict[str, Any]],
+              sdf: bool = True) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """(mask, sdf) of one track, see label_batch"""
+        masks, fields = self.label_batch([track_elements], sdf)
+        return masks[0], fields[0] if fields is not None else None
+
+    def label_batch(self, tracks: Sequence[List[Dict[str, Any]]],
+                    sdf: bool = True) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Labels of many tracks: an (N, H, W) uint8 mask, 1 where drivable, and
+        with sdf=True an (N, H, W) float32 signed distance field (else None)
+        """
+        masks = np.zeros((len(tracks), self.height * self.width), dtype=np.uint8)
+        fields = np.zeros((len(tracks), self.height * self.width), dtype=np.float32) if sdf else None
+        centers = self.pixel_centers()
+        for first in range(0, len(tracks), self.max_batch):
+            chunk = tracks[first:first + self.max_batch]
+            self._label_chunk(chunk, centers, masks[first:first + len(chunk)],
+                              fields[first:first + len(chunk)] if sdf else None)
+        shape = (len(tracks), self.height, self.width)
+        return masks.reshape(shape), fields.reshape(shape) if sdf else None
+
+    def _label_chunk(self, tracks: Sequence[List[Dict[str, Any]]], centers: np.ndarray,
+                     masks: np.ndarray, fields: Optional[np.ndarray]) -> None:
+        if fields is not None:
+            fields[:] = np.inf if self.max_distance is None else self.max_distance  # Tracks without elements
+        arrays = element_arrays(tracks)
+        # Elements grouped by track, so each track's elements are one run of rows
+        track_of = np.concatenate([arrays['straight_track'], arrays['arc_track']])
+        order = np.argsort(track_of, kind='stable')
+        present, run_starts = np.unique(track_of[order], return_index=True)
+        runs = list(zip(present, run_starts, list(run_starts[1:]) + [len(order)]))
+
+        block = max(1024, self.block_budget // max(1, len(order)))
+        for first in range(0, len(centers), block):
+            points = centers[first:first + block]
+            parts = [straight_distances(points, arrays['straight_start'], arrays['straight_direction'],
+                                        arrays['straight_length']),
+                     arc_distances(points, arrays['arc_center'], arrays['arc_radius'],
+                                   arrays['arc_start_angle'], arrays['arc_span'], arrays['arc_side'])]
+            distance, lateral, alongside = (np.concatenate([part[i] for part in parts])[order]
+                                            for i in range(3))
+            band = alongside & (np.abs(lateral) <= self.lane_offset)
+
+            for track, start, stop in runs:
+                masks[track, first:first + block] = band[start:stop].any(axis=0)
+                if fields is None:
+                    continue
+                # Distance to the nearest element, on the side of the line that element puts the pixel
+                nearest = distance[start:stop].argmin(axis=0)[None]
+                signed = np.take_along_axis(distance[start:stop], nearest, axis=0)[0]
+                signed = np.where(np.take_along_axis(lateral[start:stop], nearest, axis=0)[0] < 0,
+                                  -signed, signed) * self.distance_scale
+                if self.max_distance is not None:
+                    signed = np.clip(signed, -self.max_distance, self.max_distance)
+                fields[track, first:first + block] = signed
@@ -0,0 +1,123 @@
+from typing import Any, Callable, Dict, List, Optional
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+# Memory accounting for long generation runs: periodic RSS and tracemalloc
+# samples for the stats output, and a ceiling that makes the generator wait
+# for its queued work to drain before producing more.
+
+
+def current_rss_mb() -> float:
+    """
+    Resident set size now; falls back to the peak where /proc is unavailable,
+    and to 0.0 where the resource module is missing too (Windows)
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource  # Unix only
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024  # Bytes on macOS, KiB elsewhere
+
+
+class MemoryMonitor:
+    """
+    Samples memory use and enforces an optional RSS ceiling.
+
+    sample() records RSS and, with trace=True, the Python heap as seen by
+    tracemalloc. check() is cheap enough to call per sample: past ceiling_mb
+    it runs the drain callbacks (flush queued images, pending index rows),
+    collects garbage and waits until RSS is back under the ceiling or
+    max_wait seconds passed, counting each such pause as a throttle.
+    """
+
+    def __init__(self, ceiling_mb: Optional[float] = None, trace: bool = True,
+                 max_wait: float = 1.0, history: int = 1000) -> None:
+        self.ceiling_mb = ceiling_mb
+        self.trace = trace
+        self.max_wait = max_wait
+        self.history = history
+        self.samples: List[Dict[str, float]] = []
+        self.drains: List[Callable[[], None]] = []
+        self.throttles = 0
+        self.throttled_seconds = 0.0
+        self.started_tracing = False
+        self.start_time = time.perf_counter()
+
+    def start(self) -> None:
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+    def stop(self) -> None:
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def add_drain(self, drain: Callable[[], None]) -> None:
+        """Register a callback that releases queued work, run when over the ceiling"""
+        self.drains.append(drain)
+
+    def sample(self) -> Dict[str, float]:
+        record = {'t': time.perf_counter() - self.start_time, 'rss_mb': current_rss_mb()}
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            record['traced_mb'] = current / 2 ** 20
+            record['traced_peak_mb'] = peak / 2 ** 20
+        self.samples.append(record)
+        if len(self.samples) > self.history:
+            # Keep the first sample as the baseline, drop the oldest after it
+            del self.samples[1]
+        return record
+
+    def check(self) -> bool:
+        """Throttle if over the ceiling; returns True if it had to"""
+        if self.ceiling_mb is None or current_rss_mb() <= self.ceiling_mb:
+            return False
+        start = time.perf_counter()
+        self.throttles += 1
+        for drain in self.drains:
+            drain()
+        gc.collect()
+        while current_rss_mb() > self.ceiling_mb and time.perf_counter() - start < self.max_wait:
+            time.sleep(0.05)
+        waited = time.perf_counter() - start
+        self.throttled_seconds += waited
+        rss = current_rss_mb()
+        if rss > self.ceiling_mb:
+            print(f"Memory still at {rss:.0f} MB after throttling {waited:.1f}s "
+                  f"(ceiling {self.ceiling_mb:.0f} MB), continuing")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        latest = self.samples[-1] if self.samples else self.sample()
+        first = self.samples[0]
+        stats = {
+            'rss_mb': latest['rss_mb'],
+            'rss_growth_mb': latest['rss_mb'] - first['rss_mb'],
+            'peak_rss_mb': max(record['rss_mb'] for record in self.samples),
+            'throttles': self.throttles,
+            'throttled_s': self.throttled_seconds,
+        }
+        if 'traced_mb' in latest:
+            stats['traced_mb'] = latest['traced_mb']
+            stats['traced_peak_mb'] = max(record.get('traced_peak_mb', 0.0) for record in self.samples)
+        return stats
+
+    def summary(self) -> str:
+        stats = self.stats()
+        text = f"RSS {stats['rss_mb']:.0f} MB ({stats['rss_growth_mb']:+.1f} MB)"
+        if 'traced_mb' in stats:
+            text += f", heap {stats['traced_mb']:.1f} MB (peak {stats['traced_peak_mb']:.1f} MB)"
+        if self.ceiling_mb is not None:
+            text += f", {stats['throttles']} throttles ({stats['throttled_s']:.1f}s)"
+        return text
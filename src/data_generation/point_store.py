@@ -0,0 +1,243 @@
+from typing import Dict, Iterator, List, Optional, Sequence
+import json
+import os
+import numpy as np
+
+# Ragged track store: the points of every track concatenated into one flat
+# binary file plus an offsets index, so a loader can memory-map the corpus and
+# slice any track without opening one file per track.
+#
+# Layout of a store directory:
+#   store.json       dtype, point dimensions and per-track metadata columns
+#   points.bin       (total_points, dims) raw array, tracks back to back
+#   offsets.bin      int64 end offset (in points) of every track
+#   column_<name>.bin  one value per track for every metadata column
+#   names.txt        one track name per line
+#
+# offsets.bin is written last on every append, so it is the commit record:
+# anything past the last offset is a torn append. Readers ignore it without
+# touching the files (a writer may still be mid-append); the first append
+# after an open cuts it off.
+
+POINTS_FILE = "points.bin"
+OFFSETS_FILE = "offsets.bin"
+NAMES_FILE = "names.txt"
+HEADER_FILE = "store.json"
+
+
+class PointStore:
+    """
+    Appendable store of variable-length point arrays.
+
+    Tracks are read back as read-only views into a memory map: store[i] costs
+    no copy and only touches the pages of track i. Per-track metadata columns
+    (numbers with a fixed dtype) are declared when the store is created.
+    """
+
+    def __init__(self, directory: str, dtype: str = 'float32', dims: int = 2,
+                 columns: Optional[Dict[str, str]] = None) -> None:
+        self.directory = directory
+        header_path = os.path.join(directory, HEADER_FILE)
+        if os.path.exists(header_path):
+            # Existing stores keep the layout they were created with
+            with open(header_path) as f:
+                header = json.load(f)
+        else:
+            os.makedirs(directory, exist_ok=True)
+            header = {'dtype': dtype, 'dims': dims, 'columns': columns or {}}
+            with open(header_path, 'w') as f:
+                json.dump(header, f, indent=2)
+        self.dtype = np.dtype(header['dtype'])
+        self.dims = header['dims']
+        self.columns = {name: np.dtype(kind) for name, kind in header['columns'].items()}
+
+        self.write_files = None  # Opened on the first append
+        self.invalidate()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def column_file(self, column: str) -> str:
+        return self.path(f"column_{column}.bin")
+
+    def committed_ends(self) -> np.ndarray:
+        """End offsets of the complete appends, read without modifying any file"""
+        # A crash while writing an offset leaves part of an entry; an offset
+        # past the end of points.bin commits points that never reached the disk
+        ends = read_array(self.path(OFFSETS_FILE), np.int64)
+        points_path = self.path(POINTS_FILE)
+        stored = os.path.getsize(points_path) if os.path.exists(points_path) else 0
+        beyond = np.flatnonzero(ends > stored // (self.dims * self.dtype.itemsize))
+        return ends[:beyond[0]] if len(beyond) else ends
+
+    def recover(self) -> None:
+        """Cut every file back to the last complete append (only before writing)"""
+        ends = self.committed_ends()
+        count = len(ends)
+        total = int(ends[-1]) if count else 0
+        truncate(self.path(OFFSETS_FILE), ends.nbytes)
+        truncate(self.path(POINTS_FILE), total * self.dims * self.dtype.itemsize)
+        for column, kind in self.columns.items():
+            truncate(self.column_file(column), count * kind.itemsize)
+
+        names = self.read_names()
+        if len(names) != count:
+            names = (names + [""] * count)[:count]
+            with open(self.path(NAMES_FILE), 'w') as f:
+                f.writelines(name + "\n" for name in names)
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """Drop cached memory maps so the next read sees appended tracks"""
+        self._offsets = None
+        self._points = None
+        self._column_maps = {}
+        self._names = None
+
+    @property
+    def offsets(self) -> np.ndarray:
+        """(count + 1,) start offsets, so track i is points[offsets[i]:offsets[i + 1]]"""
+        if self._offsets is None:
+            self._offsets = np.concatenate([[0], self.committed_ends()])
+        return self._offsets
+
+    @property
+    def points(self) -> np.ndarray:
+        """All points of all tracks as one (total_points, dims) memory map"""
+        if self._points is None:
+            total = int(self.offsets[-1])
+            self._points = map_array(self.path(POINTS_FILE), self.dtype, (total, self.dims))
+        return self._points
+
+    @property
+    def names(self) -> List[str]:
+        if self._names is None:
+            # names.txt may run ahead of the offsets while an append is in flight
+            count = len(self)
+            self._names = (self.read_names() + [""] * count)[:count]
+        return self._names
+
+    def read_names(self) -> List[str]:
+        if not os.path.exists(self.path(NAMES_FILE)):
+            return []
+        with open(self.path(NAMES_FILE)) as f:
+            return f.read().splitlines()
+
+    def column(self, name: str) -> np.ndarray:
+        """Memory map of one metadata column, one value per track"""
+        if name not in self._column_maps:
+            self._column_maps[name] = map_array(self.column_file(name), self.columns[name], (len(self),))
+        return self._column_maps[name]
+
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        """Points of one track as a read-only view into the memory map"""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Track {index} out of range for {len(self)} tracks")
+        offsets = self.offsets
+        return self.points[offsets[index]:offsets[index + 1]]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def gather(self, indices: Sequence[int]) -> tuple:
+        """
+        Several tracks copied into one contiguous (n_points, dims) array and
+        their (len(indices) + 1,) offsets into it, e.g. to build a batch.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = self.offsets[indices]
+        counts = self.offsets[indices + 1] - starts
+        batch_offsets = np.concatenate([[0], np.cumsum(counts)])
+        rank = np.arange(batch_offsets[-1]) - np.repeat(batch_offsets[:-1], counts)
+        return np.asarray(self.points[np.repeat(starts, counts) + rank]), batch_offsets
+
+    def append(self, points: np.ndarray, name: str = "", **values) -> int:
+        """Add one track (and its metadata column values); returns its index"""
+        points = np.ascontiguousarray(points, dtype=self.dtype).reshape(-1, self.dims)
+        unknown = set(values) - set(self.columns)
+        if unknown:
+            raise KeyError(f"Unknown metadata columns: {', '.join(sorted(unknown))}")
+
+        if self.write_files is None:
+            self.recover()
+            self.write_files = {
+                'points': open(self.path(POINTS_FILE), 'ab'),
+                'offsets': open(self.path(OFFSETS_FILE), 'ab'),
+                'names': open(self.path(NAMES_FILE), 'a'),
+            }
+            for column in self.columns:
+                self.write_files['column_' + column] = open(self.column_file(column), 'ab')
+            self._end = int(self.offsets[-1])
+            self._count = len(self)
+
+        files = self.write_files
+        points.tofile(files['points'])
+        for column, kind in self.columns.items():
+            np.asarray([values.get(column, 0)], dtype=kind).tofile(files['column_' + column])
+        files['names'].write(name.replace("\n", " ") + "\n")
+        for key, f in files.items():
+            if key != 'offsets':
+                f.flush()
+
+        # Committing the offset makes the track visible to readers
+        self._end += len(points)
+        np.asarray([self._end], dtype=np.int64).tofile(files['offsets'])
+        files['offsets'].flush()
+
+        index = self._count
+        self._count += 1
+        self.invalidate()
+        return index
+
+    def close(self) -> None:
+        if self.write_files is not None:
+            for f in self.write_files.values():
+                f.close()
+            self.write_files = None
+        self.invalidate()
+
+    def __enter__(self) -> 'PointStore':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_array(path: str, dtype) -> np.ndarray:
+    """Whole entries of a raw binary file; a partly written last entry is left out"""
+    if not os.path.exists(path):
+        return np.zeros(0, dtype=dtype)
+    dtype = np.dtype(dtype)
+    with open(path, 'rb') as f:
+        data = f.read()
+    return np.frombuffer(data[:len(data) // dtype.itemsize * dtype.itemsize], dtype=dtype)
+
+
+def map_array(path: str, dtype, shape: tuple) -> np.ndarray:
+    """Read-only memory map of the first prod(shape) entries of a raw binary file"""
+    if int(np.prod(shape)) == 0:
+        return np.zeros(shape, dtype=dtype)  # Empty maps are not allowed
+    return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+
+def truncate(path: str, size: int) -> None:
+    if os.path.exists(path) and os.path.getsize(path) > size:
+        with open(path, 'r+b') as f:
+            f.truncate(size)
+
+
+def pack_npy_files(paths: Sequence[str], directory: str, dtype: str = 'float32') -> PointStore:
+    """Pack per-track .npy files (as written by save_track_data) into a PointStore"""
+    with PointStore(directory, dtype=dtype) as store:
+        for path in paths:
+            store.append(np.load(path), name=os.path.splitext(os.path.basename(path))[0])
+    return store
@@ -0,0 +1,168 @@
+from typing import Dict, List, Tuple, Optional, Any, Sequence
+import math
+import numpy as np
+from utils.geometry import LANE_OFFSET, element_polyline
+
+# Layer colors match TrackCanvas so headless images look like the editor's
+TRACK_COLOR = (50, 50, 50)
+RIGHT_LANE_COLOR = (255, 255, 0)
+LEFT_LANE_COLOR = (50, 50, 255)
+
+
+class TrackRasterizer:
+    """
+    Render track elements straight into uint8 NumPy arrays, without pygame.
+
+    Lines are stamped with a round brush on a supersampled grid and box-filtered
+    down to the output resolution, which gives anti-aliased strokes. Several
+    tracks can be rendered in one call; their strokes are rasterized together.
+    """
+
+    def __init__(self, width: int = 1200, height: int = 800,
+                 world_size: Tuple[float, float] = (1200, 800),
+                 supersample: int = 4, line_width: float = 1.0,
+                 lane_offset: float = LANE_OFFSET, draw_lanes: bool = True,
+                 background: Tuple[int, int, int] = (255, 255, 255),
+                 grayscale: bool = False, max_batch: int = 16) -> None:
+        self.width = width
+        self.height = height
+        self.world_size = world_size
+        self.supersample = max(1, int(supersample))
+        self.line_width = line_width  # In output pixels
+        self.lane_offset = lane_offset  # In world pixels, see TrackCanvas.lane_offset
+        self.draw_lanes = draw_lanes
+        self.background = background
+        self.grayscale = grayscale
+        self.max_batch = max_batch  # Tracks rasterized per chunk, bounds scratch memory
+
+        # World -> output pixel transform: fit the world rect, keep aspect ratio
+        self.scale = min(width / world_size[0], height / world_size[1])
+        self.origin = ((width - world_size[0] * self.scale) / 2,
+                       (height - world_size[1] * self.scale) / 2)
+
+        # Round brush offsets on the supersampled grid
+        brush_radius = max(0.5, line_width * self.supersample / 2)
+        r = int(math.ceil(brush_radius))
+        by, bx = np.mgrid[-r:r + 1, -r:r + 1]
+        inside = bx * bx + by * by <= brush_radius * brush_radius
+        self.brush = np.stack([bx[inside], by[inside]], axis=1)
+
+    def layers(self) -> List[Tuple[float, Tuple[int, int, int]]]:
+        """(offset, color) for each drawn layer, in TrackCanvas drawing order"""
+        layers = [(0.0, TRACK_COLOR)]
+        if self.draw_lanes:
+            layers.append((self.lane_offset, RIGHT_LANE_COLOR))
+            layers.append((-self.lane_offset, LEFT_LANE_COLOR))
+        return layers
+
+    def render(self, track_elements: List[Dict[str, Any]]) -> np.ndarray:
+        """Render one track to an (H, W, 3) or (H, W) uint8 array"""
+        return self.render_batch([track_elements])[0]
+
+    def render_batch(self, tracks: Sequence[List[Dict[str, Any]]]) -> np.ndarray:
+        """Render many tracks to an (N, H, W, 3) or (N, H, W) uint8 array"""
+        channels = 1 if self.grayscale else 3
+        images = np.empty((len(tracks), self.height, self.width, channels), dtype=np.uint8)
+        for first in range(0, len(tracks), self.max_batch):
+            chunk = tracks[first:first + self.max_batch]
+            images[first:first + len(chunk)] = self._render_chunk(chunk)
+        if self.grayscale:
+            return images[..., 0]
+        return images
+
+    def _render_chunk(self, tracks: Sequence[List[Dict[str, Any]]]) -> np.ndarray:
+        layers = self.layers()
+        plane, pixel, alpha = self.sparse_coverage(tracks)
+
+        background = np.array(self.background, dtype=np.float32)
+        colors = np.array([color for _, color in layers], dtype=np.float32)
+        if self.grayscale:
+            # ITU-R 601 luma, the same weights PIL uses for mode "L"
+            weights = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+            background = (background @ weights)[None]
+            colors = (colors @ weights)[:, None]
+
+        images = np.empty((len(tracks), self.height, self.width, len(background)), dtype=np.uint8)
+        images[:] = np.rint(background).astype(np.uint8)
+        flat = images.reshape(-1, len(background))
+
+        # Composite layers over the background in drawing order, touching only
+        # the pixels a stroke actually covers
+        track = plane // len(layers)
+        for layer in range(len(layers)):
+            selected = plane % len(layers) == layer
+            index = track[selected] * (self.height * self.width) + pixel[selected]
+            a = alpha[selected, None]
+            blended = flat[index] * (1 - a) + colors[layer] * a
+            flat[index] = np.clip(np.rint(blended), 0, 255).astype(np.uint8)
+        return images
+
+    def coverage(self, tracks: Sequence[List[Dict[str, Any]]]) -> np.ndarray:
+        """Anti-aliased stroke coverage as a float32 (N, layers, H, W) array"""
+        n_planes = len(tracks) * len(self.layers())
+        plane, pixel, alpha = self.sparse_coverage(tracks)
+        coverage = np.zeros((n_planes, self.height * self.width), dtype=np.float32)
+        coverage[plane, pixel] = alpha
+        return coverage.reshape(len(tracks), -1, self.height, self.width)
+
+    def sparse_coverage(self, tracks: Sequence[List[Dict[str, Any]]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Covered output pixels as (plane, pixel, alpha) arrays, where plane is
+        track_index * len(layers) + layer_index and pixel is y * width + x.
+        """
+        layers = self.layers()
+        s = self.supersample
+        hs, ws = self.height * s, self.width * s
+        step = 0.5 / (self.scale * s)  # Half a subpixel, in world units
+
+        # Collect every stroke segment of every track/layer into flat arrays
+        starts, ends, ids = [], [], []
+        for track_index, elements in enumerate(tracks):
+            for layer_index, (offset, _) in enumerate(layers):
+                for element in elements:
+                    points = element_polyline(element, offset, max_step=4 * step)
+                    if len(points) < 2:
+                        continue
+                    starts.append(points[:-1])
+                    ends.append(points[1:])
+                    ids.append(np.full(len(points) - 1, track_index * len(layers) + layer_index))
+
+        if not starts:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0, dtype=np.float32)
+
+        samples, plane = sample_segments(np.concatenate(starts), np.concatenate(ends),
+                                         np.concatenate(ids), step)
+
+        # World -> supersampled pixel centers
+        px = np.floor((samples[:, 0] * self.scale + self.origin[0]) * s).astype(np.int64)
+        py = np.floor((samples[:, 1] * self.scale + self.origin[1]) * s).astype(np.int64)
+
+        # Stamp the brush and drop subpixels off the image
+        px = (px[:, None] + self.brush[None, :, 0]).ravel()
+        py = (py[:, None] + self.brush[None, :, 1]).ravel()
+        plane = np.repeat(plane, len(self.brush))
+        keep = (px >= 0) & (px < ws) & (py >= 0) & (py < hs)
+        px, py, plane = px[keep], py[keep], plane[keep]
+
+        # Each covered subpixel counts once, then box-filter down to output pixels
+        subpixels = np.unique((plane * hs + py) * ws + px)
+        plane = subpixels // (hs * ws)
+        py = (subpixels // ws) % hs
+        px = subpixels % ws
+        pixels, counts = np.unique((plane * self.height + py // s) * self.width + px // s,
+                                   return_counts=True)
+        alpha = counts.astype(np.float32) / (s * s)
+        return pixels // (self.height * self.width), pixels % (self.height * self.width), alpha
+
+
+def sample_segments(starts: np.ndarray, ends: np.ndarray, ids: np.ndarray,
+                    step: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Evenly sample line segments at most step apart, carrying each segment's id"""
+    lengths = np.hypot(*(ends - starts).T)
+    counts = np.ceil(lengths / step).astype(np.int64) + 1
+    segment = np.repeat(np.arange(len(starts)), counts)
+    first = np.cumsum(counts) - counts
+    t = (np.arange(counts.sum()) - first[segment]) / np.maximum(counts[segment] - 1, 1)
+    samples = starts[segment] + (ends[segment] - starts[segment]) * t[:, None]
+    return samples, ids[segment]
@@ -0,0 +1,536 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import base64
+import json
+import multiprocessing
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Local HTTP service for on-demand procedural tracks. A pool of worker
+# processes each keeps a warm TrackDataGenerator (imported, rasterizer built),
+# so tools ask over HTTP instead of importing pygame themselves. Every
+# requested sample becomes a job; a batcher thread packs the jobs of
+# concurrent requests into shared work units of up to unit_size jobs, so many
+# small requests cost a few pool round trips and batched image renders rather
+# than one each. Samples are seeded like sharded datasets: (seed, number)
+# with the default ranges gives the same track as `track-shards`.
+#
+#   POST /generate  {"count": 4, "seed": 7, "ranges": {...}, "image": true}
+#   GET  /metrics   latency percentiles, throughput, queue and unit stats
+#   GET  /health
+#
+# Only the server and its workers import the generator (and pygame); the
+# client at the bottom needs nothing beyond the standard library.
+
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 1 << 20
+
+
+def parse_request(body: Dict[str, Any], max_count: int) -> Dict[str, Any]:
+    """Validated generate options with defaults filled in; ValueError on bad input"""
+    from src.data_generation.track_generator import DEFAULT_TRACK_RANGES
+
+    if not isinstance(body, dict):
+        raise ValueError("Request body must be a JSON object")
+    unknown = set(body) - {'count', 'seed', 'first', 'ranges', 'points', 'point_spacing',
+                           'image', 'image_size'}
+    if unknown:
+        raise ValueError(f"Unknown options: {', '.join(sorted(unknown))}")
+
+    count = body.get('count', 1)
+    if not isinstance(count, int) or not 1 <= count <= max_count:
+        raise ValueError(f"count must be an integer from 1 to {max_count}")
+    seed = body.get('seed')
+    if seed is None:
+        seed = random.randrange(2 ** 31)  # Returned with the tracks, so they can be asked for again
+    first = body.get('first', 0)
+    if not isinstance(seed, int) or not isinstance(first, int) or seed < 0 or first < 0:
+        raise ValueError("seed and first must be non-negative integers")
+
+    ranges = body.get('ranges') or {}
+    if not isinstance(ranges, dict) or set(ranges) - set(DEFAULT_TRACK_RANGES):
+        raise ValueError(f"ranges may only set {', '.join(DEFAULT_TRACK_RANGES)}")
+    for key in ('num_segments', 'straight_length', 'curve_radius'):
+        if key in ranges:
+            bounds = ranges[key]
+            if (not isinstance(bounds, list) or len(bounds) != 2
+                    or not all(isinstance(v, int) for v in bounds) or not 1 <= bounds[0] < bounds[1]):
+                raise ValueError(f"ranges.{key} must be [low, high) with 1 <= low < high")
+    if 'curve_angles' in ranges:
+        angles = ranges['curve_angles']
+        if not isinstance(angles, list) or not angles or not all(
+                isinstance(v, (int, float)) and 0 < v <= 360 for v in angles):
+            raise ValueError("ranges.curve_angles must be a list of angles in (0, 360]")
+    if 'straight_probability' in ranges:
+        probability = ranges['straight_probability']
+        if not isinstance(probability, (int, float)) or not 0 <= probability <= 1:
+            raise ValueError("ranges.straight_probability must be in [0, 1]")
+
+    image_size = body.get('image_size', [1200, 800])
+    if (not isinstance(image_size, list) or len(image_size) != 2
+            or not all(isinstance(v, int) and 16 <= v <= 4096 for v in image_size)):
+        raise ValueError("image_size must be [width, height], each 16 to 4096")
+    point_spacing = body.get('point_spacing', 1.0)
+    if not isinstance(point_spacing, (int, float)) or point_spacing <= 0:
+        raise ValueError("point_spacing must be positive")
+
+    return {
+        'count': count, 'seed': seed, 'first': first, 'ranges': ranges,
+        'points': bool(body.get('points', True)), 'point_spacing': float(point_spacing),
+        'image': bool(body.get('image', False)), 'image_size': image_size,
+    }
+
+
+# Worker process state, set up once by init_worker
+WORKER: Dict[str, Any] = {}
+
+
+def init_worker(ready: Optional[Any] = None) -> None:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    from src.data_generation.track_generator import TrackDataGenerator
+    # Nothing is written, but the generator wants an output directory
+    generator = TrackDataGenerator(output_dir=os.path.join(tempfile.gettempdir(), "track-service"))
+    generator.rasterizer  # Built now rather than on the first image request
+    WORKER['generator'] = generator
+    WORKER['rasterizers'] = {(generator.width, generator.height): generator.rasterizer}
+    WORKER['ready'] = ready
+
+
+def worker_ready(timeout: float) -> int:
+    """
+    The pid of a warm worker. Every call waits at the barrier init_worker
+    got until one call per worker has arrived, so no worker answers twice
+    """
+    if WORKER['ready'] is not None:
+        WORKER['ready'].wait(timeout)
+    return os.getpid()
+
+
+def run_work_unit(jobs: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], float]:
+    """
+    Generate one work unit in a worker process: (results in job order,
+    seconds spent). Images of the unit are rendered in one batch per size.
+    """
+    from src.data_generation.rasterizer import TrackRasterizer
+    from src.export.png import encode_png
+    from utils.geometry import resample_polyline, track_polyline
+
+    start = time.perf_counter()
+    generator = WORKER['generator']
+    results, to_render = [], {}
+    for job in jobs:
+        result = {'seed': job['seed'], 'number': job['number']}
+        params = generator.seeded_track_params(job['number'], job['ranges'], seed=job['seed'])
+        if params is None:
+            result['error'] = f"No in-bounds track after {generator.max_sample_attempts} attempts"
+            results.append(result)
+            continue
+        result['params'] = params
+        result['description'] = generator.generate_description(params)
+        elements = generator.track_elements_from_params(params)
+        if job['points']:
+            points = resample_polyline(track_polyline(elements), job['point_spacing'])
+            result['points'] = points.round(3).tolist()
+        if job['image']:
+            to_render.setdefault(tuple(job['image_size']), []).append((result, elements))
+        results.append(result)
+
+    for size, items in to_render.items():
+        rasterizer = WORKER['rasterizers'].get(size)
+        if rasterizer is None:
+            rasterizer = WORKER['rasterizers'][size] = TrackRasterizer(
+                size[0], size[1], world_size=(generator.width, generator.height),
+                lane_offset=generator.lane_offset)
+        images = rasterizer.render_batch([elements for _, elements in items])
+        for (result, _), image in zip(items, images):
+            result['image_png'] = base64.b64encode(encode_png(image)).decode('ascii')
+    return results, time.perf_counter() - start
+
+
+class PendingRequest:
+    """One /generate call: its jobs' results fill in as their work units finish"""
+
+    def __init__(self, options: Dict[str, Any]) -> None:
+        self.options = options
+        self.results: List[Optional[Dict[str, Any]]] = [None] * options['count']
+        self.remaining = options['count']
+        self.error: Optional[str] = None
+        self.units = set()  # Ids of the work units carrying this request's jobs
+        self.submitted = time.perf_counter()
+        self.dispatched: Optional[float] = None  # First of its jobs handed to a worker
+        self.finished = threading.Event()
+
+    def jobs(self) -> List[Tuple['PendingRequest', int, Dict[str, Any]]]:
+        o = self.options
+        return [(self, index, {'seed': o['seed'], 'number': o['first'] + index, 'ranges': o['ranges'],
+                               'points': o['points'], 'point_spacing': o['point_spacing'],
+                               'image': o['image'], 'image_size': o['image_size']})
+                for index in range(o['count'])]
+
+
+class ServiceMetrics:
+    """Counters plus the latency of the last `window` requests, safe to update from any thread"""
+
+    def __init__(self, window: int = 1000, rate_window: float = 60.0) -> None:
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.rate_window = rate_window  # Seconds the throughput rates are averaged over
+        self.recent = deque(maxlen=window)  # (finished, latency, queued, samples) of recent requests
+        self.requests = 0
+        self.failed = 0
+        self.rejected = 0  # Bad input, never queued
+        self.samples = 0
+        self.units = 0
+        self.unit_jobs = 0
+        self.unit_requests = 0  # Sum over units of the requests sharing each unit
+        self.worker_seconds = 0.0
+
+    def record_request(self, request: PendingRequest) -> None:
+        now = time.perf_counter()
+        with self.lock:
+            self.requests += 1
+            if request.error is not None:
+                self.failed += 1
+                return
+            self.samples += len(request.results)
+            queued = (request.dispatched or now) - request.submitted
+            self.recent.append((now, now - request.submitted, queued, len(request.results)))
+
+    def record_rejected(self) -> None:
+        with self.lock:
+            self.rejected += 1
+
+    def record_unit(self, jobs: int, requests: int, seconds: float) -> None:
+        with self.lock:
+            self.units += 1
+            self.unit_jobs += jobs
+            self.unit_requests += requests
+            self.worker_seconds += seconds
+
+    def snapshot(self, **gauges: Any) -> Dict[str, Any]:
+        now = time.perf_counter()
+        with self.lock:
+            recent = list(self.recent)
+            stats = {
+                'uptime_s': now - self.started,
+                'requests': self.requests,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'samples': self.samples,
+                'units': self.units,
+                'mean_unit_jobs': self.unit_jobs / self.units if self.units else 0.0,
+                'mean_unit_requests': self.unit_requests / self.units if self.units else 0.0,
+                'worker_ms_per_sample': 1000 * self.worker_seconds / self.unit_jobs if self.unit_jobs else 0.0,
+            }
+        latencies = sorted(latency for _, latency, _, _ in recent)
+
+        def percentile(p: float) -> float:
+            return 1000 * latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else 0.0
+
+        stats['latency_ms'] = {
+            'mean': 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+            'p50': percentile(0.50), 'p95': percentile(0.95), 'p99': percentile(0.99),
+            'max': 1000 * latencies[-1] if latencies else 0.0,
+            'queued_mean': 1000 * sum(q for _, _, q, _ in recent) / len(recent) if recent else 0.0,
+            'window': len(latencies),
+        }
+        # Rates over the last rate_window seconds (or the uptime, if shorter)
+        span = min(self.rate_window, now - self.started) or 1.0
+        in_window = [samples for finished, _, _, samples in recent if now - finished <= span]
+        stats['throughput'] = {
+            'requests_per_s': len(in_window) / span,
+            'samples_per_s': sum(in_window) / span,
+            'window_s': span,
+        }
+        stats.update(gauges)
+        return stats
+
+
+class GenerationService:
+    """
+    The pool, the batcher and the HTTP server. start() starts and warms
+    every worker before the batcher and HTTP threads exist, then serves on host:port (port 0 picks
+    a free one, see .port). Use as a context manager or call stop().
+
+    A work unit is sent once it holds unit_size jobs or batch_window seconds
+    after its first job; at most max_units_in_flight units are in the pool,
+    so under load jobs wait in the queue and the next units come out full.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT, workers: int = 2,
+                 unit_size: int = 16, batch_window: float = 0.005,
+                 max_units_in_flight: Optional[int] = None, max_count: int = 1000,
+                 request_timeout: float = 120.0, quiet: bool = True) -> None:
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.unit_size = unit_size
+        self.batch_window = batch_window
+        self.max_units_in_flight = max_units_in_flight or 2 * workers  # One running, one ready, per worker
+        self.max_count = max_count
+        self.request_timeout = request_timeout
+        self.worker_timeout = 60.0  # Seconds start() waits for the workers to warm up
+        self.quiet = quiet
+        self.metrics = ServiceMetrics()
+        self.jobs: queue.Queue = queue.Queue()
+        self.slots = threading.Semaphore(self.max_units_in_flight)
+        self.units_in_flight = 0
+        self.next_unit = 0
+        self.lock = threading.Lock()
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.worker_pids: List[int] = []  # Workers that finished init_worker in start()
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.threads: List[threading.Thread] = []
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> 'GenerationService':
+        # One ready call per worker, held at a barrier until all have arrived:
+        # every process has run init_worker before the first request comes in
+        ready = multiprocessing.Barrier(self.workers)
+        self.pool = ProcessPoolExecutor(self.workers, initializer=init_worker, initargs=(ready,))
+        futures = [self.pool.submit(worker_ready, self.worker_timeout) for _ in range(self.workers)]
+        pids = set(future.result() for future in futures if not future.exception())
+        if len(pids) != self.workers:
+            # shutdown(cancel_futures=True) needs Python 3.9
+            for future in futures:
+                future.cancel()
+            self.pool.shutdown(wait=False)
+            raise RuntimeError(f"Only {len(pids)} of {self.workers} workers started")
+        self.worker_pids = sorted(pids)
+        self.server = ServiceHTTPServer((self.host, self.port), ServiceRequestHandler, self)
+        self.port = self.server.server_address[1]
+        self.threads = [threading.Thread(target=self.batch_loop, name="service-batcher", daemon=True),
+                        threading.Thread(target=self.server.serve_forever, name="service-http", daemon=True)]
+        for thread in self.threads:
+            thread.start()
+        print(f"Track service on {self.url} ({len(pids)} warm workers)")
+        return self
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+
+    def __enter__(self) -> 'GenerationService':
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    def generate(self, options: Dict[str, Any]) -> PendingRequest:
+        """Queue the jobs of one request and wait for them; runs on an HTTP thread"""
+        request = PendingRequest(options)
+        for job in request.jobs():
+            self.jobs.put(job)
+        if not request.finished.wait(self.request_timeout):
+            request.error = f"Timed out after {self.request_timeout:.0f}s"
+        self.metrics.record_request(request)
+        return request
+
+    def batch_loop(self) -> None:
+        stopping = False
+        while not stopping:
+            self.slots.acquire()  # Wait for room in the pool before collecting a unit
+            job = self.jobs.get()
+            if job is None:
+                break
+            unit = [job]
+            deadline = time.perf_counter() + self.batch_window
+            while len(unit) < self.unit_size:
+                try:
+                    job = self.jobs.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                unit.append(job)
+            self.dispatch(unit)
+
+    def dispatch(self, unit: List[Tuple[PendingRequest, int, Dict[str, Any]]]) -> None:
+        now = time.perf_counter()
+        with self.lock:
+            unit_id = self.next_unit
+            self.next_unit += 1
+            self.units_in_flight += 1
+        requests = {id(request): request for request, _, _ in unit}
+        for request in requests.values():
+            request.units.add(unit_id)
+            if request.dispatched is None:
+                request.dispatched = now
+        try:
+            future = self.pool.submit(run_work_unit, [job for _, _, job in unit])
+        except RuntimeError as e:  # Pool shut down under us
+            future = Future()
+            future.set_exception(e)
+        future.add_done_callback(lambda done: self.unit_done(unit, len(requests), done))
+
+    def unit_done(self, unit: List[Tuple[PendingRequest, int, Dict[str, Any]]], requests: int,
+                  future: Future) -> None:
+        with self.lock:
+            self.units_in_flight -= 1
+        self.slots.release()
+        try:
+            results, seconds = future.result()
+        except Exception as e:
+            print(f"Work unit of {len(unit)} jobs failed: {e}")
+            results, seconds = None, 0.0
+        self.metrics.record_unit(len(unit), requests, seconds)
+
+        for position, (request, index, _) in enumerate(unit):
+            with self.lock:
+                if results is None:
+                    request.error = request.error or "Generation failed"
+                else:
+                    request.results[index] = results[position]
+                request.remaining -= 1
+                done = request.remaining == 0
+            if done:
+                request.finished.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            in_flight = self.units_in_flight
+        return self.metrics.snapshot(workers=self.workers, warm_workers=len(self.worker_pids),
+                                     unit_size=self.unit_size,
+                                     queued_jobs=self.jobs.qsize(), units_in_flight=in_flight)
+
+
+class ServiceHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], handler: type, service: GenerationService) -> None:
+        self.service = service
+        super().__init__(address, handler)
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    server: ServiceHTTPServer
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self.send_json(200, {'status': 'ok'})
+        elif self.path == "/metrics":
+            self.send_json(200, self.server.service.stats())
+        else:
+            self.send_json(404, {'error': f"No such endpoint: {self.path}"})
+
+    def do_POST(self) -> None:
+        service = self.server.service
+        if self.path != "/generate":
+            self.send_json(404, {'error': f"No such endpoint: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            if length > MAX_BODY_BYTES:
+                raise ValueError(f"Request body over {MAX_BODY_BYTES} bytes")
+            options = parse_request(json.loads(self.rfile.read(length) or b"{}"), service.max_count)
+        except ValueError as e:  # Includes malformed JSON
+            service.metrics.record_rejected()
+            self.send_json(400, {'error': str(e)})
+            return
+
+        request = service.generate(options)
+        if request.error is not None:
+            self.send_json(500, {'error': request.error})
+            return
+        now = time.perf_counter()
+        self.send_json(200, {
+            'seed': options['seed'],
+            'tracks': request.results,
+            'timing': {'latency_ms': 1000 * (now - request.submitted),
+                       'queued_ms': 1000 * ((request.dispatched or now) - request.submitted),
+                       'units': len(request.units)},
+        })
+
+    def send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if not self.server.service.quiet:
+            super().log_message(format, *args)
+
+
+class ServiceClient:
+    """Minimal client for the service, standard library only"""
+
+    def __init__(self, url: str = f"http://127.0.0.1:{DEFAULT_PORT}", timeout: float = 120.0) -> None:
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def generate(self, count: int = 1, seed: Optional[int] = None, **options: Any) -> Dict[str, Any]:
+        """POST /generate; options as in parse_request. Image PNGs come base64-encoded in 'image_png'"""
+        body = {'count': count, **options}
+        if seed is not None:
+            body['seed'] = seed
+        return self.request("POST", "/generate", body)
+
+    def metrics(self) -> Dict[str, Any]:
+        return self.request("GET", "/metrics")
+
+    def request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            message = json.loads(e.read() or b"{}").get('error', e.reason)
+            raise RuntimeError(f"{method} {path} failed ({e.code}): {message}") from None
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve procedural tracks over HTTP on localhost")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="Generator processes (default: CPU count - 1)")
+    parser.add_argument("--unit-size", type=int, default=16, help="Most jobs per work unit")
+    parser.add_argument("--batch-window-ms", type=float, default=5.0,
+                        help="How long a work unit waits for more jobs after its first")
+    parser.add_argument("--max-count", type=int, default=1000, help="Most tracks per request")
+    parser.add_argument("--verbose", action="store_true", help="Log every HTTP request")
+    args = parser.parse_args(argv)
+
+    service = GenerationService(args.host, args.port, args.workers, args.unit_size,
+                                args.batch_window_ms / 1000, max_count=args.max_count,
+                                quiet=not args.verbose)
+    service.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        print(json.dumps(service.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+from src.data_generation.point_store import PointStore
+from src.data_generation.track_index import rebuild_index
+from src.export.async_exporter import replace_atomically
+
+# Sharded dataset generation. Every node runs a TrackDataGenerator with the
+# same seed and its own shard index; sample n of the dataset is drawn from a
+# generator seeded by (seed, n) and belongs to shard n % shard_count, so the
+# shards are disjoint and any of them can be regenerated alone. Each shard
+# directory ends up with a shard_manifest.json listing its samples. merge
+# checks the manifests against each other and against the files, then
+# combines the shards into one dataset directory with one point store, one
+# index and a dataset_manifest.json.
+
+MANIFEST_FILE = "shard_manifest.json"
+DATASET_MANIFEST_FILE = "dataset_manifest.json"
+
+# Settings every shard of one dataset must share
+SHARED_SETTINGS = ['seed', 'shard_count', 'num_samples', 'variants_per_track', 'image_format']
+
+
+def track_hash(track_params: Dict[str, Any]) -> str:
+    """Hash of what makes a track: its segments and start pose, not its name or timestamps"""
+    key = {'segments': track_params['segments'], 'start': track_params.get('start')}
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """'2/8' -> (2, 8)"""
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected INDEX/COUNT like 0/4, got {spec!r}")
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Shard index {index} out of range for {count} shards")
+    return index, count
+
+
+def generate_shard(output_dir: str, seed: int, shard_index: int, shard_count: int,
+                   num_samples: int, variants_per_track: int = 0,
+                   image_format: str = "png") -> Dict[str, Any]:
+    # Imported here: track_generator imports this module for the manifest helpers
+    from src.data_generation.track_generator import TrackDataGenerator
+    generator = TrackDataGenerator(output_dir, image_format, seed=seed,
+                                   shard_index=shard_index, shard_count=shard_count)
+    return generator.generate_shard(num_samples, variants_per_track)
+
+
+def load_manifest(shard_dir: str) -> Dict[str, Any]:
+    path = os.path.join(shard_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise ValueError(f"No {MANIFEST_FILE} in {shard_dir}; did the shard finish?")
+    with open(path) as f:
+        return json.load(f)
+
+
+def check_shards(shard_dirs: Sequence[str], drop_duplicates: bool = False,
+                 allow_partial: bool = False) -> Dict[str, Any]:
+    """
+    Cross-check shard manifests without writing anything. Errors (the merge
+    refuses to run): shards with different settings, the same shard twice,
+    missing shards unless allow_partial, slices that don't add up to the
+    shard's share of num_samples, samples outside their shard's slice or in
+    two shards, files that are missing or changed since the manifest.
+    Samples with the same track under different IDs are reported as
+    duplicate_tracks and kept, or dropped with drop_duplicates.
+    """
+    manifests = [(shard_dir, load_manifest(shard_dir)) for shard_dir in shard_dirs]
+    if not manifests:
+        raise ValueError("No shards to merge")
+    settings = {key: manifests[0][1][key] for key in SHARED_SETTINGS}
+    report: Dict[str, Any] = {**settings, 'shards': [], 'missing_shards': [], 'errors': [],
+                              'warnings': [], 'duplicate_ids': [], 'duplicate_tracks': [],
+                              'missing_samples': [], 'selected': []}
+    errors, warnings = report['errors'], report['warnings']
+
+    by_index: Dict[int, Tuple[str, Dict[str, Any]]] = {}
+    for shard_dir, manifest in manifests:
+        for key, value in settings.items():
+            if manifest[key] != value:
+                errors.append(f"{shard_dir}: {key} is {manifest[key]!r}, "
+                              f"{manifests[0][0]} has {value!r}")
+        if manifest['shard_index'] in by_index:
+            errors.append(f"Shard {manifest['shard_index']} given twice: "
+                          f"{by_index[manifest['shard_index']][0]} and {shard_dir}")
+            continue
+        by_index[manifest['shard_index']] = (shard_dir, manifest)
+    if errors:
+        return report  # Nothing below means anything across mismatched shards
+
+    shard_count, num_samples = settings['shard_count'], settings['num_samples']
+    report['shards'] = sorted(by_index)
+    report['missing_shards'] = sorted(set(range(shard_count)) - set(by_index))
+    if report['missing_shards']:
+        message = f"Missing shards {report['missing_shards']} of {shard_count}"
+        (warnings if allow_partial else errors).append(message)
+
+    seen_ids: Dict[str, str] = {}
+    seen_tracks: Dict[str, str] = {}
+    for shard_index in sorted(by_index):
+        shard_dir, manifest = by_index[shard_index]
+        samples = manifest['samples']
+
+        # Every sample number of the slice is either generated or listed as missing
+        expected = len(range(shard_index, num_samples, shard_count))
+        numbers = {entry['number'] for entry in samples.values()}
+        accounted = len(numbers | set(manifest['missing']))
+        if accounted != expected:
+            errors.append(f"Shard {shard_index}: {accounted} sample numbers accounted for, "
+                          f"expected {expected}")
+        report['missing_samples'].extend(manifest['missing'])
+
+        for sample_id, entry in sorted(samples.items()):
+            number = entry['number']
+            if number % shard_count != shard_index or not 0 <= number < num_samples:
+                errors.append(f"Shard {shard_index}: {sample_id} has sample number {number}, "
+                              f"outside the shard's slice")
+            if sample_id in seen_ids:
+                report['duplicate_ids'].append([sample_id, seen_ids[sample_id], shard_dir])
+                errors.append(f"{sample_id} is in both {seen_ids[sample_id]} and {shard_dir}")
+                continue
+            seen_ids[sample_id] = shard_dir
+
+            missing_files = [path for path in entry['files'].values()
+                             if not os.path.exists(os.path.join(shard_dir, path))]
+            if missing_files:
+                errors.append(f"{shard_dir}: {sample_id} is missing {', '.join(missing_files)}")
+                continue
+            with open(os.path.join(shard_dir, entry['files']['params'])) as f:
+                if track_hash(json.load(f)) != entry['track_hash']:
+                    errors.append(f"{shard_dir}: {sample_id} changed since the manifest was written")
+                    continue
+
+            first = seen_tracks.setdefault(entry['track_hash'], sample_id)
+            if first != sample_id:
+                report['duplicate_tracks'].append([first, sample_id])
+                if drop_duplicates:
+                    continue
+            report['selected'].append((number, sample_id, shard_dir, entry))
+
+        # Samples on disk the manifest doesn't list, e.g. from an earlier run
+        on_disk = {os.path.splitext(os.path.basename(path))[0]
+                   for path in glob.glob(os.path.join(shard_dir, "processed", "track_*.json"))}
+        stray = sorted(on_disk - set(samples))
+        if stray:
+            warnings.append(f"{shard_dir}: {len(stray)} samples not in its manifest are ignored, "
+                            f"e.g. {stray[0]}")
+
+    report['missing_samples'].sort()
+    return report
+
+
+def link_or_copy(source: str, destination: str) -> None:
+    """Hard link where possible (same filesystem), copy otherwise"""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def merge_shards(shard_dirs: Sequence[str], output_dir: str, drop_duplicates: bool = False,
+                 allow_partial: bool = False) -> Dict[str, Any]:
+    """
+    Combine shard directories into one dataset in output_dir (which must not
+    hold a dataset yet). Nothing is written if check_shards finds errors.
+    Samples go in sample-number order, so the merged point store and index
+    come out the same however the dataset was sharded. Returns the report
+    of check_shards plus the merged counts.
+    """
+    report = check_shards(shard_dirs, drop_duplicates, allow_partial)
+    selected = sorted(report.pop('selected'), key=lambda item: (item[0], item[1]))
+    report['merged'] = 0
+    if report['errors']:
+        return report
+
+    if glob.glob(os.path.join(output_dir, "processed", "track_*.json")):
+        report['errors'].append(f"{output_dir} already contains samples")
+        return report
+    for name in ("raw_tracks", "processed", "descriptions"):
+        os.makedirs(os.path.join(output_dir, name), exist_ok=True)
+
+    # Point rows are copied from each shard's store rather than recomputed
+    point_store = PointStore(os.path.join(output_dir, "points"), columns={'num_segments': 'int32'})
+    shard_points: Dict[str, Tuple[PointStore, Dict[str, int]]] = {}
+    samples = {}
+    try:
+        for number, sample_id, shard_dir, entry in selected:
+            for path in entry['files'].values():
+                link_or_copy(os.path.join(shard_dir, path), os.path.join(output_dir, path))
+
+            if shard_dir not in shard_points:
+                store = PointStore(os.path.join(shard_dir, "points"))
+                shard_points[shard_dir] = (store, {name: row for row, name in enumerate(store.names)})
+            store, rows = shard_points[shard_dir]
+            if sample_id in rows:
+                row = rows[sample_id]
+                point_store.append(store[row], name=sample_id,
+                                   num_segments=int(store.column('num_segments')[row]))
+            else:
+                report['warnings'].append(f"{shard_dir}: no points for {sample_id}")
+            samples[sample_id] = entry
+    finally:
+        point_store.close()
+
+    index = rebuild_index(output_dir)
+    indexed = len(index)
+    index.close()
+    report['merged'] = len(samples)
+    report['indexed'] = indexed
+    if indexed != len(samples):
+        report['errors'].append(f"Index holds {indexed} samples, merged {len(samples)}")
+
+    manifest = {key: report[key] for key in SHARED_SETTINGS}
+    manifest.update({
+        'shards': report['shards'],
+        'missing_shards': report['missing_shards'],
+        'missing_samples': report['missing_samples'],
+        'duplicate_tracks': report['duplicate_tracks'],
+        'dropped_duplicates': drop_duplicates,
+        'samples': samples,
+        'created': datetime.now().isoformat(timespec="seconds"),
+    })
+
+    def write_manifest(temp_path: str) -> None:
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    replace_atomically(os.path.join(output_dir, DATASET_MANIFEST_FILE), write_manifest)
+    return report
+
+
+def run_local(output_dir: str, seed: int, shard_count: int, num_samples: int,
+              variants_per_track: int = 0, image_format: str = "png") -> List[str]:
+    """
+    Run every shard as its own process, the way separate nodes would, with
+    shard k in output_dir/shard-k and its output in generate.log there.
+    Returns the shard directories.
+    """
+    repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    shard_dirs = [os.path.join(os.path.abspath(output_dir), f"shard-{index}")
+                  for index in range(shard_count)]
+    processes = []
+    for index, shard_dir in enumerate(shard_dirs):
+        os.makedirs(shard_dir, exist_ok=True)
+        log = open(os.path.join(shard_dir, "generate.log"), 'w')
+        command = [sys.executable, "-m", "src.data_generation.shards", "generate", shard_dir,
+                   "--seed", str(seed), "--shard", f"{index}/{shard_count}",
+                   "--num-samples", str(num_samples), "--variants", str(variants_per_track),
+                   "--image-format", image_format]
+        processes.append((index, log, subprocess.Popen(command, cwd=repo_root, stdout=log,
+                                                       stderr=subprocess.STDOUT)))
+    failed = []
+    for index, log, process in processes:
+        if process.wait() != 0:
+            failed.append(index)
+        log.close()
+    if failed:
+        raise RuntimeError(f"Shards {failed} failed, see generate.log in their directories")
+    return shard_dirs
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"Shards {report['shards']} of {report['shard_count']} (seed {report['seed']}, "
+          f"{report['num_samples']} samples)")
+    for message in report['warnings']:
+        print(f"Warning: {message}")
+    for message in report['errors']:
+        print(f"Error: {message}")
+    if report['missing_samples']:
+        print(f"{len(report['missing_samples'])} sample numbers produced no valid track")
+    if report['duplicate_tracks']:
+        print(f"{len(report['duplicate_tracks'])} duplicate tracks, e.g. "
+              f"{' = '.join(report['duplicate_tracks'][0])}")
+    if 'merged' in report:
+        print(f"Merged {report['merged']} samples")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Generate a shard of a seeded dataset, or merge shards")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_dataset_options(subparser: argparse.ArgumentParser) -> None:
+        subparser.add_argument("--seed", type=int, required=True, help="Global seed, the same on every node")
+        subparser.add_argument("--num-samples", type=int, required=True, help="Samples in the whole dataset")
+        subparser.add_argument("--variants", type=int, default=0, help="Augmented variants per sample")
+        subparser.add_argument("--image-format", default="png")
+
+    generate_parser = subparsers.add_parser("generate", help="Generate one shard")
+    generate_parser.add_argument("output_dir")
+    generate_parser.add_argument("--shard", type=parse_shard, required=True, metavar="INDEX/COUNT",
+                                 help="This node's shard, e.g. 0/4")
+    add_dataset_options(generate_parser)
+
+    merge_parser = subparsers.add_parser("merge", help="Check shards and merge them into one dataset")
+    merge_parser.add_argument("output_dir")
+    merge_parser.add_argument("shard_dirs", nargs="+")
+    merge_parser.add_argument("--check", action="store_true", help="Only check the shards, write nothing")
+    merge_parser.add_argument("--drop-duplicates", action="store_true",
+                              help="Keep only the first of samples with identical tracks")
+    merge_parser.add_argument("--allow-partial", action="store_true",
+                              help="Merge even if some shards are missing")
+
+    local_parser = subparsers.add_parser("local", help="Run all shards as local processes, then merge")
+    local_parser.add_argument("output_dir", help="Shards go to output_dir/shard-K, the merge to output_dir/merged")
+    local_parser.add_argument("--shards", type=int, required=True)
+    add_dataset_options(local_parser)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    start = time.perf_counter()
+    if args.command == "generate":
+        shard_index, shard_count = args.shard
+        generate_shard(args.output_dir, args.seed, shard_index, shard_count, args.num_samples,
+                       args.variants, args.image_format)
+        return
+
+    if args.command == "local":
+        shard_dirs = run_local(args.output_dir, args.seed, args.shards, args.num_samples,
+                               args.variants, args.image_format)
+        print(f"Generated {args.shards} shards in {time.perf_counter() - start:.1f}s")
+        report = merge_shards(shard_dirs, os.path.join(args.output_dir, "merged"))
+    elif args.check:
+        report = check_shards(args.shard_dirs, args.drop_duplicates, args.allow_partial)
+        report.pop('selected')
+    else:
+        report = merge_shards(args.shard_dirs, args.output_dir, args.drop_duplicates, args.allow_partial)
+    print_report(report)
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+    if report['errors']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import time
+
+# Asyncio orchestration of multi-stage work. Stages run concurrently and are
+# connected by bounded queues, so a slow stage backs the others up instead of
+# letting work pile up in memory. CPU- or I/O-heavy stages run their function
+# on their own executor, everything else runs on the event loop.
+
+
+class Stage:
+    """
+    One pipeline step: func(item) -> item, or None to drop the item.
+
+    With batch_size > 1 func receives a list of up to batch_size items that
+    were waiting together and returns a list. executor is None (run on the
+    event loop, for cheap steps), "thread" or "process"; the stage gets a
+    pool of `workers` for itself so its utilization is meaningful.
+    """
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1,
+                 executor: Optional[str] = None, queue_size: int = 8, batch_size: int = 1,
+                 on_close: Optional[Callable[[], None]] = None) -> None:
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.executor_kind = executor
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.on_close = on_close  # Runs on the stage's executor after its last item
+        self.executor: Optional[Executor] = None
+
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0  # Waiting for room in the next stage's queue
+        self.depth_samples = 0
+        self.depth_total = 0
+        self.depth_max = 0
+
+    def start_executor(self) -> None:
+        if self.executor_kind == "thread":
+            self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix=self.name)
+        elif self.executor_kind == "process":
+            self.executor = ProcessPoolExecutor(self.workers)
+
+    async def call(self, loop: asyncio.AbstractEventLoop, func: Callable, *args: Any) -> Any:
+        if self.executor is None:
+            return func(*args)
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    def record_depth(self, depth: int) -> None:
+        self.depth_samples += 1
+        self.depth_total += depth
+        self.depth_max = max(self.depth_max, depth)
+
+    def stats(self, elapsed: float) -> Dict[str, Any]:
+        return {
+            'workers': self.workers,
+            'executor': self.executor_kind or "loop",
+            'processed': self.processed,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'batches': self.batches,
+            'utilization': self.busy_seconds / (elapsed * self.workers) if elapsed else 0.0,
+            'mean_ms': 1000 * self.busy_seconds / self.batches if self.batches else 0.0,
+            'blocked_s': self.blocked_seconds,
+            'mean_queue_depth': self.depth_total / self.depth_samples if self.depth_samples else 0.0,
+            'max_queue_depth': self.depth_max,
+            'queue_size': self.queue_size,
+        }
+
+
+DONE = object()  # End-of-stream marker, one per downstream worker
+
+
+class StagePipeline:
+    """
+    Runs items from a source through stages in order.
+
+    run() feeds the source into the first stage's queue (stopping early once
+    stop() is called), drains the last stage and returns per-stage stats:
+    items processed and dropped, utilization (busy time over wall time times
+    workers), time blocked on a full downstream queue, and the input queue
+    depth sampled every sample_interval seconds. A stage that sits near its
+    queue_size with high utilization is the one that needs more workers.
+    """
+
+    def __init__(self, stages: List[Stage], sample_interval: float = 0.01) -> None:
+        self.stages = stages
+        self.sample_interval = sample_interval
+        self.stopped = False
+        self.elapsed = 0.0
+
+    def stop(self) -> None:
+        """Feed no more source items; items already inside still finish"""
+        self.stopped = True
+
+    def run(self, source: Iterable[Any]) -> Dict[str, Any]:
+        return asyncio.run(self.run_async(source))
+
+    async def run_async(self, source: Iterable[Any]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        queues.append(asyncio.Queue())  # Output of the last stage, drained below
+        start = time.perf_counter()
+
+        for stage in self.stages:
+            stage.start_executor()
+        try:
+            remaining = [stage.workers for stage in self.stages]
+            workers = [asyncio.create_task(self.worker(loop, index, queues, remaining))
+                       for index, stage in enumerate(self.stages) for _ in range(stage.workers)]
+            feeder = asyncio.create_task(self.feed(source, queues[0]))
+            sampler = asyncio.create_task(self.sample_depths(queues))
+            drain = asyncio.create_task(self.drain(queues[-1]))
+            await asyncio.gather(feeder, *workers)
+            await drain
+            sampler.cancel()
+        finally:
+            for stage in self.stages:
+                if stage.executor is not None:
+                    stage.executor.shutdown(wait=True)
+                    stage.executor = None
+        self.elapsed = time.perf_counter() - start
+        return self.stats()
+
+    async def feed(self, source: Iterable[Any], queue: asyncio.Queue) -> None:
+        for item in source:
+            if self.stopped:
+                break
+            await queue.put(item)
+        for _ in range(self.stages[0].workers):
+            await queue.put(DONE)
+
+    async def worker(self, loop: asyncio.AbstractEventLoop, index: int,
+                     queues: List[asyncio.Queue], remaining: List[int]) -> None:
+        stage = self.stages[index]
+        inbox, outbox = queues[index], queues[index + 1]
+        finished = False
+        while not finished:
+            items = [await inbox.get()]
+            # Take whatever else is already waiting, up to batch_size
+            while len(items) < stage.batch_size and not inbox.empty():
+                items.append(inbox.get_nowait())
+            markers = sum(item is DONE for item in items)
+            if markers:
+                finished = True
+                items = [item for item in items if item is not DONE]
+                # Markers meant for the other workers of this stage go back
+                for _ in range(markers - 1):
+                    await inbox.put(DONE)
+            if not items:
+                continue
+
+            busy_start = time.perf_counter()
+            try:
+                if stage.batch_size > 1:
+                    results = await stage.call(loop, stage.func, items) or []
+                else:
+                    results = [await stage.call(loop, stage.func, items[0])]
+            except Exception as e:
+                print(f"Stage {stage.name} failed on {len(items)} item(s): {e}")
+                stage.failed += len(items)
+                results = []
+            stage.busy_seconds += time.perf_counter() - busy_start
+            stage.batches += 1
+            stage.processed += len(items)
+
+            for result in results:
+                if result is None:
+                    stage.dropped += 1
+                    continue
+                blocked_start = time.perf_counter()
+                await outbox.put(result)
+                stage.blocked_seconds += time.perf_counter() - blocked_start
+
+        # The last worker of a stage closes it and passes the end marker on
+        remaining[index] -= 1
+        if remaining[index] == 0:
+            if stage.on_close is not None:
+                await stage.call(loop, stage.on_close)
+            next_workers = self.stages[index + 1].workers if index + 1 < len(self.stages) else 1
+            for _ in range(next_workers):
+                await outbox.put(DONE)
+
+    async def drain(self, queue: asyncio.Queue) -> None:
+        while await queue.get() is not DONE:
+            pass
+
+    async def sample_depths(self, queues: List[asyncio.Queue]) -> None:
+        while True:
+            for stage, queue in zip(self.stages, queues):
+                stage.record_depth(queue.qsize())
+            await asyncio.sleep(self.sample_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'elapsed_s': self.elapsed,
+                'stages': {stage.name: stage.stats(self.elapsed) for stage in self.stages}}
+
+    def report(self) -> str:
+        """Stats as a table, one row per stage"""
+        lines = [f"{'stage':<10} {'workers':>7} {'done':>6} {'dropped':>7} {'util':>6} "
+                 f"{'ms/call':>8} {'blocked':>8} {'depth':>11}"]
+        for name, stats in self.stats()['stages'].items():
+            lines.append(f"{name:<10} {stats['workers']:>7} {stats['processed']:>6} {stats['dropped']:>7} "
+                         f"{stats['utilization']:>6.0%} {stats['mean_ms']:>8.1f} {stats['blocked_s']:>7.1f}s "
+                         f"{stats['mean_queue_depth']:>5.1f}/{stats['queue_size']:<5}")
+        lines.append(f"{self.elapsed:.1f}s total")
+        return "\n".join(lines)
@@ -1,21 +1,48 @@
 from typing import Dict, List, Tuple, Optional
 import numpy as np
+import itertools
 import json
 import os
+import queue
 from datetime import datetime
 import pygame
 from src.gui.track_canvas import TrackCanvas
+from src.data_generation.rasterizer import TrackRasterizer
+from src.data_generation.labels import TrackLabeler
+from src.data_generation.point_store import PointStore
+from src.data_generation.track_index import INDEX_FILE, TrackIndex
+from src.data_generation.augmentation import TrackAugmenter, params_elements, start_pose
+from src.data_generation.frame_pool import RenderPipeline
+from src.data_generation.memory_monitor import MemoryMonitor
+from src.data_generation.stage_pipeline import Stage, StagePipeline
+from src.data_generation.shards import MANIFEST_FILE, track_hash
+from src.export.async_exporter import replace_atomically
+from src.export.encoders import EncoderPool, make_encoder
+from utils.geometry import LANE_OFFSET, track_polyline
 import math
 
+# What generate_track_params draws from; callers (e.g. the generation service)
+# may override any of them per call
+DEFAULT_TRACK_RANGES = {
+    'num_segments': [3, 6],  # Upper bound exclusive, like randint
+    'straight_probability': 0.4,
+    'straight_length': [50, 150],  # Pixels, upper bound exclusive
+    'curve_angles': [45, 90],  # Degrees, one picked per curve
+    'curve_radius': [30, 70],  # Pixels, upper bound exclusive
+}
+
 class TrackDataGenerator:
-    def __init__(self, output_dir: str = "data"):
+    def __init__(self, output_dir: str = "data", image_format: str = "png",
+                 bounded_memory: bool = False, memory_ceiling_mb: Optional[float] = None,
+                 seed: Optional[int] = None, shard_index: int = 0, shard_count: int = 1):
         self.output_dir = output_dir
         self.raw_tracks_dir = os.path.join(output_dir, "raw_tracks")
         self.descriptions_dir = os.path.join(output_dir, "descriptions")
         self.processed_dir = os.path.join(output_dir, "processed")
         
         # Create directories if they don't exist
-        os.makedirs(self.descriptions_dir, exist_ok=True)
+        for directory in (self.raw_tracks_dir, self.descriptions_dir, self.processed_dir):
+            os.makedirs(directory, exist_ok=True)
 
         # Track generation parameters
         self.min_segments = 3
@@ -26,31 +53,139 @@ class TrackDataGenerator:
         self.min_radius = 20
         self.max_radius = 150
 
-        # Initialize pygame and surfaces for track generation
-        pygame.init()
         self.width = 1200
         self.height = 800
-        self.screen = pygame.Surface((self.width, self.height))
-        self.track_canvas = TrackCanvas(self.screen, self.width, self.height)
+        self.lane_offset = LANE_OFFSET  # Same as TrackCanvas.lane_offset
+        self.image_format = image_format
+
+        # Bounded-memory mode for long runs: no undo history on the canvas, no
+        # per-sample surface copies, images staged in a fixed set of reused
+        # buffers, and the Python heap traced for the stats output.
+        # memory_ceiling_mb (in either mode) pauses generation while RSS is above it
+        self.bounded_memory = bounded_memory
+        self.memory_ceiling_mb = memory_ceiling_mb
+        self.frame_buffer_count = 8  # Matches EncoderPool's default max_pending
+        self._frame_buffers = None
+        self.memory_monitor = None
+
+        # pygame, the canvas, the rasterizer, the point store and the encoder
+        # threads are all set up on first use (see the properties below), so
+        # constructing a generator is cheap, e.g. inside the editor
+        self.screen = None
+        self._track_canvas = None
+        self._rasterizer = None
+        self._labeler = None
+        self._point_store = None
+        self._encoder_pool = None
+        self._track_index = None
+
+        # Mirrored/rotated/scaled/shifted variants of accepted tracks, kept
+        # inside the same margin validate_track uses
+        self.augmenter = TrackAugmenter(self.width, self.height, margin=100)
+
+        # Sharded generation: with a seed, sample n of a dataset is drawn from
+        # its own generator seeded by (seed, n), and this instance produces
+        # only the samples with n % shard_count == shard_index. Nodes sharing
+        # a seed need no coordination, their slices are disjoint and
+        # reproducible, see generate_shard and shards.py
+        if not 0 <= shard_index < shard_count:
+            raise ValueError(f"Shard index {shard_index} out of range for {shard_count} shards")
+        self.seed = seed
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.max_sample_attempts = 20
+        self.sample_counter = itertools.count()  # Numbers the unseeded samples, see unseeded_track_params
+
+    @property
+    def track_canvas(self) -> TrackCanvas:
+        """Off-screen canvas generate_track_image draws on"""
+        if self._track_canvas is None:
+            pygame.init()
+            self.screen = pygame.Surface((self.width, self.height))
+            self._track_canvas = TrackCanvas(self.screen, self.width, self.height)
+            self._track_canvas.keep_undo = not self.bounded_memory
+        return self._track_canvas
+
+    @property
+    def rasterizer(self) -> TrackRasterizer:
+        """Headless renderer for line-only training images (no display or SDL needed)"""
+        if self._rasterizer is None:
+            self._rasterizer = TrackRasterizer(
+                self.width, self.height,
+                world_size=(self.width, self.height),
+                lane_offset=self.lane_offset
+            )
+        return self._rasterizer
+
+    @property
+    def labeler(self) -> TrackLabeler:
+        """Drivable-area masks and centerline distance fields, computed in NumPy"""
+        if self._labeler is None:
+            self._labeler = TrackLabeler(
+                self.width, self.height,
+                world_size=(self.width, self.height),
+                lane_offset=self.lane_offset
+            )
+        return self._labeler
 
-    def generate_track_params(self) -> Dict:
-        """Generate random track parameters"""
+    @property
+    def point_store(self) -> PointStore:
+        """Centerline points of every saved track, concatenated in one store"""
+        if self._point_store is None:
+            self._point_store = PointStore(os.path.join(self.output_dir, "points"),
+                                           columns={'num_segments': 'int32'})
+        return self._point_store
+
+    @property
+    def encoder_pool(self) -> EncoderPool:
+        """
+        Images are encoded on worker threads while the next track renders;
+        image_format is an encoder spec such as "png", "png:1", "npy" or "mask"
+        """
+        if self._encoder_pool is None:
+            self._encoder_pool = EncoderPool(make_encoder(self.image_format))
+        return self._encoder_pool
+
+    @property
+    def frame_buffers(self) -> queue.Queue:
+        """Free (H, W, 3) image buffers; each returns here once its image is encoded"""
+        if self._frame_buffers is None:
+            self._frame_buffers = queue.Queue()
+            for _ in range(self.frame_buffer_count):
+                self._frame_buffers.put(np.empty((self.height, self.width, 3), dtype=np.uint8))
+        return self._frame_buffers
+
+    @property
+    def track_index(self) -> TrackIndex:
+        """SQLite index of every saved sample, for querying the dataset"""
+        if self._track_index is None:
+            self._track_index = TrackIndex(os.path.join(self.output_dir, INDEX_FILE))
+        return self._track_index
+
+    def generate_track_params(self, rng: Optional[np.random.RandomState] = None,
+                              ranges: Optional[Dict] = None) -> Dict:
+        """
+        Generate random track parameters, from the global NumPy generator
+        unless rng is given, with DEFAULT_TRACK_RANGES overridden by ranges
+        """
+        rng = np.random if rng is None else rng
+        ranges = {**DEFAULT_TRACK_RANGES, **(ranges or {})}
         # Start with fewer segments for testing
-        num_segments = int(np.random.randint(3, 6))  # Reduced from (3, 10)
+        num_segments = int(rng.randint(*ranges['num_segments']))  # Reduced from (3, 10)
         segments = []
         
         for _ in range(num_segments):
-            if np.random.random() < 0.4:  # 40% chance of straight
+            if rng.random() < ranges['straight_probability']:  # 40% chance of straight
                 segment = {
                     'type': 'straight',
-                    'length': int(np.random.randint(50, 150))  # Reduced length range
+                    'length': int(rng.randint(*ranges['straight_length']))  # Reduced length range
                 }
             else:  # curve
                 segment = {
                     'type': 'curve',
-                    'direction': str(np.random.choice(['left', 'right'])),
-                    'angle': int(np.random.choice([45, 90])),  # Simplified angles
-                    'radius': int(np.random.randint(30, 70))  # Reduced radius range
+                    'direction': str(rng.choice(['left', 'right'])),
+                    'angle': int(rng.choice(ranges['curve_angles'])),  # Simplified angles
+                    'radius': int(rng.randint(*ranges['curve_radius']))  # Reduced radius range
                 }
             segments.append(segment)
             
@@ -60,6 +195,41 @@ class TrackDataGenerator:
             'timestamp': datetime.now().strftime("%Y%m%d_%H%M%S")
         }
 
+    def sample_key(self, sample_number: int, seed: Optional[int] = None) -> str:
+        """Name part of a seeded sample, stored as its 'timestamp' so every path stays track_<key>"""
+        return f"{self.seed if seed is None else seed}_{sample_number:08d}"
+
+    def shard_sample_numbers(self, num_samples: int) -> range:
+        """Sample numbers of this shard's slice of a num_samples dataset"""
+        return range(self.shard_index, num_samples, self.shard_count)
+
+    def seeded_track_params(self, sample_number: int, ranges: Optional[Dict] = None,
+                            seed: Optional[int] = None) -> Optional[Dict]:
+        """
+        Params of sample sample_number of the seeded dataset, the same on
+        every node and for any shard count. Draws that fail the bounds check
+        are retried with the next attempt number; None after
+        max_sample_attempts misses. seed defaults to the generator's.
+        """
+        seed = self.seed if seed is None else seed
+        for attempt in range(self.max_sample_attempts):
+            rng = np.random.RandomState([seed, sample_number, attempt])
+            track_params = self.generate_track_params(rng, ranges)
+            if self.augmenter.in_bounds(track_params):
+                track_params['timestamp'] = self.sample_key(sample_number, seed)
+                track_params['sample'] = {'seed': seed, 'number': sample_number, 'attempt': attempt}
+                return track_params
+        return None
+
+    def unseeded_track_params(self, ranges: Optional[Dict] = None) -> Dict:
+        """
+        generate_track_params with a 'timestamp' unique to this generator:
+        the time plus a running number, as many samples are drawn per second
+        """
+        track_params = self.generate_track_params(ranges=ranges)
+        track_params['timestamp'] += f"_{next(self.sample_counter):06d}"
+        return track_params
+
     def generate_description(self, track_params: Dict) -> str:
         """Generate natural language description of the track"""
         segments = track_params['segments']
@@ -91,6 +261,28 @@ class TrackDataGenerator:
                             description: str) -> None:
         """Save a complete training example"""
         timestamp = track_params['timestamp']
+
+        # Queue the track image for encoding (the array is a copy, the canvas is reused)
+        image_root = os.path.join(self.raw_tracks_dir, f"track_{timestamp}")
+        if self.bounded_memory:
+            # Copy into a free staging buffer (blocks while all are queued)
+            pixels = self.frame_buffers.get()
+            pygame.pixelcopy.surface_to_array(pixels.transpose(1, 0, 2), track_image)
+            try:
+                future = self.encoder_pool.submit(image_root, pixels)
+            except Exception:
+                self.frame_buffers.put(pixels)
+                raise
+            future.add_done_callback(lambda _: self.frame_buffers.put(pixels))
+        else:
+            pixels = pygame.surfarray.array3d(track_image).transpose(1, 0, 2)
+            self.encoder_pool.submit(image_root, pixels)
+
+        self.save_sample_files(track_params, description, self.encoder_pool.path_for(image_root))
+
+    def save_sample_files(self, track_params: Dict, description: str, image_path: str) -> None:
+        """Save everything of a sample except the image, which is written elsewhere"""
+        timestamp = track_params['timestamp']
         
         # Convert any remaining numpy types to Python native types
         def convert_to_native(obj):
@@ -105,10 +297,6 @@ class TrackDataGenerator:
         # Convert track parameters recursively
         track_params_native = {k: convert_to_native(v) for k, v in track_params.items()}
         
-        # Save track image
-        image_path = os.path.join(self.raw_tracks_dir, f"track_{timestamp}.png")
-        pygame.image.save(track_image, image_path)
-        
         # Save track parameters with background image path
         params_path = os.path.join(self.processed_dir, f"track_{timestamp}.json")
         with open(params_path, 'w') as f:
@@ -118,6 +306,18 @@ class TrackDataGenerator:
         desc_path = os.path.join(self.descriptions_dir, f"track_{timestamp}.txt")
         with open(desc_path, 'w') as f:
             f.write(description)
+
+        # Append centerline points to the consolidated store
+        points = track_polyline(self.track_elements_from_params(track_params))
+        point_index = self.point_store.append(points, name=f"track_{timestamp}",
+                                              num_segments=len(track_params['segments']))
+
+        # Index metadata; rows are written in batches, see generate_dataset
+        self.track_index.add(f"track_{timestamp}", track_params_native, description, {
+            'image_path': image_path,
+            'params_path': params_path,
+            'description_path': desc_path,
+        }, point_index)
             
         # If there's a background image, save a copy
         if track_params.get('background_image'):
@@ -130,33 +330,54 @@ class TrackDataGenerator:
         # Reset canvas
         self.track_canvas.clear_track()
         
-        # Set starting position in center
-        self.track_canvas.current_pos = (self.width // 2, self.height // 2)
-        
-        # Start with upward direction
-        self.track_canvas.current_direction = -90
+        # Start in the center heading upward, unless the params carry a start pose
+        self.track_canvas.current_pos, self.track_canvas.current_direction = start_pose(
+            track_params, (self.width // 2, self.height // 2), -90)
         
-        # Add each segment
-        for segment in track_params['segments']:
-            if segment['type'] == 'straight':
-                self.track_canvas.add_straight_segment(length=segment['length'])
-            else:  # curve
-                self.track_canvas.add_curve_segment(
-                    direction=segment['direction'],
-                    angle=segment['angle'],
-                    radius=segment['radius']
-                )
+        if track_params.get('elements') is not None:
+            # Augmented variants carry their transformed elements, drawn as they are
+            self.track_canvas.track_elements = self.track_elements_from_params(track_params)
+            self.track_canvas.track_changed()
+        else:
+            # Add each segment
+            for segment in track_params['segments']:
+                if segment['type'] == 'straight':
+                    self.track_canvas.add_straight_segment(length=segment['length'])
+                else:  # curve
+                    self.track_canvas.add_curve_segment(
+                        direction=segment['direction'],
+                        angle=segment['angle'],
+                        radius=segment['radius']
+                    )
             
-            # Add debug print for each segment
-            print(f"Added segment: {segment['type']}, "
-                  f"current_pos: {self.track_canvas.current_pos}, "
-                  f"current_direction: {self.track_canvas.current_direction}")
+                # Add debug print for each segment
+                print(f"Added segment: {segment['type']}, "
+                      f"current_pos: {self.track_canvas.current_pos}, "
+                      f"current_direction: {self.track_canvas.current_direction}")
         
         # Draw the track
         self.track_canvas.draw()
-        
+
+        # In bounded-memory mode the caller gets the shared screen, valid until the next render
+        if self.bounded_memory:
+            return self.screen
         return self.screen.copy()
 
+    def track_elements_from_params(self, track_params: Dict) -> List[Dict]:
+        """Build track elements the same way generate_track_image lays them out"""
+        return params_elements(track_params, (self.width // 2, self.height // 2), -90)
+
+    def generate_track_arrays(self, params_list: List[Dict]) -> np.ndarray:
+        """Render centerline and lanes of many tracks to an (N, H, W, 3) uint8 array"""
+        tracks = [self.track_elements_from_params(params) for params in params_list]
+        return self.rasterizer.render_batch(tracks)
+
+    def generate_label_arrays(self, params_list: List[Dict],
+                              sdf: bool = True) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """(N, H, W) drivable-area masks and, with sdf, signed centerline distances in pixels"""
+        tracks = [self.track_elements_from_params(params) for params in params_list]
+        return self.labeler.label_batch(tracks, sdf)
+
     def validate_track(self, track_params: Dict) -> bool:
         """Validate if the track is within bounds and properly connected"""
         # Store original position and direction
@@ -209,15 +430,32 @@ class TrackDataGenerator:
             self.track_canvas.current_pos = original_pos
             self.track_canvas.current_direction = original_dir
 
-    def generate_dataset(self, num_samples: int) -> None:
-        """Generate multiple track samples"""
+    def generate_dataset(self, num_samples: int, variants_per_track: int = 0) -> None:
+        """
+        Generate multiple track samples. With variants_per_track > 0 every
+        validated track also yields that many augmented variants (see
+        TrackAugmenter), which count towards num_samples. Memory use is
+        sampled into the progress output, see bounded_memory and
+        memory_ceiling_mb in __init__. A generator constructed with a seed
+        produces its shard of the seeded dataset instead, see generate_shard.
+        """
+        if self.seed is not None:
+            self.generate_shard(num_samples, variants_per_track)
+            return
+
         successful_samples = 0
         attempts = 0
         max_attempts = num_samples * 3  # Allow some failed attempts
+
+        self.memory_monitor = MemoryMonitor(self.memory_ceiling_mb, trace=self.bounded_memory)
+        self.memory_monitor.add_drain(self.encoder_pool.flush)
+        self.memory_monitor.add_drain(self.track_index.flush)
+        self.memory_monitor.start()
+        self.memory_monitor.sample()
         
         while successful_samples < num_samples and attempts < max_attempts:
             # Generate track parameters
-            track_params = self.generate_track_params()
+            track_params = self.unseeded_track_params()
             
             # Validate track
             if self.validate_track(track_params):
@@ -232,10 +470,240 @@ class TrackDataGenerator:
                 
                 successful_samples += 1
                 print(f"Generated valid sample {successful_samples}/{num_samples}")
+
+                # Variants skip sampling and validation, only rendering remains
+                wanted = min(variants_per_track, num_samples - successful_samples)
+                for i, variant in enumerate(self.augmenter.variants(track_params, wanted)):
+                    variant['timestamp'] = f"{track_params['timestamp']}_v{i}"
+                    self.save_training_example(variant, self.generate_track_image(variant),
+                                               self.generate_description(variant))
+                    successful_samples += 1
+                print(f"Samples including variants: {successful_samples}/{num_samples}")
             
             attempts += 1
+            self.memory_monitor.check()
             if attempts % 10 == 0:
-                print(f"Attempts: {attempts}, Successful: {successful_samples}")
+                self.memory_monitor.sample()
+                print(f"Attempts: {attempts}, Successful: {successful_samples}, "
+                      f"{self.memory_monitor.summary()}")
         
+        self.encoder_pool.flush()
+        self.track_index.flush()
+        self.memory_monitor.sample()
+        self.memory_monitor.stop()
+        print(f"Memory: {self.memory_monitor.summary()}")
+        if successful_samples < num_samples:
+            print(f"Warning: Only generated {successful_samples} valid samples out of {num_samples} requested") 
+
+    def generate_shard(self, num_samples: int, variants_per_track: int = 0) -> Dict:
+        """
+        Generate this shard's slice of a seeded dataset of num_samples tracks
+        and write its manifest (shard_manifest.json, see write_shard_manifest),
+        which the merge tool checks the shard against. Tracks are validated
+        analytically. Variants are extra samples named <key>_v<i>, drawn from
+        a generator seeded per sample so they are reproducible too. Returns
+        the manifest.
+        """
+        if self.seed is None:
+            raise ValueError("generate_shard needs a generator constructed with a seed")
+        numbers = self.shard_sample_numbers(num_samples)
+        samples = {}
+        missing = []
+        for count, sample_number in enumerate(numbers, 1):
+            track_params = self.seeded_track_params(sample_number)
+            if track_params is None:
+                print(f"Sample {sample_number}: no valid track in {self.max_sample_attempts} attempts")
+                missing.append(sample_number)
+                continue
+
+            self.augmenter.rng = np.random.default_rng([self.seed, sample_number])
+            batch = [track_params]
+            for i, variant in enumerate(self.augmenter.variants(track_params, variants_per_track)):
+                variant['timestamp'] = f"{track_params['timestamp']}_v{i}"
+                batch.append(variant)
+            for params in batch:
+                self.save_training_example(params, self.generate_track_image(params),
+                                           self.generate_description(params))
+                samples[f"track_{params['timestamp']}"] = sample_number
+            print(f"Shard {self.shard_index}/{self.shard_count}: sample {sample_number} "
+                  f"({count}/{len(numbers)})")
+
+        self.encoder_pool.flush()
+        self.track_index.flush()
+        manifest = self.write_shard_manifest(num_samples, variants_per_track, samples, missing)
+        print(f"Shard {self.shard_index}/{self.shard_count}: {len(samples)} samples, "
+              f"{len(missing)} missing")
+        return manifest
+
+    def write_shard_manifest(self, num_samples: int, variants_per_track: int,
+                             samples: Dict[str, int], missing: List[int]) -> Dict:
+        """
+        shard_manifest.json: the dataset settings every shard must agree on,
+        and per sample its number, files (relative to output_dir) and a hash
+        of its track, for the merge tool's count and duplicate checks
+        """
+        extension = make_encoder(self.image_format).extension
+        entries = {}
+        for sample_id, sample_number in samples.items():
+            params_path = os.path.join(self.processed_dir, sample_id + ".json")
+            with open(params_path) as f:
+                track_params = json.load(f)
+            entries[sample_id] = {
+                'number': sample_number,
+                'track_hash': track_hash(track_params),
+                'files': {
+                    'image': os.path.join("raw_tracks", sample_id + extension),
+                    'params': os.path.join("processed", sample_id + ".json"),
+                    'description': os.path.join("descriptions", sample_id + ".txt"),
+                },
+            }
+        manifest = {
+            'seed': self.seed,
+            'shard_index': self.shard_index,
+            'shard_count': self.shard_count,
+            'num_samples': num_samples,
+            'variants_per_track': variants_per_track,
+            'image_format': self.image_format,
+            'samples': entries,
+            'missing': missing,
+            'created': datetime.now().isoformat(timespec="seconds"),
+        }
+        path = os.path.join(self.output_dir, MANIFEST_FILE)
+
+        def write_manifest(temp_path: str) -> None:
+            with open(temp_path, 'w') as f:
+                json.dump(manifest, f, indent=2)
+
+        replace_atomically(path, write_manifest)
+        return manifest
+
+    def generate_dataset_parallel(self, num_samples: int, variants_per_track: int = 0,
+                                  render_workers: int = 2, writer_workers: int = 1,
+                                  slots: int = 8) -> Dict:
+        """
+        generate_dataset with images rendered and encoded in worker processes.
+        Frames travel through a pool of shared-memory slots (see
+        RenderPipeline), so only slot numbers cross process boundaries and
+        at most `slots` frames are in flight. Images are line-only
+        TrackRasterizer renders; tracks are validated analytically instead of
+        on the canvas. Returns the pipeline stats.
+        """
+        pipeline = RenderPipeline(self.width, self.height, self.lane_offset, self.image_format,
+                                  render_workers, writer_workers, slots)
+        successful_samples = 0
+        attempts = 0
+        max_attempts = num_samples * 3  # Same budget as generate_dataset
+
+        try:
+            while successful_samples < num_samples and attempts < max_attempts:
+                attempts += 1
+                track_params = self.unseeded_track_params()
+                if not self.augmenter.in_bounds(track_params):
+                    continue
+
+                wanted = min(variants_per_track, num_samples - successful_samples - 1)
+                samples = [track_params]
+                for i, variant in enumerate(self.augmenter.variants(track_params, wanted)):
+                    variant['timestamp'] = f"{track_params['timestamp']}_v{i}"
+                    samples.append(variant)
+
+                for params in samples:
+                    sample_id = f"track_{params['timestamp']}"
+                    image_path = pipeline.submit(sample_id, params,
+                                                 os.path.join(self.raw_tracks_dir, sample_id))
+                    self.save_sample_files(params, self.generate_description(params), image_path)
+                    successful_samples += 1
+                print(f"Queued {successful_samples}/{num_samples} samples")
+        finally:
+            stats = pipeline.close()
+            self.track_index.flush()
+
+        print(f"Wrote {stats['written']} images ({stats['failed']} failed), "
+              f"render {stats['mean_render_ms']:.1f} ms, encode {stats['mean_encode_ms']:.1f} ms per image")
         if successful_samples < num_samples:
-            print(f"Warning: Only generated {successful_samples} valid samples out of {num_samples} requested") 
\ No newline at end of file
+            print(f"Warning: Only generated {successful_samples} valid samples out of {num_samples} requested")
+        return stats
+
+    def generate_dataset_async(self, num_samples: int, encode_workers: int = 2,
+                               write_batch: int = 16, queue_size: int = 8) -> Dict:
+        """
+        generate_dataset as an asyncio pipeline of stages joined by bounded
+        queues: sample -> validate -> render -> encode -> write -> index.
+        Rendering (on the canvas, one thread) overlaps with PNG encoding on
+        encode_workers threads and with batched file writes, so the CPU and
+        the disk are busy at the same time. Tracks are validated analytically.
+        Prints and returns per-stage stats (utilization, queue depth).
+        """
+        encoder = make_encoder(self.image_format)
+        accepted = 0
+
+        def validate(track_params: Dict) -> Optional[Dict]:
+            nonlocal accepted
+            if accepted >= num_samples or not self.augmenter.in_bounds(track_params):
+                return None
+            accepted += 1
+            if accepted >= num_samples:
+                pipeline.stop()
+            return track_params
+
+        def render(track_params: Dict) -> Dict:
+            # The canvas is reused, so the pixels are copied out here
+            image = self.generate_track_image(track_params)
+            sample_id = f"track_{track_params['timestamp']}"
+            return {
+                'params': track_params,
+                'description': self.generate_description(track_params),
+                'pixels': pygame.surfarray.array3d(image).transpose(1, 0, 2),
+                'image_path': os.path.join(self.raw_tracks_dir, sample_id + encoder.extension),
+                'params_path': os.path.join(self.processed_dir, sample_id + ".json"),
+                'description_path': os.path.join(self.descriptions_dir, sample_id + ".txt"),
+            }
+
+        def encode(sample: Dict) -> Dict:
+            sample['image_bytes'] = encoder.encode(sample.pop('pixels'))
+            return sample
+
+        def write(samples: List[Dict]) -> List[Dict]:
+            for sample in samples:
+                data = sample.pop('image_bytes')
+
+                def write_image(path: str) -> None:
+                    with open(path, 'wb') as f:
+                        f.write(data)
+
+                replace_atomically(sample['image_path'], write_image)
+                with open(sample['params_path'], 'w') as f:
+                    json.dump(sample['params'], f, indent=2)
+                with open(sample['description_path'], 'w') as f:
+                    f.write(sample['description'])
+            return samples
+
+        def index(samples: List[Dict]) -> List[Dict]:
+            # Point store and SQLite index stay on the event loop thread, their only writer
+            for sample in samples:
+                track_params = sample['params']
+                sample_id = f"track_{track_params['timestamp']}"
+                points = track_polyline(self.track_elements_from_params(track_params))
+                point_index = self.point_store.append(points, name=sample_id,
+                                                      num_segments=len(track_params['segments']))
+                self.track_index.add(sample_id, track_params, sample['description'], {
+                    'image_path': sample['image_path'],
+                    'params_path': sample['params_path'],
+                    'description_path': sample['description_path'],
+                }, point_index)
+            return samples
+
+        pipeline = StagePipeline([
+            Stage("sample", lambda _: self.unseeded_track_params(), queue_size=queue_size),
+            Stage("validate", validate, queue_size=queue_size),
+            Stage("render", render, executor="thread", queue_size=queue_size),
+            Stage("encode", encode, workers=encode_workers, executor="thread", queue_size=queue_size),
+            Stage("write", write, executor="thread", queue_size=2 * write_batch, batch_size=write_batch),
+            Stage("index", index, queue_size=2 * write_batch, batch_size=write_batch,
+                  on_close=self.track_index.flush),
+        ])
+        stats = pipeline.run(range(num_samples * 3))  # Same attempt budget as generate_dataset
+        print(pipeline.report())
+        if accepted < num_samples:
+            print(f"Warning: Only generated {accepted} valid samples out of {num_samples} requested")
+        return stats
@@ -0,0 +1,253 @@
+from typing import Any, Dict, List, Optional, Sequence
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from utils.calculations import segment_metrics
+from utils.geometry import PIXELS_PER_METER
+
+# SQLite index over a generated dataset: one row per sample with its
+# parameters, derived metrics, description and artifact paths, so subsets can
+# be selected without opening every JSON and TXT file.
+
+INDEX_FILE = "index.sqlite"
+
+# Columns that can appear in query conditions, with their SQL types
+METRIC_COLUMNS = {
+    'num_segments': 'INTEGER',
+    'num_straights': 'INTEGER',
+    'num_curves': 'INTEGER',
+    'num_left_turns': 'INTEGER',
+    'num_right_turns': 'INTEGER',
+    'straight_length': 'REAL',
+    'curve_length': 'REAL',
+    'total_length': 'REAL',
+    'min_radius': 'REAL',
+    'max_radius': 'REAL',
+    'net_turn': 'REAL',
+}
+# Params are in canvas pixels; these metrics are indexed in meters
+METER_COLUMNS = ['straight_length', 'curve_length', 'total_length', 'min_radius', 'max_radius']
+# PRAGMA user_version of the current schema; 0 was lengths in pixels
+SCHEMA_VERSION = 1
+PATH_COLUMNS = ['image_path', 'params_path', 'description_path']
+
+CONDITION = re.compile(r"^\s*(\w+)\s*(<=|>=|!=|==|=|<|>)\s*(-?[\d.]+)\s*$")
+
+
+class TrackIndex:
+    """
+    Sample metadata in a SQLite database next to the dataset.
+
+    add() buffers rows and writes them batch_size at a time in one transaction;
+    call flush() (or close()) to write the rest. query() takes conditions such
+    as "num_right_turns >= 3" and returns the matching sample IDs.
+    """
+
+    def __init__(self, path: str, batch_size: int = 256) -> None:
+        self.path = path
+        self.batch_size = batch_size
+        self.pending: List[tuple] = []
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")  # Readers don't block the generator
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.create_schema()
+
+    # Metrics live in a narrow table so filters scan little data; the bulky
+    # description, params and paths sit in sample_details. There are no
+    # per-metric indexes: a scan of the narrow table is a few ms per 100k
+    # samples, while index range lookups were several times slower whenever
+    # a condition matched more than a small fraction of the samples
+    SAMPLE_COLUMNS = ['sample_id', 'timestamp'] + list(METRIC_COLUMNS) + ['point_index']
+    DETAIL_COLUMNS = ['sample_id', 'description', 'params'] + PATH_COLUMNS + ['indexed_at']
+
+    def create_schema(self) -> None:
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        self.outdated = version < SCHEMA_VERSION and self.connection.execute(
+            "SELECT name FROM sqlite_master WHERE name = 'samples'").fetchone() is not None
+        if self.outdated:
+            print(f"Warning: {self.path} stores lengths in pixels; run track-index --rebuild")
+            return
+        metric_columns = ", ".join(f"{name} {kind}" for name, kind in METRIC_COLUMNS.items())
+        path_columns = ", ".join(f"{name} TEXT" for name in PATH_COLUMNS)
+        with self.connection:
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS samples (sample_id TEXT PRIMARY KEY, timestamp TEXT, "
+                f"{metric_columns}, point_index INTEGER)")
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS sample_details (sample_id TEXT PRIMARY KEY, "
+                f"description TEXT, params TEXT, {path_columns}, indexed_at REAL)")
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def reset(self) -> None:
+        """Drop every sample and recreate the tables with the current schema"""
+        with self.connection:
+            self.connection.execute("DROP TABLE IF EXISTS samples")
+            self.connection.execute("DROP TABLE IF EXISTS sample_details")
+            self.connection.execute("PRAGMA user_version = 0")
+        self.create_schema()
+
+    def add(self, sample_id: str, track_params: Dict[str, Any], description: str = "",
+            paths: Optional[Dict[str, str]] = None, point_index: Optional[int] = None) -> None:
+        """Queue one sample; replaces an existing row with the same sample_id"""
+        metrics = segment_metrics(track_params['segments'])
+        for name in METER_COLUMNS:
+            if metrics[name] is not None:
+                metrics[name] /= PIXELS_PER_METER
+        paths = paths or {}
+        self.pending.append((
+            (sample_id, track_params.get('timestamp')) +
+            tuple(metrics[name] for name in METRIC_COLUMNS) + (point_index,),
+            (sample_id, description, json.dumps(track_params)) +
+            tuple(paths.get(name) for name in PATH_COLUMNS) + (time.time(),)
+        ))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write queued samples in a single transaction"""
+        if not self.pending:
+            return
+        with self.connection:
+            for table, columns, rows in (
+                    ('samples', self.SAMPLE_COLUMNS, [row for row, _ in self.pending]),
+                    ('sample_details', self.DETAIL_COLUMNS, [row for _, row in self.pending])):
+                self.connection.executemany(
+                    f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' * len(columns))})", rows)
+        self.pending = []
+
+    def query(self, conditions: Sequence[str] = (), text: Optional[str] = None,
+              order_by: Optional[str] = None, limit: Optional[int] = None) -> List[str]:
+        """
+        Sample IDs matching every condition ("column op number", e.g.
+        "total_length > 40", lengths and radii in meters) and, if given, containing text in the description.
+        Unordered unless order_by names a column ('-' prefix for descending).
+        """
+        clauses, values = [], []
+        for condition in conditions:
+            match = CONDITION.match(condition)
+            if not match:
+                raise ValueError(f"Can't parse condition {condition!r}, expected e.g. 'num_curves >= 2'")
+            column, operator, value = match.groups()
+            if column not in METRIC_COLUMNS and column != 'point_index':
+                raise ValueError(f"Unknown column {column!r}, expected one of {', '.join(METRIC_COLUMNS)}")
+            clauses.append(f"{column} {'=' if operator == '==' else operator} ?")
+            values.append(float(value))
+        if text:
+            clauses.append("sample_id IN (SELECT sample_id FROM sample_details WHERE description LIKE ?)")
+            values.append(f"%{text}%")
+
+        sql = "SELECT sample_id FROM samples"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if order_by:
+            column = order_by.lstrip("-")
+            if column not in METRIC_COLUMNS and column not in ('sample_id', 'timestamp'):
+                raise ValueError(f"Can't order by {order_by!r}")
+            sql += f" ORDER BY {column} {'DESC' if order_by.startswith('-') else 'ASC'}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            values.append(int(limit))
+        return [row[0] for row in self.connection.execute(sql, values)]
+
+    def get(self, sample_id: str) -> Optional[Dict[str, Any]]:
+        """Full row of one sample, with params decoded"""
+        columns = self.SAMPLE_COLUMNS + self.DETAIL_COLUMNS[1:]
+        cursor = self.connection.execute(
+            f"SELECT {', '.join('samples.' + name for name in self.SAMPLE_COLUMNS)}, "
+            f"{', '.join(self.DETAIL_COLUMNS[1:])} FROM samples "
+            f"JOIN sample_details USING (sample_id) WHERE sample_id = ?", (sample_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        record = dict(zip(columns, row))
+        record['params'] = json.loads(record['params'])
+        return record
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM samples").fetchone()[0]
+
+    def close(self) -> None:
+        self.flush()
+        self.connection.close()
+
+
+def rebuild_index(dataset_dir: str, index_path: Optional[str] = None) -> TrackIndex:
+    """Index an existing dataset directory (processed/, descriptions/, raw_tracks/, points/)"""
+    index = TrackIndex(index_path or os.path.join(dataset_dir, INDEX_FILE))
+    if index.outdated:
+        index.reset()
+
+    # Row of every track in the point store, by name
+    point_rows = {}
+    names_path = os.path.join(dataset_dir, "points", "names.txt")
+    if os.path.exists(names_path):
+        with open(names_path) as f:
+            point_rows = {name: row for row, name in enumerate(f.read().splitlines())}
+
+    for params_path in sorted(glob.glob(os.path.join(dataset_dir, "processed", "track_*.json"))):
+        sample_id = os.path.splitext(os.path.basename(params_path))[0]
+        with open(params_path) as f:
+            track_params = json.load(f)
+        paths = {'params_path': params_path}
+        description = ""
+        description_path = os.path.join(dataset_dir, "descriptions", sample_id + ".txt")
+        if os.path.exists(description_path):
+            with open(description_path) as f:
+                description = f.read()
+            paths['description_path'] = description_path
+        images = glob.glob(os.path.join(dataset_dir, "raw_tracks", sample_id + ".*"))
+        if images:
+            paths['image_path'] = images[0]
+        index.add(sample_id, track_params, description, paths, point_rows.get(sample_id))
+    index.flush()
+    return index
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Query or rebuild the SQLite index of a generated dataset")
+    parser.add_argument("dataset_dir", help="Dataset directory, e.g. data")
+    parser.add_argument("conditions", nargs="*",
+                        help="Conditions like 'num_right_turns>=3' 'total_length>40' (lengths in meters)")
+    parser.add_argument("--text", help="Only samples whose description contains this text")
+    parser.add_argument("--order-by", help="Metric to sort by, '-' prefix for descending")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Re-index every sample in the dataset directory first")
+    parser.add_argument("--paths", action="store_true", help="Print artifact paths next to each ID")
+    args = parser.parse_intermixed_args(argv)  # Options may come between conditions
+
+    index_path = os.path.join(args.dataset_dir, INDEX_FILE)
+    if args.rebuild:
+        start = time.perf_counter()
+        index = rebuild_index(args.dataset_dir, index_path)
+        print(f"Indexed {len(index)} samples in {time.perf_counter() - start:.2f}s")
+    elif not os.path.exists(index_path):
+        parser.error(f"No index at {index_path}; run with --rebuild first")
+    else:
+        index = TrackIndex(index_path)
+
+    start = time.perf_counter()
+    try:
+        sample_ids = index.query(args.conditions, args.text, args.order_by, args.limit)
+    except ValueError as e:
+        parser.error(str(e))
+    elapsed = time.perf_counter() - start
+
+    for sample_id in sample_ids:
+        if args.paths:
+            record = index.get(sample_id)
+            print("\t".join([sample_id] + [record[name] or "" for name in PATH_COLUMNS]))
+        else:
+            print(sample_id)
+    print(f"{len(sample_ids)} matching samples ({elapsed * 1000:.1f} ms)", file=sys.stderr)
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
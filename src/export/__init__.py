@@ -0,0 +1 @@
+# This makes the export directory a Python package
@@ -0,0 +1,121 @@
+from typing import Any, Callable, Dict, List, Optional
+import os
+import queue
+import threading
+import time
+import traceback
+
+
+class AsyncExporter:
+    """
+    Runs export jobs on a small pool of worker threads fed by a bounded queue.
+
+    submit() never blocks the caller unless asked to: when the queue is full a
+    non-blocking submit is refused, so periodic autosaves are skipped instead
+    of stalling the frame loop. flush() waits for every queued job, which is
+    what the window does before it exits.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 4) -> None:
+        self.jobs = queue.Queue(maxsize=max_pending)
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.last_message = ""
+        self.revision = 0  # Bumped on every status change so the UI knows to redraw
+        self.workers = []
+        for i in range(max_workers):
+            worker = threading.Thread(target=self.worker_loop, name=f"export-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def submit(self, name: str, func: Callable[..., Any], *args: Any,
+               block: bool = False, **kwargs: Any) -> bool:
+        """Queue func(*args, **kwargs); returns False if the queue is full and block is False"""
+        try:
+            self.jobs.put((name, func, args, kwargs), block=block)
+        except queue.Full:
+            self.set_status(f"Export queue full, skipped {name}")
+            return False
+        with self.lock:
+            self.pending += 1
+        self.set_status(f"Queued {name}")
+        return True
+
+    def worker_loop(self) -> None:
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                self.jobs.task_done()
+                return
+            name, func, args, kwargs = job
+            with self.lock:
+                self.pending -= 1
+                self.running += 1
+            self.set_status(f"Exporting {name}...")
+            start = time.perf_counter()
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                traceback.print_exc()
+                with self.lock:
+                    self.failed += 1
+                self.set_status(f"Export {name} failed: {e}")
+            else:
+                with self.lock:
+                    self.completed += 1
+                self.set_status(f"Exported {name} in {time.perf_counter() - start:.1f}s")
+            finally:
+                with self.lock:
+                    self.running -= 1
+                self.jobs.task_done()
+
+    def set_status(self, message: str) -> None:
+        with self.lock:
+            self.last_message = message
+            self.revision += 1
+
+    def is_busy(self) -> bool:
+        with self.lock:
+            return self.pending + self.running > 0
+
+    def status(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'pending': self.pending,
+                'running': self.running,
+                'completed': self.completed,
+                'failed': self.failed,
+                'message': self.last_message,
+            }
+
+    def status_text(self) -> str:
+        status = self.status()
+        if status['pending'] or status['running']:
+            return f"{status['message']} ({status['pending']} queued)"
+        return status['message']
+
+    def flush(self) -> None:
+        """Block until every queued job has finished"""
+        self.jobs.join()
+
+    def shutdown(self) -> None:
+        """Finish queued jobs, then stop the workers"""
+        self.flush()
+        for _ in self.workers:
+            self.jobs.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+
+
+def replace_atomically(path: str, write: Callable[[str], None]) -> None:
+    """Call write(tmp_path) then move the result over path, so readers never see half a file"""
+    root, ext = os.path.splitext(path)
+    # Unique per writer so concurrent saves of one name don't share a temp file;
+    # keep the extension, pygame picks the format from it
+    tmp_path = f"{root}.{os.getpid()}-{threading.get_ident()}.tmp{ext}"
+    write(tmp_path)
+    os.replace(tmp_path, path)
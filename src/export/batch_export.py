@@ -0,0 +1,273 @@
+from typing import Any, Dict, List, Optional, Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import copy
+import glob
+import hashlib
+import json
+import os
+import numpy as np
+from utils.geometry import LANE_OFFSET, PIXELS_PER_METER, resample_polyline, track_polyline, track_cones
+from src.data_generation.augmentation import params_elements
+from src.data_generation.labels import TrackLabeler
+from src.data_generation.rasterizer import TrackRasterizer
+from src.export.async_exporter import replace_atomically
+from src.export.geo_writer import GeoAnchor, write_gpx
+from src.export.png import write_png
+
+# Re-export generated datasets (processed/track_*.json) as points, GPX, cone
+# maps, images and label arrays. Runs headless: nothing here imports pygame.
+
+DEFAULT_SETTINGS = {
+    'canvas_size': [1200, 800],  # Layout TrackDataGenerator.generate_track_image uses
+    'start_direction': -90,
+    'pixels_per_meter': PIXELS_PER_METER,
+    'lane_offset': LANE_OFFSET,  # Pixels from centerline to each lane boundary
+    'point_spacing': 1.0,  # Pixels between exported centerline points
+    'cone_spacing': 3.0,  # Meters between cones along each boundary
+    'image_size': [1200, 800],
+    'supersample': 4,
+    'origin_lat': 0.0,
+    'origin_lon': 0.0,
+    'heading': 0.0,
+    'label_sdf': True,  # Write the signed distance field next to the drivable-area mask
+    'label_max_distance': None,  # Meters the distance field is clipped to (None: unclipped)
+}
+
+# Output subdirectory, extension and the settings each artifact depends on
+ARTIFACTS = {
+    'points': ('points', '.npy', ['canvas_size', 'start_direction', 'point_spacing']),
+    'gpx': ('gpx', '.gpx', ['canvas_size', 'start_direction', 'point_spacing', 'pixels_per_meter',
+                            'origin_lat', 'origin_lon', 'heading']),
+    'cones': ('cones', '.csv', ['canvas_size', 'start_direction', 'pixels_per_meter',
+                                'lane_offset', 'cone_spacing']),
+    'image': ('images', '.png', ['canvas_size', 'start_direction', 'lane_offset',
+                                 'image_size', 'supersample']),
+    'labels': ('labels', '.npz', ['canvas_size', 'start_direction', 'pixels_per_meter', 'lane_offset',
+                                  'image_size', 'label_sdf', 'label_max_distance']),
+}
+
+MANIFEST_NAME = "manifest.json"
+
+
+def artifact_path(output_dir: str, artifact: str, sample_id: str) -> str:
+    subdir, ext, _ = ARTIFACTS[artifact]
+    return os.path.join(output_dir, subdir, sample_id + ext)
+
+
+def settings_hash(settings: Dict[str, Any], artifact: str) -> str:
+    relevant = {key: settings[key] for key in ARTIFACTS[artifact][2]}
+    return hashlib.sha1(json.dumps(relevant, sort_keys=True).encode()).hexdigest()
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def export_sample(params_path: str, output_dir: str, artifacts: Sequence[str],
+                  settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Write the requested artifacts for one sample; runs in a worker process"""
+    sample_id = os.path.splitext(os.path.basename(params_path))[0]
+    with open(params_path) as f:
+        track_params = json.load(f)
+
+    width, height = settings['canvas_size']
+    center = (width // 2, height // 2)
+    elements = params_elements(track_params, center, settings['start_direction'])
+    ppm = settings['pixels_per_meter']
+
+    points = None
+    if 'points' in artifacts or 'gpx' in artifacts:
+        points = resample_polyline(track_polyline(elements), settings['point_spacing'])
+
+    for artifact in artifacts:
+        path = artifact_path(output_dir, artifact, sample_id)
+        if artifact == 'points':
+            replace_atomically(path, lambda tmp: np.save(tmp, points))
+        elif artifact == 'gpx':
+            anchor = GeoAnchor(settings['origin_lat'], settings['origin_lon'], settings['heading'],
+                               meters_per_pixel=1.0 / ppm, origin_pixel=center)
+            replace_atomically(path, lambda tmp: write_gpx(tmp, points, anchor, name=sample_id))
+        elif artifact == 'cones':
+            cones = track_cones(elements, settings['lane_offset'], settings['cone_spacing'] * ppm)
+            replace_atomically(path, lambda tmp: write_cone_csv(tmp, cones, center, ppm))
+        elif artifact == 'image':
+            image_width, image_height = settings['image_size']
+            rasterizer = TrackRasterizer(image_width, image_height, world_size=(width, height),
+                                         supersample=settings['supersample'],
+                                         lane_offset=settings['lane_offset'])
+            image = rasterizer.render(elements)
+            replace_atomically(path, lambda tmp: write_png(tmp, image))
+        elif artifact == 'labels':
+            image_width, image_height = settings['image_size']
+            labeler = TrackLabeler(image_width, image_height, world_size=(width, height),
+                                   lane_offset=settings['lane_offset'], distance_scale=1.0 / ppm,
+                                   max_distance=settings['label_max_distance'])
+            mask, sdf = labeler.label(elements, sdf=settings['label_sdf'])
+            replace_atomically(path, lambda tmp: write_labels(tmp, mask, sdf))
+
+    return {
+        'sample': sample_id,
+        'mtime': os.stat(params_path).st_mtime,
+        'sha1': file_hash(params_path),
+        'artifacts': {artifact: settings_hash(settings, artifact) for artifact in artifacts},
+    }
+
+
+def write_labels(path: str, mask: np.ndarray, sdf: Optional[np.ndarray]) -> None:
+    """mask (H, W) uint8 and, if given, sdf (H, W) float32 in meters, as one .npz"""
+    arrays = {'mask': mask} if sdf is None else {'mask': mask, 'sdf': sdf}
+    np.savez_compressed(path, **arrays)
+
+
+def write_cone_csv(path: str, cones: Dict[str, np.ndarray], center: Sequence[float],
+                   pixels_per_meter: float) -> None:
+    """Cones as tag,x,y in meters from the canvas center, x right and y up"""
+    with open(path, 'w') as f:
+        f.write("tag,x,y\n")
+        for side, tag in (('left', 'blue'), ('right', 'yellow')):
+            x = (cones[side][:, 0] - center[0]) / pixels_per_meter
+            y = (center[1] - cones[side][:, 1]) / pixels_per_meter
+            for cone_x, cone_y in zip(x, y):
+                f.write(f"{tag},{cone_x:.3f},{cone_y:.3f}\n")
+
+
+def load_manifest(output_dir: str) -> Dict[str, Any]:
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {'samples': {}}
+
+
+def save_manifest(output_dir: str, manifest: Dict[str, Any]) -> None:
+    def write(tmp_path: str) -> None:
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    replace_atomically(os.path.join(output_dir, MANIFEST_NAME), write)
+
+
+def stale_artifacts(params_path: str, output_dir: str, artifacts: Sequence[str],
+                    settings: Dict[str, Any], entry: Optional[Dict[str, Any]]) -> List[str]:
+    """Artifacts of one sample that are missing or out of date"""
+    sample_id = os.path.splitext(os.path.basename(params_path))[0]
+    if entry is None:
+        return list(artifacts)
+
+    # Same mtime means unchanged; otherwise fall back to comparing content hashes
+    source_changed = False
+    mtime = os.stat(params_path).st_mtime
+    if entry.get('mtime') != mtime:
+        source_changed = entry.get('sha1') != file_hash(params_path)
+        if not source_changed:
+            entry['mtime'] = mtime
+    if source_changed:
+        return list(artifacts)
+
+    return [artifact for artifact in artifacts
+            if entry['artifacts'].get(artifact) != settings_hash(settings, artifact)
+            or not os.path.exists(artifact_path(output_dir, artifact, sample_id))]
+
+
+def batch_export(dataset_dir: str, output_dir: Optional[str] = None,
+                 artifacts: Sequence[str] = tuple(ARTIFACTS), jobs: Optional[int] = None,
+                 force: bool = False, settings: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+    """Export every processed/track_*.json under dataset_dir, skipping up-to-date outputs"""
+    settings = {**copy.deepcopy(DEFAULT_SETTINGS), **(settings or {})}
+    output_dir = output_dir or os.path.join(dataset_dir, "exports")
+    for artifact in artifacts:
+        os.makedirs(os.path.dirname(artifact_path(output_dir, artifact, "x")), exist_ok=True)
+
+    manifest = load_manifest(output_dir)
+    samples = manifest['samples']
+    params_paths = sorted(glob.glob(os.path.join(dataset_dir, "processed", "track_*.json")))
+
+    work = []
+    for params_path in params_paths:
+        sample_id = os.path.splitext(os.path.basename(params_path))[0]
+        todo = list(artifacts) if force else stale_artifacts(
+            params_path, output_dir, artifacts, settings, samples.get(sample_id))
+        if todo:
+            work.append((params_path, todo))
+
+    summary = {'samples': len(params_paths), 'exported': 0, 'skipped': len(params_paths) - len(work),
+               'failed': 0}
+
+    def record(result: Dict[str, Any]) -> None:
+        entry = samples.setdefault(result['sample'], {'artifacts': {}})
+        if entry.get('sha1') != result['sha1']:
+            # Outputs not rebuilt this run were made from the old source
+            entry['artifacts'] = {}
+        entry['mtime'] = result['mtime']
+        entry['sha1'] = result['sha1']
+        entry['artifacts'].update(result['artifacts'])
+        summary['exported'] += 1
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(work) <= 1:
+        for params_path, todo in work:
+            try:
+                record(export_sample(params_path, output_dir, todo, settings))
+            except Exception as e:
+                print(f"Export of {params_path} failed: {e}")
+                summary['failed'] += 1
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(export_sample, params_path, output_dir, todo, settings): params_path
+                       for params_path, todo in work}
+            for future in as_completed(futures):
+                try:
+                    record(future.result())
+                except Exception as e:
+                    print(f"Export of {futures[future]} failed: {e}")
+                    summary['failed'] += 1
+
+    save_manifest(output_dir, manifest)
+    return summary
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Re-export a generated dataset (processed/track_*.json) as points, GPX, cone maps, images and labels")
+    parser.add_argument("dataset_dir", help="Dataset directory, e.g. data")
+    parser.add_argument("--output-dir", help="Where to write exports (default: <dataset_dir>/exports)")
+    parser.add_argument("--artifacts", default=",".join(ARTIFACTS),
+                        help=f"Comma-separated subset of {', '.join(ARTIFACTS)}")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Re-export even up-to-date samples")
+    parser.add_argument("--image-size", help="Image size as WIDTHxHEIGHT")
+    parser.add_argument("--point-spacing", type=float, help="Pixels between exported centerline points")
+    parser.add_argument("--cone-spacing", type=float, help="Meters between cones")
+    parser.add_argument("--origin-lat", type=float, help="Latitude of the canvas center")
+    parser.add_argument("--origin-lon", type=float, help="Longitude of the canvas center")
+    parser.add_argument("--heading", type=float, help="Compass bearing of canvas 'up' in degrees")
+    parser.add_argument("--no-sdf", action="store_true", help="Write only the drivable-area mask in labels")
+    parser.add_argument("--label-max-distance", type=float, help="Meters to clip the label distance field to")
+    args = parser.parse_args(argv)
+
+    artifacts = [artifact.strip() for artifact in args.artifacts.split(",") if artifact.strip()]
+    unknown = [artifact for artifact in artifacts if artifact not in ARTIFACTS]
+    if unknown:
+        parser.error(f"Unknown artifacts: {', '.join(unknown)}")
+
+    settings = {}
+    if args.image_size:
+        settings['image_size'] = [int(v) for v in args.image_size.lower().split("x")]
+    if args.no_sdf:
+        settings['label_sdf'] = False
+    for key in ('point_spacing', 'cone_spacing', 'origin_lat', 'origin_lon', 'heading', 'label_max_distance'):
+        if getattr(args, key) is not None:
+            settings[key] = getattr(args, key)
+
+    summary = batch_export(args.dataset_dir, args.output_dir, artifacts, args.jobs, args.force, settings)
+    print(f"Samples: {summary['samples']}, exported: {summary['exported']}, "
+          f"up to date: {summary['skipped']}, failed: {summary['failed']}")
+
+
+if __name__ == "__main__":
+    main()
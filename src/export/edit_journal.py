@@ -0,0 +1,177 @@
+from typing import Any, Dict, List
+import json
+import os
+from src.export.async_exporter import replace_atomically
+
+# Track project format: a directory holding a compacted snapshot of the canvas
+# state plus an append-only journal of the edits made since that snapshot.
+#
+#   snapshot.json        track elements, undo poses, current pose, generation
+#   journal_<gen>.jsonl  one edit per line, e.g. {"op": "straight", "length": 100}
+#
+# Every edit is one appended line. Compaction writes a new snapshot under the
+# next generation number and starts a fresh journal; until the snapshot is
+# replaced the old generation stays authoritative, so a crash at any point
+# leaves a consistent project.
+
+SNAPSHOT_FILE = "snapshot.json"
+
+
+class EditJournal:
+    """
+    Append-only edit log for a TrackCanvas.
+
+    open() restores the canvas from the snapshot, replays the journal on top
+    and attaches itself, after which the canvas calls record() on every edit.
+    A snapshot is written every snapshot_interval edits so reopening a big
+    track only replays a short tail.
+    """
+
+    def __init__(self, directory: str, snapshot_interval: int = 256, sync: bool = True) -> None:
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self.sync = sync  # fsync every edit, so even a power loss costs at most one
+        self.canvas = None
+        self.generation = 0
+        self.journal_file = None
+        self.edits_since_snapshot = 0
+
+    def journal_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"journal_{generation}.jsonl")
+
+    def open(self, canvas) -> int:
+        """Load the project into canvas and start journaling it; returns the number of replayed edits"""
+        os.makedirs(self.directory, exist_ok=True)
+        self.canvas = canvas
+        canvas.journal = None  # Replayed edits must not be journaled again
+
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path) as f:
+                snapshot = json.load(f)
+            self.generation = snapshot['generation']
+            restore_canvas_state(canvas, snapshot['state'])
+
+        edits = self.read_journal()
+        for edit in edits:
+            apply_edit(canvas, edit)
+        self.edits_since_snapshot = len(edits)
+
+        self.journal_file = open(self.journal_path(self.generation), 'a')
+        canvas.journal = self
+        self.remove_stale_journals()
+        return len(edits)
+
+    def read_journal(self) -> List[Dict[str, Any]]:
+        """Edits of the current generation, dropping a torn last line left by a crash"""
+        path = self.journal_path(self.generation)
+        if not os.path.exists(path):
+            return []
+        edits = []
+        good_size = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    edits.append(json.loads(line))
+                except ValueError:
+                    break
+                good_size += len(line)
+        if good_size < os.path.getsize(path):
+            with open(path, 'r+b') as f:
+                f.truncate(good_size)
+        return edits
+
+    def record(self, op: str, **args) -> None:
+        """Append one edit; called by the canvas after it applied the edit"""
+        if self.journal_file is None:
+            return
+        self.journal_file.write(json.dumps({'op': op, **args}) + "\n")
+        self.journal_file.flush()
+        if self.sync:
+            os.fsync(self.journal_file.fileno())
+        self.edits_since_snapshot += 1
+        if self.edits_since_snapshot >= self.snapshot_interval:
+            self.snapshot()
+
+    def snapshot(self) -> None:
+        """Compact: write the full canvas state as a new generation and start an empty journal"""
+        if self.canvas is None or self.journal_file is None:
+            return
+        generation = self.generation + 1
+        open(self.journal_path(generation), 'w').close()
+        snapshot = {'generation': generation, 'state': canvas_state(self.canvas)}
+
+        def write(path: str) -> None:
+            with open(path, 'w') as f:
+                json.dump(snapshot, f)
+                f.flush()
+                os.fsync(f.fileno())
+
+        replace_atomically(os.path.join(self.directory, SNAPSHOT_FILE), write)
+        self.journal_file.close()
+        self.generation = generation
+        self.journal_file = open(self.journal_path(generation), 'a')
+        self.edits_since_snapshot = 0
+        self.remove_stale_journals()
+
+    def remove_stale_journals(self) -> None:
+        for name in os.listdir(self.directory):
+            if name.startswith("journal_") and name != os.path.basename(self.journal_path(self.generation)):
+                os.remove(os.path.join(self.directory, name))
+
+    def close(self) -> None:
+        """Snapshot if anything changed, then detach from the canvas"""
+        if self.journal_file is None:
+            return
+        if self.edits_since_snapshot:
+            self.snapshot()
+        self.journal_file.close()
+        self.journal_file = None
+        if self.canvas is not None and self.canvas.journal is self:
+            self.canvas.journal = None
+
+
+def canvas_state(canvas) -> Dict[str, Any]:
+    """JSON-ready copy of everything the edit operations change"""
+    return {
+        'elements': canvas.track_elements,
+        # Pose before each element was added, which undo returns to
+        'undo_poses': [[list(pos), direction] for _, _, (pos, direction) in canvas.undo_stack],
+        'current_pos': list(canvas.current_pos),
+        'current_direction': canvas.current_direction,
+    }
+
+
+def restore_canvas_state(canvas, state: Dict[str, Any]) -> None:
+    elements = []
+    for element in state['elements']:
+        # JSON turns the point tuples into lists
+        elements.append({key: tuple(value) if isinstance(value, list) else value
+                         for key, value in element.items()})
+    canvas.track_elements = elements
+    canvas.undo_stack = [('add', element, (tuple(pos), direction))
+                         for element, (pos, direction) in zip(elements, state['undo_poses'])]
+    canvas.current_pos = tuple(state['current_pos'])
+    canvas.current_direction = state['current_direction']
+    canvas.track_changed()
+
+
+def apply_edit(canvas, edit: Dict[str, Any]) -> None:
+    """Replay one journaled edit through the canvas' own edit methods"""
+    op = edit['op']
+    if op == 'straight':
+        canvas.add_straight_segment(edit['length'])
+    elif op == 'curve':
+        canvas.add_curve_segment(edit['direction'], edit['angle'], edit['radius'])
+    elif op == 'undo':
+        canvas.undo()
+    elif op == 'clear':
+        canvas.clear_track()
+    elif op == 'pose':
+        canvas.set_pose(tuple(edit['pos']), edit['direction'])
+    elif op == 'import':
+        canvas.import_elements(edit['elements'], edit['poses'])
+    else:
+        print(f"Skipping unknown journal edit: {op}")
@@ -0,0 +1,186 @@
+from typing import Any, Dict
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+import io
+import threading
+import time
+import numpy as np
+from src.export.async_exporter import replace_atomically
+from src.export.png import encode_png, write_png
+
+# Image encoders for exported and generated track images. Every encoder turns
+# an (H, W) or (H, W, C) uint8 array into one file; the format is picked per
+# dataset with a spec string such as "png", "png:1", "npy" or "mask".
+
+
+class ImageEncoder(ABC):
+    """Base class: encode(image) returns the file contents, write(path, image) stores them"""
+
+    name = ""
+    extension = ""
+
+    @abstractmethod
+    def encode(self, image: np.ndarray) -> bytes:
+        pass
+
+    def write(self, path: str, image: np.ndarray) -> None:
+        with open(path, 'wb') as f:
+            f.write(self.encode(image))
+
+
+class PNGEncoder(ImageEncoder):
+    """
+    PNG with a selectable zlib level (0 = store, 1 = fastest, 9 = smallest).
+    With threads > 1 each image is deflated in parallel blocks, which helps
+    single large exports; batches are better parallelized across images.
+    """
+
+    name = "png"
+    extension = ".png"
+
+    def __init__(self, compression: int = 6, threads: int = 1) -> None:
+        self.compression = compression
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix="deflate") if threads > 1 else None
+
+    def encode(self, image: np.ndarray) -> bytes:
+        return encode_png(image, self.compression, executor=self.executor)
+
+    def write(self, path: str, image: np.ndarray) -> None:
+        write_png(path, image, self.compression, executor=self.executor)
+
+
+class NpyEncoder(ImageEncoder):
+    """Raw uint8 .npy: no compression cost and memory-mappable, but the largest files"""
+
+    name = "npy"
+    extension = ".npy"
+
+    def encode(self, image: np.ndarray) -> bytes:
+        buffer = io.BytesIO()
+        np.save(buffer, np.ascontiguousarray(image, dtype=np.uint8))
+        return buffer.getvalue()
+
+    def write(self, path: str, image: np.ndarray) -> None:
+        np.save(path, np.ascontiguousarray(image, dtype=np.uint8))
+
+
+class MaskEncoder(ImageEncoder):
+    """
+    1-bit PNG mask for line-only renders: a pixel is set where any channel
+    differs from the background by more than threshold. Eight pixels per byte
+    before compression, so these are by far the smallest and fastest to write.
+    """
+
+    name = "mask"
+    extension = ".png"
+
+    def __init__(self, compression: int = 6, background: int = 255, threshold: int = 64) -> None:
+        self.compression = compression
+        self.background = background
+        self.threshold = threshold
+
+        # Lookup table instead of widening the image to compute differences
+        self.is_set = np.abs(np.arange(256) - background) > threshold
+
+    def mask(self, image: np.ndarray) -> np.ndarray:
+        mask = np.take(self.is_set, np.asarray(image, dtype=np.uint8))
+        if mask.ndim == 3:
+            channels = mask
+            mask = channels[:, :, 0].copy()
+            for channel in range(1, channels.shape[2]):
+                mask |= channels[:, :, channel]  # Much faster than any(axis=2)
+        return mask
+
+    def encode(self, image: np.ndarray) -> bytes:
+        return encode_png(self.mask(image), self.compression, bit_depth=1)
+
+    def write(self, path: str, image: np.ndarray) -> None:
+        write_png(path, self.mask(image), self.compression, bit_depth=1)
+
+
+ENCODERS = {encoder.name: encoder for encoder in (PNGEncoder, NpyEncoder, MaskEncoder)}
+
+
+def make_encoder(spec: str = "png") -> ImageEncoder:
+    """Encoder from a spec like "png", "png:9" or "mask:1" (the number is the compression level)"""
+    name, _, level = spec.partition(":")
+    if name not in ENCODERS:
+        raise ValueError(f"Unknown image format {name!r}, expected one of {', '.join(ENCODERS)}")
+    if level:
+        if name == "npy":
+            raise ValueError("npy images are not compressed")
+        return ENCODERS[name](compression=int(level))
+    return ENCODERS[name]()
+
+
+class EncoderPool:
+    """
+    Encodes and writes images on worker threads, so rendering the next image
+    overlaps with encoding the previous ones (zlib and NumPy release the GIL).
+    At most max_pending images wait at a time; submit() blocks beyond that,
+    which bounds the memory held by queued images.
+    """
+
+    def __init__(self, encoder: ImageEncoder, max_workers: int = 2, max_pending: int = 8) -> None:
+        self.encoder = encoder
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="encode")
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.lock = threading.Lock()
+        self.futures = set()
+        self.encoded = 0
+        self.failed = 0
+        self.encode_seconds = 0.0
+
+    def path_for(self, root: str) -> str:
+        """Output path for a path without extension"""
+        return root + self.encoder.extension
+
+    def submit(self, root: str, image: np.ndarray) -> Future:
+        """Queue image for writing to root + the encoder's extension"""
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(self.encode, self.path_for(root), image)
+        except Exception:
+            self.slots.release()
+            raise
+        with self.lock:
+            self.futures.add(future)
+        future.add_done_callback(self.job_done)
+        return future
+
+    def encode(self, path: str, image: np.ndarray) -> str:
+        start = time.perf_counter()
+        replace_atomically(path, lambda tmp_path: self.encoder.write(tmp_path, image))
+        with self.lock:
+            self.encoded += 1
+            self.encode_seconds += time.perf_counter() - start
+        return path
+
+    def job_done(self, future: Future) -> None:
+        self.slots.release()
+        with self.lock:
+            self.futures.discard(future)
+            if future.exception() is not None:
+                self.failed += 1
+                print(f"Image encoding failed: {future.exception()}")
+
+    def flush(self) -> None:
+        """Block until every submitted image is written"""
+        with self.lock:
+            futures = list(self.futures)
+        for future in futures:
+            future.exception()  # Waits without raising
+
+    def shutdown(self) -> None:
+        self.flush()
+        self.executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'format': self.encoder.name,
+                'encoded': self.encoded,
+                'failed': self.failed,
+                'pending': len(self.futures),
+                'mean_encode_ms': 1000 * self.encode_seconds / self.encoded if self.encoded else 0.0,
+            }
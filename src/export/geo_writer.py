@@ -0,0 +1,141 @@
+from typing import Iterable, Iterator, Optional, Tuple, Union
+import json
+import math
+import xml.etree.ElementTree as ET
+import numpy as np
+from utils.geometry import PIXELS_PER_METER
+
+EARTH_RADIUS = 6378137.0  # WGS84 equatorial radius in meters
+
+PointSource = Union[np.ndarray, Iterable[np.ndarray]]
+
+
+class GeoAnchor:
+    """
+    Places canvas pixels on the globe.
+
+    origin_pixel lands on (origin_lat, origin_lon), one pixel is
+    meters_per_pixel meters, and heading is the compass bearing (degrees,
+    clockwise from north) the canvas "up" direction points to. Pixels are
+    projected on the local tangent plane, which is accurate to well below a
+    pixel over the few kilometers a track spans.
+    """
+
+    def __init__(self, origin_lat: float = 0.0, origin_lon: float = 0.0,
+                 heading: float = 0.0, meters_per_pixel: float = 1 / PIXELS_PER_METER,
+                 origin_pixel: Tuple[float, float] = (0.0, 0.0)) -> None:
+        self.origin_lat = origin_lat
+        self.origin_lon = origin_lon
+        self.heading = heading
+        self.meters_per_pixel = meters_per_pixel
+        self.origin_pixel = origin_pixel
+
+    @classmethod
+    def from_canvas(cls, track_canvas, origin_lat: float = 0.0, origin_lon: float = 0.0,
+                    heading: float = 0.0) -> 'GeoAnchor':
+        """Anchor matching the canvas scale, with the canvas center at the origin"""
+        return cls(origin_lat, origin_lon, heading,
+                   meters_per_pixel=1.0 / track_canvas.pixels_per_meter,
+                   origin_pixel=(track_canvas.width / 2, track_canvas.height / 2))
+
+    def to_meters(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(east, north) offsets in meters from the origin for (N, 2) pixel points"""
+        points = np.asarray(points, dtype=np.float64)
+        right = (points[:, 0] - self.origin_pixel[0]) * self.meters_per_pixel
+        up = (self.origin_pixel[1] - points[:, 1]) * self.meters_per_pixel  # Pixel y grows downward
+        h = math.radians(self.heading)
+        east = right * math.cos(h) + up * math.sin(h)
+        north = up * math.cos(h) - right * math.sin(h)
+        return east, north
+
+    def to_lat_lon(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Latitudes and longitudes in degrees for (N, 2) pixel points"""
+        east, north = self.to_meters(points)
+        lat = self.origin_lat + np.degrees(north / EARTH_RADIUS)
+        lon = self.origin_lon + np.degrees(east / (EARTH_RADIUS * math.cos(math.radians(self.origin_lat))))
+        return lat, lon
+
+    def to_pixels(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """Inverse of to_lat_lon"""
+        north = np.radians(np.asarray(lat, dtype=np.float64) - self.origin_lat) * EARTH_RADIUS
+        east = (np.radians(np.asarray(lon, dtype=np.float64) - self.origin_lon) *
+                EARTH_RADIUS * math.cos(math.radians(self.origin_lat)))
+        h = math.radians(self.heading)
+        right = east * math.cos(h) - north * math.sin(h)
+        up = east * math.sin(h) + north * math.cos(h)
+        return np.stack([self.origin_pixel[0] + right / self.meters_per_pixel,
+                         self.origin_pixel[1] - up / self.meters_per_pixel], axis=1)
+
+
+def iter_point_chunks(points: PointSource, chunk_size: int = 65536) -> Iterator[np.ndarray]:
+    """Yield (n, 2) blocks from an array (memory-maps are read block by block) or an iterable of arrays"""
+    if isinstance(points, np.ndarray):
+        for first in range(0, len(points), chunk_size):
+            yield points[first:first + chunk_size]
+    else:
+        for chunk in points:
+            yield np.asarray(chunk)
+
+
+def format_chunk(template: str, separator: str, *columns: np.ndarray) -> str:
+    """Format whole columns with one %-operation instead of one per point"""
+    if len(columns[0]) == 0:
+        return ""
+    values = np.stack(columns, axis=1).ravel().tolist()
+    return separator.join([template] * len(columns[0])) % tuple(values)
+
+
+def write_gpx(path: str, points: PointSource, anchor: GeoAnchor,
+              name: Optional[str] = None, chunk_size: int = 65536) -> int:
+    """Stream points into a single-segment GPX track; returns the number of points"""
+    count = 0
+    with open(path, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<gpx version="1.1" creator="formula-student-track-builder" '
+                'xmlns="http://www.topografix.com/GPX/1/1">\n  <trk>\n')
+        if name:
+            f.write(f"    <name>{xml_escape(name)}</name>\n")
+        f.write("    <trkseg>\n")
+        for chunk in iter_point_chunks(points, chunk_size):
+            lat, lon = anchor.to_lat_lon(chunk)
+            f.write(format_chunk('      <trkpt lat="%.8f" lon="%.8f"></trkpt>', "\n", lat, lon))
+            if len(chunk):
+                f.write("\n")
+            count += len(chunk)
+        f.write("    </trkseg>\n  </trk>\n</gpx>\n")
+    return count
+
+
+def write_geojson(path: str, points: PointSource, anchor: GeoAnchor,
+                  properties: Optional[dict] = None, chunk_size: int = 65536) -> int:
+    """Stream points into a GeoJSON LineString feature; returns the number of points"""
+    count = 0
+    with open(path, 'w') as f:
+        f.write('{"type": "FeatureCollection", "features": [{"type": "Feature", '
+                f'"properties": {json.dumps(properties or {})}, '
+                '"geometry": {"type": "LineString", "coordinates": [')
+        for chunk in iter_point_chunks(points, chunk_size):
+            if not len(chunk):
+                continue
+            lat, lon = anchor.to_lat_lon(chunk)
+            if count:
+                f.write(", ")
+            f.write(format_chunk("[%.8f, %.8f]", ", ", lon, lat))  # GeoJSON is lon, lat
+            count += len(chunk)
+        f.write("]}}]}\n")
+    return count
+
+
+def read_gpx_points(path: str) -> np.ndarray:
+    """(N, 2) lat, lon of every track point, parsed incrementally"""
+    values = []
+    for _, element in ET.iterparse(path, events=('end',)):
+        if element.tag.endswith('trkpt') or element.tag.endswith('rtept'):
+            values.append(float(element.get('lat')))
+            values.append(float(element.get('lon')))
+            element.clear()
+    return np.array(values, dtype=np.float64).reshape(-1, 2)
+
+
+def xml_escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
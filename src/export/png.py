@@ -0,0 +1,142 @@
+from concurrent.futures import Executor
+from typing import Optional
+import struct
+import zlib
+import numpy as np
+
+# Minimal PNG encoder for uint8 arrays, so headless exports need neither pygame nor PIL
+
+COLOR_TYPES = {1: 0, 2: 4, 3: 2, 4: 6}  # channels -> PNG color type (gray, gray+alpha, RGB, RGBA)
+
+
+def encode_png(image: np.ndarray, compression: int = 6, bit_depth: int = 8,
+               executor: Optional[Executor] = None) -> bytes:
+    """
+    Encode an (H, W), (H, W, C) uint8 array as PNG. With bit_depth=1 the image
+    must be a 2-D mask; nonzero pixels become white. Given an executor, large
+    images are deflated in parallel blocks (see compress_parallel).
+    """
+    image = np.asarray(image)
+    if image.ndim == 2:
+        image = image[:, :, None]
+    height, width, channels = image.shape
+
+    if bit_depth == 1:
+        if channels != 1:
+            raise ValueError("1-bit PNGs must be single-channel masks")
+        rows = np.packbits(image[:, :, 0] != 0, axis=1)
+        color_type = 0
+    elif bit_depth == 8:
+        rows = np.ascontiguousarray(image, dtype=np.uint8).reshape(height, width * channels)
+        color_type = COLOR_TYPES[channels]
+    else:
+        raise ValueError(f"Unsupported bit depth: {bit_depth}")
+
+    # Filter type 0 (None) in front of every row
+    raw = np.concatenate([np.zeros((height, 1), dtype=np.uint8), rows], axis=1)
+    header = struct.pack(">IIBBBBB", width, height, bit_depth, color_type, 0, 0, 0)
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        png_chunk(b"IHDR", header),
+        png_chunk(b"IDAT", compress_parallel(raw.tobytes(), compression, executor)),
+        png_chunk(b"IEND", b""),
+    ])
+
+
+def write_png(path: str, image: np.ndarray, compression: int = 6, bit_depth: int = 8,
+              executor: Optional[Executor] = None) -> None:
+    with open(path, 'wb') as f:
+        f.write(encode_png(image, compression, bit_depth, executor))
+
+
+class PngWriter:
+    """
+    Streams an 8-bit image of known size to a PNG file in bands of rows, so
+    only the band being written is ever in memory. Rows are deflated as they
+    arrive and flushed in IDAT chunks of about chunk_size bytes.
+    """
+
+    def __init__(self, path: str, width: int, height: int, channels: int = 3,
+                 compression: int = 6, chunk_size: int = 1 << 20) -> None:
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.chunk_size = chunk_size
+        self.rows_written = 0
+        self.compressor = zlib.compressobj(compression)
+        self.pending = []  # Deflated bytes not yet in a chunk
+        self.pending_size = 0
+        self.file = open(path, 'wb')
+        header = struct.pack(">IIBBBBB", width, height, 8, COLOR_TYPES[channels], 0, 0, 0)
+        self.file.write(b"\x89PNG\r\n\x1a\n" + png_chunk(b"IHDR", header))
+
+    def write_rows(self, rows: np.ndarray) -> None:
+        """Append (h, W) or (h, W, C) uint8 rows below the ones already written"""
+        rows = np.asarray(rows, dtype=np.uint8).reshape(len(rows), -1)
+        if rows.shape[1] != self.width * self.channels:
+            raise ValueError(f"Rows of {rows.shape[1]} bytes, expected {self.width * self.channels}")
+        if self.rows_written + len(rows) > self.height:
+            raise ValueError(f"More than {self.height} rows written")
+        # Filter type 0 (None) in front of every row, as in encode_png
+        raw = np.zeros((len(rows), rows.shape[1] + 1), dtype=np.uint8)
+        raw[:, 1:] = rows
+        self.add(self.compressor.compress(raw))
+        self.rows_written += len(rows)
+
+    def add(self, data: bytes, final: bool = False) -> None:
+        if data:
+            self.pending.append(data)
+            self.pending_size += len(data)
+        if self.pending_size >= self.chunk_size or (final and self.pending_size):
+            self.file.write(png_chunk(b"IDAT", b"".join(self.pending)))
+            self.pending = []
+            self.pending_size = 0
+
+    def close(self) -> None:
+        """Finish the file; every row must have been written"""
+        if self.file.closed:
+            return
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"Only {self.rows_written} of {self.height} rows written")
+            self.add(self.compressor.flush(), final=True)
+            self.file.write(png_chunk(b"IEND", b""))
+        finally:
+            self.file.close()
+
+    def __enter__(self) -> 'PngWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()  # Leave the partial file to the caller, e.g. replace_atomically's temp name
+
+
+def compress_parallel(data: bytes, level: int = 6, executor: Optional[Executor] = None,
+                      block_size: int = 1 << 20) -> bytes:
+    """
+    zlib-compress data, deflating block_size pieces independently on executor.
+    Each piece is a raw deflate stream ended with a sync flush, so the pieces
+    concatenate into one valid stream (the pigz approach); the ratio is a hair
+    worse because no piece sees its predecessor's history.
+    """
+    if executor is None or len(data) <= block_size:
+        return zlib.compress(data, level)
+    view = memoryview(data)
+    starts = range(0, len(data), block_size)
+    last = starts[-1]
+
+    def deflate(start: int) -> bytes:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)  # Raw deflate, no header
+        body = compressor.compress(view[start:start + block_size])
+        return body + compressor.flush(zlib.Z_FINISH if start == last else zlib.Z_SYNC_FLUSH)
+
+    parts = list(executor.map(deflate, starts))
+    # zlib header (deflate, 32K window) and the Adler-32 of the whole input
+    return b"\x78\x9c" + b"".join(parts) + struct.pack(">I", zlib.adler32(data) & 0xffffffff)
+
+
+def png_chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
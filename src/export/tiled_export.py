@@ -0,0 +1,84 @@
+from typing import Callable, Optional, Tuple
+import math
+import numpy as np
+import pygame
+from src.export.png import PngWriter
+from src.gui.tiled_background import TiledBackground, draw_scaled_image
+
+# Track-over-background images far larger than the window, e.g. 16k pixels
+# across for printed layout sheets. The image is rendered tile by tile and
+# streamed to a PNG one band of tiles at a time, so memory follows the tile
+# size, never the image size.
+
+
+class TiledImageExport:
+    """
+    One export of a TrackCanvas at width pixels across (height keeps the
+    canvas aspect ratio), drawn the way the canvas draws itself at zoom
+    width / canvas.width with no pan.
+
+    The constructor snapshots everything it draws on the calling thread, so
+    write() may run on an exporter thread while the editor carries on. Tiles
+    are tile_size pixels; each band of tiles, width x tile height pixels, is
+    the largest buffer held, and a tall tile_size[1] only costs memory.
+    """
+
+    def __init__(self, canvas, width: int, tile_size: Tuple[int, int] = (2048, 512),
+                 compression: int = 6, margin: int = 64) -> None:
+        self.canvas = canvas
+        self.zoom = width / canvas.width
+        self.width = width
+        self.height = max(1, int(round(canvas.height * self.zoom)))
+        self.tile_size = tile_size
+        self.compression = compression
+        # Tiles are drawn with this many extra pixels on every side and cropped:
+        # pygame rounds where it clips lines and truncates negative coordinates,
+        # which shifts strokes crossing a surface edge by a pixel; the margin
+        # keeps those edges away from the kept pixels (tiles may still differ
+        # from one big render by a stray edge pixel on long clipped arcs)
+        self.margin = margin
+        self.elements = list(canvas.track_elements)
+
+        # The tile cache of the canvas' pyramid is not thread-safe: the export
+        # pages tiles through its own view of the same files
+        self.tiled_background = None
+        self.background_image = None
+        if canvas.tiled_background is not None:
+            self.tiled_background = TiledBackground(canvas.tiled_background.cache_dir, max_tiles=16)
+        elif canvas.background_image is not None:
+            self.background_image = canvas.background_image.copy()
+
+    def render_tile(self, surface: pygame.Surface, x: int, y: int) -> None:
+        """Draw the export pixels starting at (x, y) onto surface, margin pixels in from its corner"""
+        offset = (self.margin - x, self.margin - y)
+        world_size = (self.canvas.width, self.canvas.height)
+        surface.fill((255, 255, 255))
+        if self.tiled_background is not None:
+            self.tiled_background.draw(surface, world_size, self.zoom, offset)
+        elif self.background_image is not None:
+            draw_scaled_image(surface, self.background_image, world_size, self.zoom, offset)
+        self.canvas.draw_track(surface, self.zoom, offset, self.elements)
+
+    def write(self, path: str, progress: Optional[Callable[[int, int], None]] = None) -> None:
+        """Render every tile and stream the image to path; progress(rows_done, height) after each band"""
+        tile_width, tile_height = self.tile_size
+        m = self.margin
+        tile = pygame.Surface((tile_width + 2 * m, tile_height + 2 * m))
+        band = np.empty((tile_height, self.width, 3), dtype=np.uint8)
+        with PngWriter(path, self.width, self.height, compression=self.compression) as writer:
+            for y in range(0, self.height, tile_height):
+                rows = min(tile_height, self.height - y)
+                for x in range(0, self.width, tile_width):
+                    columns = min(tile_width, self.width - x)
+                    self.render_tile(tile, x, y)
+                    pixels = pygame.surfarray.pixels3d(tile)
+                    band[:rows, x:x + columns] = pixels[m:m + columns, m:m + rows].transpose(1, 0, 2)
+                    del pixels  # Unlocks the tile surface for the next render
+                writer.write_rows(band[:rows])
+                if progress is not None:
+                    progress(y + rows, self.height)
+
+    @property
+    def tiles(self) -> int:
+        return (math.ceil(self.width / self.tile_size[0]) *
+                math.ceil(self.height / self.tile_size[1]))
@@ -0,0 +1,465 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import copy
+import glob
+import json
+import math
+import os
+import numpy as np
+from utils.geometry import PIXELS_PER_METER, resample_polyline
+from src.data_generation.labels import arc_distances, element_arrays, straight_distances
+from src.export.async_exporter import replace_atomically
+from src.export.geo_writer import GeoAnchor, read_gpx_points
+
+# Bring surveyed or exported tracks (GPX, or NPY point arrays like the ones
+# the editor saves) back as editable track elements. The polyline is
+# resampled evenly, cut where its smoothed curvature changes class
+# (straight, left, right), and every piece is fitted by least squares with a
+# line or a circle. Pieces that miss their points by more than tolerance are
+# split at the worst point, and neighbours that fit together are merged
+# again, so each element is the longest primitive within tolerance. Runs
+# headless: nothing here imports pygame.
+
+DEFAULT_SETTINGS = {
+    'spacing': 2.0,  # Pixels between resampled points
+    'tolerance': 1.0,  # Pixels an element may miss its points by
+    'min_length': 8.0,  # Pixels, shortest element fitted on its own
+    'max_radius': 2000.0,  # Pixels; flatter arcs are fitted as straights
+    'curvature_window': 5,  # Samples the curvature is averaged over
+    # GPX files are placed like MainWindow.save_as_gpx writes them: canvas
+    # center on the origin, pixels_per_meter scale, canvas "up" at heading
+    'canvas_size': [1280, 1000],
+    'pixels_per_meter': PIXELS_PER_METER,
+    'origin_lat': 0.0,
+    'origin_lon': 0.0,
+    'heading': 0.0,
+}
+
+EXTENSIONS = ('.gpx', '.npy')
+
+
+def read_track_points(path: str, settings: Optional[Dict[str, Any]] = None) -> np.ndarray:
+    """(N, 2) canvas pixel points of a GPX track or an NPY point array"""
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    if path.lower().endswith('.gpx'):
+        width, height = settings['canvas_size']
+        anchor = GeoAnchor(settings['origin_lat'], settings['origin_lon'], settings['heading'],
+                           meters_per_pixel=1.0 / settings['pixels_per_meter'],
+                           origin_pixel=(width / 2, height / 2))
+        lat_lon = read_gpx_points(path)
+        points = anchor.to_pixels(lat_lon[:, 0], lat_lon[:, 1])
+    else:
+        points = np.asarray(np.load(path), dtype=np.float64).reshape(-1, 2)
+    points = points[np.isfinite(points).all(axis=1)]
+    # Repeated points carry no direction
+    keep = np.concatenate([[True], np.hypot(*np.diff(points, axis=0).T) > 1e-9])
+    return points[keep]
+
+
+def smoothed_curvature(points: np.ndarray, spacing: float, window: int) -> np.ndarray:
+    """Signed curvature at every point of an evenly spaced polyline, averaged over window samples"""
+    headings = np.unwrap(np.arctan2(*np.diff(points, axis=0).T[::-1]))
+    turns = np.diff(headings) / spacing
+    curvature = np.concatenate([[turns[0]], turns, [turns[-1]]]) if len(turns) else np.zeros(len(points))
+    if window > 1 and len(curvature) > window:
+        kernel = np.ones(window) / window
+        padded = np.pad(curvature, window // 2, mode='edge')
+        curvature = np.convolve(padded, kernel, mode='valid')[:len(points)]
+    return curvature
+
+
+def fit_line(points: np.ndarray) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """Total least squares line: ({'point', 'direction'}, distance of every point)"""
+    mean = points.mean(axis=0)
+    _, _, vt = np.linalg.svd(points - mean, full_matrices=False)
+    direction = vt[0]
+    if np.dot(points[-1] - points[0], direction) < 0:
+        direction = -direction  # Along the travel direction
+    normal = np.array([-direction[1], direction[0]])
+    return {'point': mean, 'direction': direction}, np.abs((points - mean) @ normal)
+
+
+def fit_circle(points: np.ndarray, iterations: int = 5) -> Tuple[Dict[str, Any], np.ndarray]:
+    """
+    Least squares circle: an algebraic (Kasa) fit refined by a few
+    Gauss-Newton steps on the geometric distances. ({'center', 'radius'},
+    distance of every point to the circle)
+    """
+    mean = points.mean(axis=0)
+    local = points - mean  # Centered, for conditioning
+    design = np.column_stack([2 * local, np.ones(len(local))])
+    (cx, cy, c), *_ = np.linalg.lstsq(design, (local ** 2).sum(axis=1), rcond=None)
+    center = np.array([cx, cy])
+    radius = math.sqrt(max(c + cx * cx + cy * cy, 1e-12))
+
+    for _ in range(iterations):
+        offsets = local - center
+        distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        distances = np.maximum(distances, 1e-12)
+        jacobian = np.column_stack([-offsets / distances[:, None], -np.ones(len(local))])
+        step, *_ = np.linalg.lstsq(jacobian, -(distances - radius), rcond=None)
+        center += step[:2]
+        radius += step[2]
+        if np.abs(step).max() < 1e-9:
+            break
+    distances = np.hypot(*(local - center).T)
+    return {'center': center + mean, 'radius': abs(radius)}, np.abs(distances - abs(radius))
+
+
+def fit_piece(points: np.ndarray, kind: str, max_radius: float) -> Dict[str, Any]:
+    """Best primitive of kind ('straight' or 'curve') for points, with its residuals"""
+    if kind == 'curve' and len(points) >= 3:
+        circle, residuals = fit_circle(points)
+        if circle['radius'] <= max_radius:
+            return {'type': 'curve', **circle, 'residuals': residuals}
+    line, residuals = fit_line(points)
+    return {'type': 'straight', **line, 'residuals': residuals}
+
+
+def segment_polyline(points: np.ndarray, settings: Dict[str, Any]) -> List[Tuple[int, int, Dict[str, Any]]]:
+    """(first, last, fit) of every piece, consecutive pieces sharing their boundary point"""
+    spacing = settings['spacing']
+    tolerance = settings['tolerance']
+    min_points = max(2, int(math.ceil(settings['min_length'] / spacing)) + 1)
+    curvature = smoothed_curvature(points, spacing, settings['curvature_window'])
+    label = np.where(np.abs(curvature) < 1.0 / settings['max_radius'], 0, np.sign(curvature)).astype(int)
+
+    # Runs of one curvature class; runs too short to fit alone join the one before
+    cuts = np.flatnonzero(np.diff(label)) + 1
+    bounds = [0] + [int(c) for c in cuts] + [len(points) - 1]
+    runs = []
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        if runs and last - first + 1 < min_points:
+            runs[-1] = (runs[-1][0], last, runs[-1][2])
+        else:
+            runs.append((first, last, 'straight' if label[min(first + 1, last)] == 0 else 'curve'))
+
+    # Split pieces at their worst point until every piece is within tolerance
+    pieces = []
+    stack = list(reversed(runs))
+    while stack:
+        first, last, kind = stack.pop()
+        fit = fit_piece(points[first:last + 1], kind, settings['max_radius'])
+        if kind == 'straight' and fit['residuals'].max() > tolerance and last - first + 1 >= 3:
+            # A run called straight may be a gentle arc
+            arc = fit_piece(points[first:last + 1], 'curve', settings['max_radius'])
+            if arc['residuals'].max() < fit['residuals'].max():
+                fit, kind = arc, 'curve'
+        if fit['residuals'].max() > tolerance and last - first + 1 >= 2 * min_points:
+            worst = first + int(np.argmax(fit['residuals']))
+            split = min(max(worst, first + min_points - 1), last - min_points + 1)
+            stack.append((split, last, kind))
+            stack.append((first, split, kind))
+        else:
+            pieces.append((first, last, fit))
+
+    pieces = merge_pieces(points, pieces, settings)
+    pieces = refine_boundaries(points, pieces, settings, min_points)
+    pieces = merge_pieces(points, pieces, settings)
+    return refine_boundaries(points, pieces, settings, min_points)
+
+
+def merge_pieces(points: np.ndarray, pieces: List[Tuple[int, int, Dict[str, Any]]],
+                 settings: Dict[str, Any]) -> List[Tuple[int, int, Dict[str, Any]]]:
+    """
+    Join neighbours that a single primitive fits within tolerance, a line
+    before an arc. Neighbours of different types merge too: with noise a run
+    of a straight can come out as a very flat arc, and a short stretch of an
+    arc as a line.
+    """
+    merged = [pieces[0]]
+    for first, last, fit in pieces[1:]:
+        previous_first, _, previous = merged[-1]
+        for kind in ('straight', 'curve'):
+            joined = fit_piece(points[previous_first:last + 1], kind, settings['max_radius'])
+            if joined['type'] == kind and joined['residuals'].max() <= settings['tolerance']:
+                merged[-1] = (previous_first, last, joined)
+                break
+        else:
+            merged.append((first, last, fit))
+    return merged
+
+
+def refine_boundaries(points: np.ndarray, pieces: List[Tuple[int, int, Dict[str, Any]]],
+                      settings: Dict[str, Any], min_points: int) -> List[Tuple[int, int, Dict[str, Any]]]:
+    """
+    Move every boundary to where the two fits together miss the points
+    least. Smoothing blurs curvature over a few samples, so run boundaries
+    land inside the neighbouring piece: an arc swallowing the end of a
+    straight still fits within tolerance, but turns too far.
+    """
+    pieces = list(pieces)
+    window = settings['curvature_window'] + 2
+    for i in range(len(pieces) - 1):
+        first, boundary, fit = pieces[i]
+        _, last, next_fit = pieces[i + 1]
+        within = max(fit['residuals'].max(), next_fit['residuals'].max()) <= settings['tolerance']
+        best = None
+        for split in range(max(first + min_points - 1, boundary - window),
+                           min(last - min_points + 1, boundary + window) + 1):
+            left = fit_piece(points[first:split + 1], fit['type'], settings['max_radius'])
+            right = fit_piece(points[split:last + 1], next_fit['type'], settings['max_radius'])
+            if within and max(left['residuals'].max(), right['residuals'].max()) > settings['tolerance']:
+                continue  # Never trade a fit within tolerance for a closer one outside it
+            cost = (left['residuals'] ** 2).sum() + (right['residuals'] ** 2).sum()
+            if best is None or cost < best[0]:
+                best = (cost, split, left, right)
+        if best is not None:
+            _, split, left, right = best
+            pieces[i] = (first, split, left)
+            pieces[i + 1] = (split, last, right)
+    return pieces
+
+
+def project(fit: Dict[str, Any], point: np.ndarray) -> np.ndarray:
+    """Closest point to point on a fitted line or circle"""
+    if fit['type'] == 'straight':
+        return fit['point'] + fit['direction'] * np.dot(point - fit['point'], fit['direction'])
+    offset = point - fit['center']
+    return fit['center'] + offset * fit['radius'] / max(np.hypot(*offset), 1e-12)
+
+
+def pygame_angle(center: np.ndarray, point: np.ndarray) -> float:
+    """Angle of point around center as pygame.draw.arc measures it (y up)"""
+    return math.atan2(-(point[1] - center[1]), point[0] - center[0])
+
+
+def point_tuple(point: np.ndarray) -> Tuple[float, float]:
+    return (float(point[0]), float(point[1]))
+
+
+def wrap_angle(angle: float) -> float:
+    """angle in [-pi, pi)"""
+    return (angle + math.pi) % (2 * math.pi) - math.pi
+
+
+def build_elements(points: np.ndarray,
+                   pieces: List[Tuple[int, int, Dict[str, Any]]]) -> Tuple[List[Dict[str, Any]], List[List[float]]]:
+    """
+    Track elements from fitted pieces, plus the pose (x, y, heading in
+    degrees) at the start of every element and at the end of the last one.
+    Neighbours meet at the mean of their projections of the shared point.
+    """
+    joins = [project(pieces[0][2], points[pieces[0][0]])]
+    for (_, last, fit), (_, _, next_fit) in zip(pieces[:-1], pieces[1:]):
+        joins.append((project(fit, points[last]) + project(next_fit, points[last])) / 2)
+    joins.append(project(pieces[-1][2], points[pieces[-1][1]]))
+
+    elements, poses = [], []
+    for (first, last, fit), start, end in zip(pieces, joins[:-1], joins[1:]):
+        if fit['type'] == 'straight':
+            elements.append({'type': 'straight', 'start': point_tuple(start), 'end': point_tuple(end)})
+            heading = math.degrees(math.atan2(end[1] - start[1], end[0] - start[0]))
+            poses.append([float(start[0]), float(start[1]), heading % 360])
+            end_heading = heading
+            continue
+
+        center, radius = fit['center'], fit['radius']
+        # Sweep in travel order, from the angles of every point of the piece
+        angles = np.unwrap(np.arctan2(-(points[first:last + 1, 1] - center[1]),
+                                      points[first:last + 1, 0] - center[0]))
+        counterclockwise = angles[-1] > angles[0]
+        # Join angles unwrapped next to the first and last point angles
+        start_angle = angles[0] + wrap_angle(pygame_angle(center, start) - angles[0])
+        end_angle = angles[-1] + wrap_angle(pygame_angle(center, end) - angles[-1])
+        sweep = min(abs(end_angle - start_angle), 2 * math.pi)
+        # pygame.draw.arc always sweeps counterclockwise, from the travel start or end
+        first_angle = start_angle if counterclockwise else start_angle - sweep
+        first_angle %= 2 * math.pi
+
+        def tangent(angle: float) -> np.ndarray:
+            along = np.array([-math.sin(angle), -math.cos(angle)])  # d(point)/d(angle)
+            return along if counterclockwise else -along
+
+        start_tangent = tangent(start_angle)
+        # 'direction' picks the lane side, not the turn: positive offsets stay
+        # on the (-ty, tx) side like on straights, and element_polyline puts
+        # them outside 'right' arcs. So a left turn on screen (counterclockwise)
+        # is a 'right' arc, the opposite of what curve_element calls it
+        normal = np.array([-start_tangent[1], start_tangent[0]])
+        direction = 'right' if np.dot(normal, start - center) > 0 else 'left'
+        elements.append({
+            'type': 'curve',
+            'start': point_tuple(start),
+            'center': point_tuple(center),
+            'radius': float(radius),
+            'start_angle': float(first_angle),
+            'end_angle': float(first_angle + sweep),
+            'direction': direction,
+        })
+        poses.append([float(start[0]), float(start[1]),
+                      math.degrees(math.atan2(start_tangent[1], start_tangent[0])) % 360])
+        end_tangent = tangent(start_angle + (sweep if counterclockwise else -sweep))
+        end_heading = math.degrees(math.atan2(end_tangent[1], end_tangent[0]))
+
+    poses.append([float(joins[-1][0]), float(joins[-1][1]), end_heading % 360])
+    return elements, poses
+
+
+def fit_error(points: np.ndarray, elements: List[Dict[str, Any]], block: int = 4096) -> np.ndarray:
+    """Distance from every point to the nearest element"""
+    arrays = element_arrays([elements])
+    distances = np.empty(len(points))
+    for first in range(0, len(points), block):
+        chunk = points[first:first + block].astype(np.float32)
+        straight = straight_distances(chunk, arrays['straight_start'], arrays['straight_direction'],
+                                      arrays['straight_length'])[0]
+        arc = arc_distances(chunk, arrays['arc_center'], arrays['arc_radius'], arrays['arc_start_angle'],
+                            arrays['arc_span'], arrays['arc_side'])[0]
+        distances[first:first + block] = np.concatenate([straight, arc]).min(axis=0)
+    return distances
+
+
+def fit_track(points: np.ndarray, settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Fit straights and arcs to an (N, 2) pixel polyline. Returns the track
+    elements, the poses around them (see build_elements), a generator-style
+    summary of every primitive and the fit error in pixels. A summary's
+    'direction' is the turn on screen; its element's is the lane side.
+    """
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    if len(points) < 2:
+        raise ValueError(f"Need at least 2 distinct points, got {len(points)}")
+    samples = resample_polyline(points, settings['spacing'])
+    if np.hypot(*(samples[-1] - points[-1])) > 1e-6:
+        samples = np.vstack([samples, points[-1]])  # Keep the true end
+    if len(samples) < 3:
+        samples = np.stack([points[0], (points[0] + points[-1]) / 2, points[-1]])
+
+    pieces = segment_polyline(samples, settings)
+    elements, poses = build_elements(samples, pieces)
+    errors = fit_error(samples, elements)
+    primitives = []
+    for element, (first, last, fit) in zip(elements, pieces):
+        if element['type'] == 'straight':
+            summary = {'type': 'straight',
+                       'length': float(math.hypot(element['end'][0] - element['start'][0],
+                                                  element['end'][1] - element['start'][1]))}
+        else:
+            # Generator segments name the turn, as curve_element builds it
+            turn = 'left' if element['direction'] == 'right' else 'right'
+            summary = {'type': 'curve', 'direction': turn, 'radius': element['radius'],
+                       'angle': math.degrees(element['end_angle'] - element['start_angle'])}
+        summary['max_error'] = float(errors[first:last + 1].max())
+        primitives.append(summary)
+
+    return {
+        'elements': elements,
+        'poses': poses,
+        'primitives': primitives,
+        'fit': {
+            'points': len(points),
+            'samples': len(samples),
+            'elements': len(elements),
+            'straights': sum(element['type'] == 'straight' for element in elements),
+            'curves': sum(element['type'] == 'curve' for element in elements),
+            'rms_error': float(np.sqrt(np.mean(errors ** 2))),
+            'p95_error': float(np.percentile(errors, 95)),
+            'max_error': float(errors.max()),
+        },
+    }
+
+
+def import_file(path: str, output_dir: Optional[str], settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Fit one file and write <output_dir>/<name>.json; runs in a worker process"""
+    result = {'source': path, **fit_track(read_track_points(path, settings), settings)}
+    if output_dir is not None:
+        name = os.path.splitext(os.path.basename(path))[0]
+        out_path = os.path.join(output_dir, name + ".json")
+
+        def write(tmp_path: str) -> None:
+            with open(tmp_path, 'w') as f:
+                json.dump(result, f)
+        replace_atomically(out_path, write)
+    return {'source': path, **result['fit']}
+
+
+def find_track_files(sources: Sequence[str]) -> List[str]:
+    """GPX and NPY files among sources, searching directories recursively"""
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            for extension in EXTENSIONS:
+                paths.extend(glob.glob(os.path.join(source, "**", "*" + extension), recursive=True))
+        elif source.lower().endswith(EXTENSIONS):
+            paths.append(source)
+    return sorted(set(paths))
+
+
+def import_tracks(sources: Sequence[str], output_dir: str, jobs: Optional[int] = None,
+                  settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Fit every track file under sources in a process pool; writes one JSON per file and report.json"""
+    settings = {**copy.deepcopy(DEFAULT_SETTINGS), **(settings or {})}
+    os.makedirs(output_dir, exist_ok=True)
+    paths = find_track_files(sources)
+    report = {'settings': settings, 'files': [], 'failed': []}
+
+    def record_failure(path: str, e: Exception) -> None:
+        print(f"Import of {path} failed: {e}")
+        report['failed'].append({'source': path, 'error': str(e)})
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(paths) <= 1:
+        for path in paths:
+            try:
+                report['files'].append(import_file(path, output_dir, settings))
+            except Exception as e:
+                record_failure(path, e)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(import_file, path, output_dir, settings): path for path in paths}
+            for future in as_completed(futures):
+                try:
+                    report['files'].append(future.result())
+                except Exception as e:
+                    record_failure(futures[future], e)
+
+    report['files'].sort(key=lambda entry: entry['source'])
+    if report['files']:
+        report['rms_error'] = float(np.sqrt(np.mean([entry['rms_error'] ** 2 for entry in report['files']])))
+        report['max_error'] = max(entry['max_error'] for entry in report['files'])
+
+    def write(tmp_path: str) -> None:
+        with open(tmp_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    replace_atomically(os.path.join(output_dir, "report.json"), write)
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"{'file':<40} {'points':>7} {'straight':>8} {'curve':>6} {'rms px':>7} {'max px':>7}")
+    for entry in report['files']:
+        name = os.path.basename(entry['source'])
+        print(f"{name[-40:]:<40} {entry['points']:>7} {entry['straights']:>8} {entry['curves']:>6} "
+              f"{entry['rms_error']:>7.2f} {entry['max_error']:>7.2f}")
+    print(f"Imported {len(report['files'])} files, {len(report['failed'])} failed")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Fit straights and arcs to GPX/NPY tracks and write them as editor track elements")
+    parser.add_argument("sources", nargs="+", help="Track files or directories (searched recursively)")
+    parser.add_argument("--output-dir", default="imported", help="Where the fitted tracks and report.json go")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--tolerance", type=float, help="Pixels an element may miss its points by")
+    parser.add_argument("--spacing", type=float, help="Pixels between resampled points")
+    parser.add_argument("--min-length", type=float, help="Pixels, shortest element")
+    parser.add_argument("--max-radius", type=float, help="Pixels; flatter arcs become straights")
+    parser.add_argument("--canvas-size", help="Canvas the GPX files were saved from, as WIDTHxHEIGHT")
+    parser.add_argument("--origin-lat", type=float, help="Latitude of the canvas center")
+    parser.add_argument("--origin-lon", type=float, help="Longitude of the canvas center")
+    parser.add_argument("--heading", type=float, help="Compass bearing of canvas 'up' in degrees")
+    args = parser.parse_args(argv)
+
+    settings = {}
+    if args.canvas_size:
+        settings['canvas_size'] = [int(v) for v in args.canvas_size.lower().split("x")]
+    for key in ('tolerance', 'spacing', 'min_length', 'max_radius', 'origin_lat', 'origin_lon', 'heading'):
+        if getattr(args, key) is not None:
+            settings[key] = getattr(args, key)
+    print_report(import_tracks(args.sources, args.output_dir, args.jobs, settings))
+
+
+if __name__ == "__main__":
+    main()
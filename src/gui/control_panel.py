@@ -1,7 +1,5 @@
 from typing import Dict, Any, Optional
 import pygame
-from tkinter import Tk, filedialog
-import tkinter as tk
 
 class ControlPanel:
     def __init__(self, screen: pygame.Surface, x: int, width: int, height: int, track_canvas: 'TrackCanvas', main_window=None) -> None:
@@ -32,11 +30,12 @@ class ControlPanel:
         
         self.buttons = self.create_buttons()
         self.hovered_button = None
+        self.dirty = True  # Redraw bookkeeping for the event-driven main loop
         
         # Remove Tkinter initialization from __init__
         self.tk_root = None
         
-        # Load default background
+        # Load default background (decoded on a worker thread, see load_default_background)
         self.load_default_background()
 
     def create_buttons(self) -> Dict[str, Dict[str, Any]]:
@@ -108,6 +107,24 @@ class ControlPanel:
         }
         current_y += button_height + 5
 
+        # Overlay a driven lap (CSV, NPY or GPX log)
+        buttons['load_telemetry'] = {
+            'rect': pygame.Rect(padding, current_y, self.width - 2*padding, button_height),
+            'text': 'Load Telemetry',
+            'color': self.button_colors['normal'],
+            'section': 'basic'
+        }
+        current_y += button_height + 5
+
+        # Fit straights and arcs to a surveyed track (GPX, or NPY pixel points)
+        buttons['import_track'] = {
+            'rect': pygame.Rect(padding, current_y, self.width - 2*padding, button_height),
+            'text': 'Import Track',
+            'color': self.button_colors['normal'],
+            'section': 'basic'
+        }
+        current_y += button_height + 5
+
         # Add precise angle input button
         buttons['set_precise_angle'] = {
             'rect': pygame.Rect(padding, current_y, self.width - 2*padding, button_height),
@@ -182,6 +199,7 @@ class ControlPanel:
         relative_pos = (mouse_pos[0] - self.x, mouse_pos[1])
         
         # Handle hover effects
+        previous_hover = self.hovered_button
         self.hovered_button = None
         for button_name, button_data in self.buttons.items():
             if button_data['rect'].collidepoint(relative_pos):
@@ -189,8 +207,11 @@ class ControlPanel:
                 button_data['color'] = self.button_colors['hover']
             else:
                 button_data['color'] = self.button_colors['normal']
+        if self.hovered_button != previous_hover:
+            self.dirty = True
 
         if event.type == pygame.MOUSEBUTTONDOWN:
+            self.dirty = True
             for button_name, button_data in self.buttons.items():
                 if button_data['rect'].collidepoint(relative_pos):
                     self.handle_button_click(button_name)
@@ -215,45 +236,27 @@ class ControlPanel:
         elif button_name == 'clear_track':
             self.track_canvas.clear_track()
         elif button_name == 'load_image':
-            # Store current window state
-            pygame.display.iconify()  # Minimize Pygame window
-            
-            # Create a new Tkinter instance for file dialog
-            root = tk.Tk()
-            root.withdraw()
-            
-            print("\nFile Dialog opened:")
-            print("- Use Tab to move between elements")
-            print("- Use Enter to select/open")
-            print("- Use Backspace to go up one directory")
-            print("- Use letters to jump to files")
-            print("- Use Escape to cancel\n")
-            
-            try:
-                # Create a simpler file dialog that works better with keyboard
-                dialog = tk.filedialog.Open(
-                    parent=root,
-                    title="Select Background Image - Use Tab and Enter",
-                    filetypes=(
-                        ("PNG files", "*.png"),
-                        ("JPEG files", "*.jpg"),
-                        ("All files", "*.*")
-                    ),
-                    initialdir="track_backgrounds"
-                )
-                
-                file_path = dialog.show()
-                
-                if file_path:
-                    self.track_canvas.load_background(file_path)
-                    print(f"Loaded background: {file_path}")
-                
-            except Exception as e:
-                print(f"Error loading image: {e}")
-            finally:
-                root.destroy()
-                pygame.display.set_mode((self.screen.get_width(), self.screen.get_height()))
-                pygame.event.pump()  # Process events to restore window
+            file_path = self.choose_file(
+                "Select Background Image - Use Tab and Enter",
+                (("PNG files", "*.png"), ("JPEG files", "*.jpg"), ("All files", "*.*")),
+                "track_backgrounds")
+            if file_path:
+                self.track_canvas.load_background(file_path)
+                print(f"Loaded background: {file_path}")
+        elif button_name == 'load_telemetry':
+            file_path = self.choose_file(
+                "Select Telemetry Log - Use Tab and Enter",
+                (("Telemetry logs", "*.csv *.npy *.gpx"), ("All files", "*.*")), ".")
+            if file_path:
+                # Logs can have millions of points; they are decimated on a worker thread
+                self.track_canvas.load_telemetry_async(file_path)
+        elif button_name == 'import_track':
+            file_path = self.choose_file(
+                "Select Track to Import - Use Tab and Enter",
+                (("Tracks", "*.gpx *.npy"), ("All files", "*.*")),
+                self.main_window.tracks_dir if self.main_window is not None else ".")
+            if file_path:
+                self.track_canvas.import_track(file_path)
         elif button_name == 'set_precise_angle':
             self.track_canvas.set_angle_input(True)
         elif button_name.startswith('right_'):
@@ -265,6 +268,39 @@ class ControlPanel:
         elif button_name == 'save_training':
             self.main_window.save_training_example()
 
+    def choose_file(self, title: str, filetypes: tuple, initialdir: str) -> Optional[str]:
+        """Keyboard-friendly file dialog over the minimized editor; None if cancelled"""
+        # tkinter is only needed for this dialog, so it is imported here
+        import tkinter as tk
+        from tkinter import filedialog
+
+        # Store current window state
+        pygame.display.iconify()  # Minimize Pygame window
+        
+        # Create a new Tkinter instance for file dialog
+        root = tk.Tk()
+        root.withdraw()
+        
+        print("\nFile Dialog opened:")
+        print("- Use Tab to move between elements")
+        print("- Use Enter to select/open")
+        print("- Use Backspace to go up one directory")
+        print("- Use letters to jump to files")
+        print("- Use Escape to cancel\n")
+        
+        try:
+            # Create a simpler file dialog that works better with keyboard
+            dialog = filedialog.Open(parent=root, title=title, filetypes=filetypes,
+                                     initialdir=initialdir)
+            return dialog.show() or None
+        except Exception as e:
+            print(f"Error opening file dialog: {e}")
+            return None
+        finally:
+            root.destroy()
+            pygame.display.set_mode((self.screen.get_width(), self.screen.get_height()))
+            pygame.event.pump()  # Process events to restore window
+
     def update(self) -> None:
         pass
 
@@ -320,6 +356,13 @@ class ControlPanel:
             text_rect = text.get_rect(center=button_data['rect'].center)
             self.surface.blit(text, text_rect)
 
+        # Draw export status above the bottom buttons
+        if self.main_window is not None:
+            status = self.main_window.exporter.status_text()
+            if status:
+                status_text = self.font.render(status, True, (0, 0, 0))
+                self.surface.blit(status_text, (10, self.buttons['save_training']['rect'].y - 22))
+
         # Draw panel border
         pygame.draw.rect(self.surface, (200, 200, 200), (0, 0, self.width, self.height), 2)
         
@@ -331,10 +374,9 @@ class ControlPanel:
         
         # Draw surface to screen
         self.screen.blit(self.surface, (self.x, 0))
+        self.dirty = False
 
     def load_default_background(self) -> None:
         default_image = "track_backgrounds/goms_airfield.png"
-        try:
-            self.track_canvas.load_background(default_image)
-        except Exception as e:
-            print(f"Error loading default background: {e}")
+        # The canvas shows a placeholder until the image is decoded and scaled
+        self.track_canvas.load_background_async(default_image)
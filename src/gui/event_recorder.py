@@ -0,0 +1,90 @@
+from typing import Any, Dict, List, Tuple
+import json
+import time
+import pygame
+from src.export.edit_journal import canvas_state
+
+# Session recordings: the event batches MainWindow.run hands to handle_events,
+# one JSON line per loop iteration, after a header line describing the state
+# the session started from.
+#
+#   {"version": 1, "window": [1600, 1000], "canvas": {...}, "background": ...}
+#   {"t": 0.016, "mouse": [812, 440], "events": [{"type": 1025, "name": "MouseButtonDown", ...}]}
+#
+# The mouse position is recorded per batch because the canvas and control
+# panel read pygame.mouse.get_pos() while handling events.
+
+RECORDING_VERSION = 1
+
+
+def event_to_json(event: pygame.event.Event) -> Dict[str, Any]:
+    """Type plus every JSON-representable attribute; tuples become lists"""
+    data = {}
+    for key, value in event.dict.items():
+        if isinstance(value, tuple):
+            value = list(value)
+        if isinstance(value, (bool, int, float, str, list)) or value is None:
+            data[key] = value
+    return {'type': event.type, 'name': pygame.event.event_name(event.type), 'dict': data}
+
+
+def event_from_json(record: Dict[str, Any]) -> pygame.event.Event:
+    data = {key: tuple(value) if isinstance(value, list) else value
+            for key, value in record['dict'].items()}
+    return pygame.event.Event(record['type'], data)
+
+
+class EventRecorder:
+    """Appends every event batch of a MainWindow session to a recording file"""
+
+    def __init__(self, path: str, window) -> None:
+        self.path = path
+        self.file = open(path, 'w')
+        self.start = time.perf_counter()
+        self.batches = 0
+        canvas = window.track_canvas
+        header = {
+            'version': RECORDING_VERSION,
+            'window': [window.width, window.height],
+            'canvas': canvas_state(canvas),
+            'zoom_level': canvas.zoom_level,
+            'offset': list(canvas.offset),
+            'background': getattr(canvas, 'background_image_path', None) or canvas.background_loading,
+        }
+        self.file.write(json.dumps(header) + "\n")
+
+    def record(self, events: List[pygame.event.Event]) -> None:
+        if not events:
+            return  # Idle wake-ups carry nothing to replay
+        batch = {
+            't': round(time.perf_counter() - self.start, 6),
+            'mouse': list(pygame.mouse.get_pos()),
+            'events': [event_to_json(event) for event in events],
+        }
+        self.file.write(json.dumps(batch) + "\n")
+        self.batches += 1
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            print(f"Recorded {self.batches} event batches to {self.path}")
+
+
+def load_recording(path: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """(header, batches) of a recording, with events turned back into pygame events"""
+    with open(path) as f:
+        lines = [line for line in f if line.strip()]
+    header = json.loads(lines[0])
+    if header.get('version') != RECORDING_VERSION:
+        raise ValueError(f"Unsupported recording version {header.get('version')} in {path}")
+    batches = []
+    for line in lines[1:]:
+        try:
+            batch = json.loads(line)
+        except ValueError:
+            break  # Torn last line of a session that crashed
+        batch['events'] = [event_from_json(record) for record in batch['events']]
+        batches.append(batch)
+    return header, batches
+
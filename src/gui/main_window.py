@@ -2,18 +2,22 @@ import pygame
 import numpy as np
 import os
 from datetime import datetime
-import gpxpy
-import gpxpy.gpx
 from src.gui.track_canvas import TrackCanvas
 from src.gui.control_panel import ControlPanel
-import math
-from typing import Optional
-from src.gui.description_dialog import DescriptionDialog
-from src.data_generation.track_generator import TrackDataGenerator
-import tkinter as tk
+from src.gui.profiler import FrameProfiler, ProfilerOverlay
+from src.gui.event_recorder import EventRecorder
+from src.export.async_exporter import AsyncExporter, replace_atomically
+from src.export.geo_writer import GeoAnchor, write_gpx
+from src.export.edit_journal import EditJournal
+from src.export.encoders import make_encoder
+from src.export.tiled_export import TiledImageExport
+import time
+from typing import List, Optional
+from src.data_generation.point_store import PointStore
 
 class MainWindow:
-    def __init__(self) -> None:
+    def __init__(self, profile_path: Optional[str] = None, project_dir: Optional[str] = None,
+                 record_path: Optional[str] = None) -> None:
         pygame.init()
         self.width = 1600  # Increased from 1200
         self.height = 1000  # Increased from 800
@@ -41,6 +45,26 @@ class MainWindow:
         )
         
         self.running = True
+
+        # Where exported tracks sit on the globe: canvas center at the origin,
+        # scaled by the canvas pixels_per_meter, canvas "up" pointing north
+        self.geo_anchor = GeoAnchor.from_canvas(self.track_canvas)
+
+        # Main loop pacing: cap the frame rate while interacting and block on
+        # the event queue (waking up every idle_timeout_ms) while idle
+        self.max_fps = 60
+        self.idle_timeout_ms = 500
+        self.stats_interval = 1.0  # Seconds between FPS/CPU measurements
+        self.measured_fps = 0.0  # Frames actually drawn per second
+        self.cpu_time = 0.0  # Process CPU seconds spent since run() started
+        self.cpu_load = 0.0  # Fraction of one core used over the last interval
+        self.frame_count = 0
+
+        # Frame-time profiling; F3 toggles the overlay, profile_path dumps every frame
+        self.profiler = FrameProfiler()
+        self.track_canvas.profiler = self.profiler
+        self.profiler_overlay = ProfilerOverlay(self.profiler)
+        self.profile_path = profile_path
         
         # Create output directories if they don't exist
         self.output_dir = "output"
@@ -48,57 +72,215 @@ class MainWindow:
         self.tracks_dir = os.path.join(self.output_dir, "tracks")
         os.makedirs(self.images_dir, exist_ok=True)
         os.makedirs(self.tracks_dir, exist_ok=True)
-        
-        self.track_generator = TrackDataGenerator()
+
+        # Project journal: every edit is appended to project_dir and the last
+        # session (even one that crashed) is restored on start; Ctrl+S compacts it
+        self.project_dir = project_dir or os.path.join(self.output_dir, "project")
+        self.journal = EditJournal(self.project_dir)
+        replayed = self.journal.open(self.track_canvas)
+        if self.track_canvas.track_elements:
+            print(f"Restored {len(self.track_canvas.track_elements)} segments from {self.project_dir} "
+                  f"({replayed} journaled edits)")
+
+        # Exports run on background threads; autosave snapshots the track
+        # every autosave_interval seconds if it changed since the last one
+        self.exporter = AsyncExporter(max_workers=2, max_pending=4)
+        self.export_revision = self.exporter.revision
+        self.image_encoder = make_encoder("png")  # Image format of exports and training examples
+        self.autosave_dir = os.path.join(self.output_dir, "autosave")
+        self.autosave_interval = 300.0
+        self.last_autosave_time = time.monotonic()
+        self.last_autosave_revision = self.track_canvas.revision
+        self.large_export_width = 16000  # Pixels across of Ctrl+E exports, e.g. for printed layout sheets
+
+        # Optional recording of every event batch, for replaying the session
+        # headlessly (benchmarks/replay.py)
+        self.recorder = EventRecorder(record_path, self) if record_path else None
+
+        # Created on first use: the generator sets up its own pygame canvas
+        self._track_generator = None
+
+    @property
+    def track_generator(self):
+        if self._track_generator is None:
+            from src.data_generation.track_generator import TrackDataGenerator
+            self._track_generator = TrackDataGenerator()
+        return self._track_generator
 
     def run(self) -> None:
         clock = pygame.time.Clock()
+        cpu_start = time.process_time()
+        stats_wall = time.perf_counter()
+        stats_cpu = cpu_start
+        stats_frames = 0
+        if self.profile_path:
+            self.profiler.start_dump(self.profile_path)
         while self.running:
-            self.handle_events()
-            self.update()
-            self.draw()
-            clock.tick(60)  # Limit to 60 FPS
+            if self.is_interacting():
+                events = pygame.event.get()
+            else:
+                # Nothing animating: sleep until an event arrives or the timeout hits
+                event = pygame.event.wait(self.idle_timeout_ms)
+                events = [] if event.type == pygame.NOEVENT else [event] + pygame.event.get()
+            if self.recorder is not None:
+                self.recorder.record(events)
+            self.profiler.begin_frame()
+            with self.profiler.phase('events'):
+                self.handle_events(events)
+            if not self.running:
+                break
+            with self.profiler.phase('update'):
+                self.update()
+            if self.needs_redraw():
+                self.draw()
+                self.profiler.end_frame()
+                self.frame_count += 1
+                stats_frames += 1
+                clock.tick(self.max_fps)  # Limit to max_fps while redrawing
+            else:
+                self.profiler.cancel_frame()
+
+            # Refresh the FPS / CPU counters once per stats interval
+            now = time.perf_counter()
+            cpu_now = time.process_time()
+            self.cpu_time = cpu_now - cpu_start
+            if now - stats_wall >= self.stats_interval:
+                self.measured_fps = stats_frames / (now - stats_wall)
+                self.cpu_load = (cpu_now - stats_cpu) / (now - stats_wall)
+                stats_wall, stats_cpu, stats_frames = now, cpu_now, 0
+        self.profiler.stop_dump()
+
+    def is_interacting(self) -> bool:
+        """True while some layer needs frames without waiting for input"""
+        return self.track_canvas.is_interacting()
+
+    def needs_redraw(self) -> bool:
+        return (self.track_canvas.dirty or
+                self.control_panel.dirty or
+                self.profiler_overlay.visible or
+                self.is_interacting())
             
-    def handle_events(self) -> None:
-        for event in pygame.event.get():
+    def handle_events(self, events: Optional[List[pygame.event.Event]] = None) -> None:
+        if events is None:
+            events = pygame.event.get()
+        for event in events:
             if event.type == pygame.QUIT:
-                self.save_track_data()  # Save before closing
+                self.save_track_data(block=True)  # Save before closing
+                self.exporter.shutdown()  # Wait for every queued export
+                self.journal.close()
+                self.close_recorder()
                 self.running = False
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     print("Exiting program...")
+                    self.exporter.shutdown()
+                    self.journal.close()
+                    self.close_recorder()
                     pygame.quit()
                     import sys
                     sys.exit()
+                elif event.key == pygame.K_F3:
+                    self.profiler_overlay.toggle()
+                elif event.key == pygame.K_s and event.mod & pygame.KMOD_CTRL:
+                    self.journal.snapshot()
+                elif event.key == pygame.K_e and event.mod & pygame.KMOD_CTRL:
+                    self.export_large_image()
             self.track_canvas.handle_event(event)
             self.control_panel.handle_event(event)
 
+    def close_recorder(self) -> None:
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
     def update(self) -> None:
         self.track_canvas.update()
         self.control_panel.update()
+        self.autosave()
+        if self.exporter.revision != self.export_revision:
+            # Export status changed on a worker thread, show it
+            self.export_revision = self.exporter.revision
+            self.control_panel.dirty = True
+
+    def autosave(self) -> None:
+        if self.track_canvas.revision == self.last_autosave_revision:
+            return
+        if time.monotonic() - self.last_autosave_time < self.autosave_interval:
+            return
+        # Never block the frame loop: if the exporter is still busy, try again later
+        if self.save_track_data(name="autosave", images_dir=self.autosave_dir,
+                                tracks_dir=self.autosave_dir):
+            self.last_autosave_time = time.monotonic()
+            self.last_autosave_revision = self.track_canvas.revision
 
     def draw(self) -> None:
         self.screen.fill(self.background_color)  # Light gray background
-        self.track_canvas.draw()
-        self.control_panel.draw()
-        pygame.display.flip()
+        with self.profiler.phase('canvas'):
+            self.track_canvas.draw()
+        with self.profiler.phase('control_panel'):
+            self.control_panel.draw()
+        self.profiler_overlay.draw(self.screen)
+        with self.profiler.phase('flip'):
+            pygame.display.flip()
 
-    def save_track_data(self) -> None:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        # Save as PNG image
-        image_path = os.path.join(self.images_dir, f"track_{timestamp}.png")
-        pygame.image.save(self.screen, image_path)
+    def save_track_data(self, block: bool = False, name: Optional[str] = None,
+                        images_dir: Optional[str] = None, tracks_dir: Optional[str] = None) -> bool:
+        """
+        Snapshot the window and the track on this thread, then hand the image,
+        NumPy and GPX export to the background exporter. Returns False if the
+        export queue was full and block is False.
+        """
+        if name is None:
+            name = f"track_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        image = self.screen.copy()
+        track_points = self.track_canvas.get_track_points()
+        return self.exporter.submit(
+            name, self.write_track_files, image, track_points, name,
+            images_dir or self.images_dir, tracks_dir or self.tracks_dir,
+            block=block
+        )
+
+    def export_large_image(self, width: Optional[int] = None, name: Optional[str] = None,
+                           images_dir: Optional[str] = None, block: bool = False) -> bool:
+        """
+        Queue a track-over-background image width pixels across (default
+        large_export_width), rendered in tiles and streamed to a PNG in
+        images_dir. Returns False if the export queue was full.
+        """
+        width = width or self.large_export_width
+        if name is None:
+            name = f"track_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{width}px"
+        images_dir = images_dir or self.images_dir
+        export = TiledImageExport(self.track_canvas, width)
+        image_path = os.path.join(images_dir, name + ".png")
+
+        def write() -> None:
+            os.makedirs(images_dir, exist_ok=True)
+            progress = lambda done, total: self.exporter.set_status(f"Exporting {name}: {100 * done // total}%")
+            replace_atomically(image_path, lambda path: export.write(path, progress))
+            print(f"Large image saved to: {image_path} ({export.width}x{export.height}, {export.tiles} tiles)")
+
+        return self.exporter.submit(name, write, block=block)
+
+    def write_track_files(self, image: pygame.Surface, track_points: Optional[np.ndarray],
+                          name: str, images_dir: str, tracks_dir: str) -> None:
+        """Write one export snapshot; runs on an exporter thread"""
+        os.makedirs(images_dir, exist_ok=True)
+        os.makedirs(tracks_dir, exist_ok=True)
+
+        # Save the image in the configured format
+        pixels = pygame.surfarray.array3d(image).transpose(1, 0, 2)
+        image_path = os.path.join(images_dir, name + self.image_encoder.extension)
+        replace_atomically(image_path, lambda path: self.image_encoder.write(path, pixels))
         
         # Save track coordinates as numpy array
-        track_points = self.track_canvas.get_track_points()
         if track_points is not None and len(track_points) > 0:
-            np_path = os.path.join(self.tracks_dir, f"track_{timestamp}.npy")
-            np.save(np_path, track_points)
+            np_path = os.path.join(tracks_dir, f"{name}.npy")
+            replace_atomically(np_path, lambda path: np.save(path, track_points))
             
             # Save as GPX
-            gpx_path = os.path.join(self.tracks_dir, f"track_{timestamp}.gpx")
-            self.save_as_gpx(track_points, gpx_path)
+            gpx_path = os.path.join(tracks_dir, f"{name}.gpx")
+            replace_atomically(gpx_path, lambda path: self.save_as_gpx(track_points, path, name))
             
             print(f"Track saved to:\n"
                   f"- Image: {image_path}\n"
@@ -107,78 +289,9 @@ class MainWindow:
         else:
             print(f"Track saved to:\n- Image: {image_path}")
 
-    def save_as_gpx(self, track_points: np.ndarray, gpx_path: str) -> None:
-        gpx = gpxpy.gpx.GPX()
-        gpx_track = gpxpy.gpx.GPXTrack()
-        gpx.tracks.append(gpx_track)
-        gpx_segment = gpxpy.gpx.GPXTrackSegment()
-        gpx_track.segments.append(gpx_segment)
-        
-        # Convert track points to GPS coordinates (simplified example)
-        # This assumes the track is centered around (0,0) latitude/longitude
-        scale = 0.0001  # Scale factor to convert pixels to GPS coordinates
-        for point in track_points:
-            lat = point[1] * scale
-            lon = point[0] * scale
-            gpx_segment.points.append(gpxpy.gpx.GPXTrackPoint(lat, lon))
-            
-        with open(gpx_path, 'w') as f:
-            f.write(gpx.to_xml())
-
-    def add_curve_segment(self, direction='right', radius=50):
-        start_pos = self.current_pos
-        start_angle = self.current_direction
-        
-        # Convert angles to radians for calculations
-        start_rad = math.radians(start_angle)
-        
-        if direction == 'right':
-            # For right turns, center is radius units perpendicular to current direction
-            center = (
-                start_pos[0] - radius * math.sin(start_rad),
-                start_pos[1] + radius * math.cos(start_rad)
-            )
-            # For right turns, we go clockwise
-            start_angle_draw = start_angle
-            end_angle_draw = start_angle + 180
-            end_angle = start_angle + 180
-            
-            # Calculate end position for right turn
-            end_pos = (
-                center[0] + radius * math.sin(start_rad + math.pi),
-                center[1] - radius * math.cos(start_rad + math.pi)
-            )
-        else:  # left
-            # For left turns, center is radius units perpendicular in opposite direction
-            center = (
-                start_pos[0] + radius * math.sin(start_rad),
-                start_pos[1] - radius * math.cos(start_rad)
-            )
-            # For left turns, we go counter-clockwise
-            start_angle_draw = start_angle + 180
-            end_angle_draw = start_angle
-            end_angle = start_angle + 180
-            
-            # Calculate end position for left turn
-            end_pos = (
-                center[0] - radius * math.sin(start_rad + math.pi),
-                center[1] + radius * math.cos(start_rad + math.pi)
-            )
-        
-        new_element = {
-            'type': 'curve',
-            'start': start_pos,
-            'center': center,
-            'radius': radius,
-            'start_angle': start_angle_draw,
-            'end_angle': end_angle_draw,
-            'direction': direction
-        }
-        
-        self.track_elements.append(new_element)
-        self.undo_stack.append(('add', new_element))
-        self.current_pos = end_pos
-        self.current_direction = end_angle
+    def save_as_gpx(self, track_points: np.ndarray, gpx_path: str, name: Optional[str] = None) -> None:
+        # Stream the points straight from the array, geo-referenced via geo_anchor
+        write_gpx(gpx_path, track_points, self.geo_anchor, name=name)
 
     def save_training_example(self):
         """Save current track as a training example"""
@@ -233,14 +346,17 @@ class MainWindow:
                                   rect, element['start_angle'], element['end_angle'],
                                   self.track_canvas.track_width)
             
-            track_path = os.path.join(track_dir, f"track_{timestamp}.png")
-            pygame.image.save(track_surface, track_path)
+            # Encode on an exporter thread instead of stalling the frame
+            track_path = os.path.join(track_dir, f"track_{timestamp}{self.image_encoder.extension}")
+            pixels = pygame.surfarray.array3d(track_surface).transpose(1, 0, 2)
+            self.exporter.submit(f"training image {timestamp}", replace_atomically, track_path,
+                                 lambda path: self.image_encoder.write(path, pixels), block=True)
             
-            # Save track coordinates as numpy array
+            # Append track coordinates to the point store in coords_dir
             track_points = self.track_canvas.get_track_points()
             if track_points is not None:
-                coords_path = os.path.join(coords_dir, f"track_{timestamp}.npy")
-                np.save(coords_path, track_points)
+                with PointStore(coords_dir) as store:
+                    store.append(track_points, name=f"track_{timestamp}")
             
             # Save the description
             if self.track_canvas.description:
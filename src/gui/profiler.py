@@ -0,0 +1,155 @@
+from typing import Callable, Dict, List, Optional, Any
+from collections import deque
+from contextlib import contextmanager
+import json
+import time
+import numpy as np
+import pygame
+
+
+class FrameProfiler:
+    """
+    Per-frame timing of the editor loop.
+
+    A frame is opened with begin_frame(), individual phases are timed with the
+    phase() context manager, and end_frame() records the result in a rolling
+    window. Hooks registered with add_hook() receive every finished frame record,
+    and start_dump() streams them to a JSON-lines file.
+    """
+
+    def __init__(self, window_size: int = 600) -> None:
+        self.frames = deque(maxlen=window_size)  # Finished frame records
+        self.hooks: List[Callable[[Dict[str, Any]], None]] = []
+        self.frame_index = 0
+        self.current = None  # Record of the frame being measured
+        self.dump_file = None
+
+    def begin_frame(self) -> None:
+        self.current = {
+            'frame': self.frame_index,
+            'start': time.perf_counter(),
+            'phases': {}
+        }
+
+    def cancel_frame(self) -> None:
+        """Forget the open frame, e.g. when the loop woke up but drew nothing"""
+        self.current = None
+
+    def end_frame(self) -> Optional[Dict[str, Any]]:
+        if self.current is None:
+            return None
+        record = self.current
+        self.current = None
+        record['total'] = time.perf_counter() - record['start']
+        self.frames.append(record)
+        self.frame_index += 1
+
+        for hook in self.hooks:
+            hook(record)
+        if self.dump_file is not None:
+            self.dump_file.write(json.dumps(record) + "\n")
+        return record
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the enclosed block as phase name of the open frame"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.current is not None:
+                phases = self.current['phases']
+                phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+    def add_hook(self, hook: Callable[[Dict[str, Any]], None]) -> None:
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook: Callable[[Dict[str, Any]], None]) -> None:
+        if hook in self.hooks:
+            self.hooks.remove(hook)
+
+    def start_dump(self, path: str) -> None:
+        """Append every following frame record to path as one JSON object per line"""
+        self.stop_dump()
+        self.dump_file = open(path, 'a')
+
+    def stop_dump(self) -> None:
+        if self.dump_file is not None:
+            self.dump_file.close()
+            self.dump_file = None
+
+    def stats(self) -> Dict[str, Any]:
+        """FPS, frame-time percentiles and mean/p99 per phase (milliseconds) over the window"""
+        if not self.frames:
+            return {'frames': 0, 'fps': 0.0, 'frame_ms': {}, 'phases_ms': {}}
+
+        totals = np.array([frame['total'] for frame in self.frames]) * 1000
+        starts = [frame['start'] for frame in self.frames]
+        recent = [t for t in starts if t >= starts[-1] - 1.0]
+        elapsed = recent[-1] - recent[0]
+        fps = (len(recent) - 1) / elapsed if elapsed > 0 else 0.0
+
+        names = []
+        for frame in self.frames:
+            for name in frame['phases']:
+                if name not in names:
+                    names.append(name)
+        phases_ms = {}
+        for name in names:
+            values = np.array([frame['phases'].get(name, 0.0) for frame in self.frames]) * 1000
+            phases_ms[name] = {'mean': float(values.mean()), 'p99': float(np.percentile(values, 99))}
+
+        return {
+            'frames': len(self.frames),
+            'fps': fps,
+            'frame_ms': {
+                'p50': float(np.percentile(totals, 50)),
+                'p90': float(np.percentile(totals, 90)),
+                'p99': float(np.percentile(totals, 99)),
+                'max': float(totals.max()),
+            },
+            'phases_ms': phases_ms,
+        }
+
+
+class ProfilerOverlay:
+    """Semi-transparent text box showing FrameProfiler.stats() on top of the window"""
+
+    def __init__(self, profiler: FrameProfiler, position: tuple = (10, 50)) -> None:
+        self.profiler = profiler
+        self.position = position
+        self.visible = False
+        self.font = pygame.font.SysFont('Courier New', 13)
+        self.text_color = (255, 255, 255)
+        self.background_color = (0, 0, 0, 170)
+
+    def toggle(self) -> None:
+        self.visible = not self.visible
+
+    def lines(self) -> List[str]:
+        stats = self.profiler.stats()
+        if not stats['frames']:
+            return ["No frames measured yet"]
+        frame_ms = stats['frame_ms']
+        lines = [
+            f"FPS {stats['fps']:6.1f}   frames {stats['frames']}",
+            f"frame ms  p50 {frame_ms['p50']:6.2f}  p90 {frame_ms['p90']:6.2f}  "
+            f"p99 {frame_ms['p99']:6.2f}",
+        ]
+        for name, values in stats['phases_ms'].items():
+            lines.append(f"{name:<18} {values['mean']:6.2f}  p99 {values['p99']:6.2f}")
+        return lines
+
+    def draw(self, screen: pygame.Surface) -> None:
+        if not self.visible:
+            return
+        rendered = [self.font.render(line, True, self.text_color) for line in self.lines()]
+        line_height = self.font.get_linesize()
+        width = max(text.get_width() for text in rendered) + 12
+        height = line_height * len(rendered) + 12
+
+        box = pygame.Surface((width, height), pygame.SRCALPHA)
+        box.fill(self.background_color)
+        for i, text in enumerate(rendered):
+            box.blit(text, (6, 6 + i * line_height))
+        screen.blit(box, self.position)
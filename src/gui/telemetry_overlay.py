@@ -0,0 +1,279 @@
+from typing import List, Optional, Tuple
+import math
+import os
+import numpy as np
+import pygame
+from src.export.geo_writer import GeoAnchor, read_gpx_points
+
+# Driven laps (GPS or odometry logs, up to millions of points) drawn over the
+# designed track. The path is decimated once into a level pyramid: level L
+# keeps a point only where the path enters a new cell of finest_cell * 2**L
+# world pixels, so at any zoom the drawn polyline has about one vertex per
+# screen pixel of path however densely it was logged. Every level is cut
+# into blocks of consecutive points with precomputed bounding boxes, and only
+# the blocks in view are drawn. A long run repeats the same laps, so when
+# zoomed out the view can still hold hundreds of thousands of vertices; each
+# level therefore also keeps its set of occupied cells, and dense views are
+# drawn by setting one pixel per cell instead of as a polyline.
+
+LAT_NAMES = ('lat', 'latitude')
+LON_NAMES = ('lon', 'lng', 'long', 'longitude')
+
+
+def read_telemetry(path: str) -> Tuple[np.ndarray, bool]:
+    """
+    (points, geographic) from a log file. GPX files and CSV files with
+    lat/lon columns give (N, 2) latitude, longitude pairs; NPY files and
+    other CSV files give x (right) and y (up) in meters, taken from columns
+    named x and y or else the first two columns.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.gpx':
+        return read_gpx_points(path), True
+    if extension == '.npy':
+        array = np.load(path, mmap_mode='r')
+        names = [name.lower() for name in array.dtype.names or ()]
+        lat = next((names.index(name) for name in LAT_NAMES if name in names), None)
+        lon = next((names.index(name) for name in LON_NAMES if name in names), None)
+        if lat is not None and lon is not None:
+            return np.stack([array[array.dtype.names[lat]], array[array.dtype.names[lon]]], axis=1), True
+        if names:
+            x = names.index('x') if 'x' in names else 0
+            y = names.index('y') if 'y' in names else 1
+            return np.stack([array[array.dtype.names[x]], array[array.dtype.names[y]]], axis=1), False
+        return np.asarray(array[:, :2], dtype=np.float64), False
+
+    # Delimited text, with or without a header line
+    with open(path) as f:
+        first_line = f.readline()
+    delimiter = ',' if ',' in first_line else None
+    fields = [field.strip().strip('"').lower() for field in first_line.split(delimiter)]
+    has_header = any(char.isalpha() for char in first_line)
+    columns, geographic = (0, 1), False
+    if has_header:
+        lat = next((fields.index(name) for name in LAT_NAMES if name in fields), None)
+        lon = next((fields.index(name) for name in LON_NAMES if name in fields), None)
+        if lat is not None and lon is not None:
+            columns, geographic = (lat, lon), True
+        elif 'x' in fields and 'y' in fields:
+            columns = (fields.index('x'), fields.index('y'))
+    points = np.loadtxt(path, delimiter=delimiter, skiprows=1 if has_header else 0,
+                        usecols=columns, ndmin=2, dtype=np.float64)
+    return points, geographic
+
+
+def project_telemetry(points: np.ndarray, geographic: bool, pixels_per_meter: float,
+                      origin: Tuple[float, float]) -> np.ndarray:
+    """
+    Canvas world coordinates of log points, at the canvas scale with the
+    first point on origin. North (or +y) is up; rows with NaNs are dropped.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    points = points[np.isfinite(points).all(axis=1)]
+    if not len(points):
+        return np.empty((0, 2))
+    if geographic:
+        anchor = GeoAnchor(points[0, 0], points[0, 1], heading=0.0,
+                           meters_per_pixel=1.0 / pixels_per_meter, origin_pixel=origin)
+        return anchor.to_pixels(points[:, 0], points[:, 1])
+    relative = (points - points[0]) * pixels_per_meter
+    return np.stack([origin[0] + relative[:, 0], origin[1] - relative[:, 1]], axis=1)
+
+
+def decimate(points: np.ndarray, cell: float, passes: int = 8) -> np.ndarray:
+    """
+    Keep the first point of every run of points in the same cell, and the
+    last point. Noise across a cell border (cells A B A) is folded into the
+    first A, a few passes deep, so jitter doesn't keep every point.
+    """
+    if len(points) < 3:
+        return points
+    cells = np.floor(points / cell).astype(np.int64)
+    keys = (cells[:, 0] << 32) + (cells[:, 1] & 0xFFFFFFFF)
+    indices = np.arange(len(points))
+    for _ in range(passes):
+        first_of_run = np.empty(len(keys), dtype=bool)
+        first_of_run[0] = True
+        first_of_run[1:] = keys[1:] != keys[:-1]
+        indices, keys = indices[first_of_run], keys[first_of_run]
+        returns = keys[2:] == keys[:-2]
+        if len(keys) < 3 or not returns.any():
+            break
+        drop = np.zeros(len(keys), dtype=bool)
+        drop[1:-1] |= returns
+        drop[2:] |= returns
+        indices, keys = indices[~drop], keys[~drop]
+    if indices[-1] != len(points) - 1:
+        indices = np.append(indices, len(points) - 1)
+    return points[indices]
+
+
+def occupied_cells(points: np.ndarray, cell: float, max_gap: float = 1000) -> np.ndarray:
+    """
+    (M, 2) int32 distinct cells the path passes through, sorted by x.
+    Segments are sampled at cell spacing so the cells have no gaps, except
+    across jumps longer than max_gap cells (logging dropouts).
+    """
+    if not len(points):
+        return np.empty((0, 2), dtype=np.int32)
+    if len(points) > 1:
+        deltas = np.diff(points, axis=0)
+        steps = np.ceil(np.hypot(deltas[:, 0], deltas[:, 1]) / cell).astype(np.int64)
+        steps = np.where(steps > max_gap, 1, np.maximum(steps, 1))
+        starts = np.repeat(np.arange(len(deltas)), steps)
+        # Fraction along its segment of every sample
+        fractions = np.arange(len(starts)) - np.repeat(np.cumsum(steps) - steps, steps)
+        fractions = fractions / np.repeat(steps, steps)
+        samples = points[starts] + deltas[starts] * fractions[:, None].astype(points.dtype)
+        points = np.concatenate([samples, points[-1:]])
+    return distinct_cells(np.floor(points / cell).astype(np.int64))
+
+
+def distinct_cells(cells: np.ndarray, max_bitmap: int = 1 << 26) -> np.ndarray:
+    """Distinct rows of (N, 2) integer cells as int32, sorted by x then y"""
+    low = cells.min(axis=0)
+    width, height = cells.max(axis=0) - low + 1
+    if width * height <= max_bitmap:
+        # Marking a bitmap is much cheaper than sorting millions of samples
+        occupied = np.zeros(width * height, dtype=bool)
+        occupied[(cells[:, 0] - low[0]) * height + (cells[:, 1] - low[1])] = True
+        flat = np.flatnonzero(occupied)
+        return np.stack([flat // height + low[0], flat % height + low[1]], axis=1).astype(np.int32)
+    keys = np.unique((cells[:, 0] << 32) + (cells[:, 1] - low[1]))
+    return np.stack([keys >> 32, (keys & 0xFFFFFFFF) + low[1]], axis=1).astype(np.int32)
+
+
+class TelemetryOverlay:
+    """
+    Level-of-detail polyline of a telemetry log in canvas world coordinates.
+
+    draw() picks the coarsest level whose cells are at most tolerance screen
+    pixels at the current zoom and culls blocks of block_size points (each
+    block also covers the segment to the next block's first point) against
+    the view. Views with more than max_line_points vertices are drawn from
+    the occupied cells instead, one pixel (at most tolerance wide) per cell.
+    """
+
+    def __init__(self, points: np.ndarray, name: str = "", color: Tuple[int, int, int] = (220, 40, 40),
+                 width: int = 1, tolerance: float = 1.0, finest_cell: float = 0.2,
+                 block_size: int = 4096, max_line_points: int = 20000,
+                 min_level_points: int = 1024) -> None:
+        self.name = name
+        self.color = color
+        self.width = width
+        self.tolerance = tolerance
+        self.block_size = block_size
+        self.max_line_points = max_line_points
+        self.point_count = len(points)
+        self.visible = True
+        self.last_drawn_points = 0
+
+        # float32 holds world pixels to well under a pixel for runs of hundreds of kilometers;
+        # the finest level is enough for the closest zoom, raw points are not kept
+        cell = finest_cell
+        level = decimate(np.ascontiguousarray(points, dtype=np.float32), cell)
+        self.levels: List[np.ndarray] = []
+        self.cell_sizes: List[float] = []
+        self.block_bounds: List[np.ndarray] = []  # (blocks, 4) min x, min y, max x, max y
+        self.cells: List[np.ndarray] = []
+        while True:
+            self.levels.append(level)
+            self.cell_sizes.append(cell)
+            self.block_bounds.append(self.compute_block_bounds(level))
+            # Cells of 2c are cells of c halved, so only the finest level samples the path
+            self.cells.append(occupied_cells(level, cell) if not self.cells else
+                              distinct_cells(self.cells[-1].astype(np.int64) // 2))
+            if len(level) <= min_level_points:
+                break
+            cell *= 2
+            level = decimate(level, cell)
+
+    @classmethod
+    def from_file(cls, path: str, pixels_per_meter: float, origin: Tuple[float, float],
+                  **options) -> 'TelemetryOverlay':
+        points, geographic = read_telemetry(path)
+        world = project_telemetry(points, geographic, pixels_per_meter, origin)
+        return cls(world, name=os.path.basename(path), **options)
+
+    def compute_block_bounds(self, level: np.ndarray) -> np.ndarray:
+        if not len(level):
+            return np.empty((0, 4), dtype=np.float32)
+        starts = np.arange(0, len(level), self.block_size)
+        mins = np.minimum.reduceat(level, starts, axis=0)
+        maxs = np.maximum.reduceat(level, starts, axis=0)
+        # Include the first point of the next block, where each block's last segment ends
+        following = level[starts[1:]]
+        mins[:-1] = np.minimum(mins[:-1], following)
+        maxs[:-1] = np.maximum(maxs[:-1], following)
+        return np.concatenate([mins, maxs], axis=1)
+
+    def level_for_zoom(self, zoom: float) -> int:
+        """Coarsest level whose cells stay within tolerance on screen"""
+        level = 0
+        while level + 1 < len(self.levels) and self.cell_sizes[level + 1] * zoom <= self.tolerance:
+            level += 1
+        return level
+
+    def draw(self, surface: pygame.Surface, zoom: float, offset: Tuple[float, float]) -> int:
+        """Draw the part of the path in view; returns the number of points drawn"""
+        self.last_drawn_points = 0
+        if not self.visible or self.point_count < 2:
+            return 0
+        level_index = self.level_for_zoom(zoom)
+        level, bounds = self.levels[level_index], self.block_bounds[level_index]
+
+        # Viewport in world coordinates, padded by the line width
+        pad = self.width / zoom
+        x0, y0 = (-offset[0]) / zoom - pad, (-offset[1]) / zoom - pad
+        x1 = (surface.get_width() - offset[0]) / zoom + pad
+        y1 = (surface.get_height() - offset[1]) / zoom + pad
+        visible = ((bounds[:, 0] <= x1) & (bounds[:, 2] >= x0) &
+                   (bounds[:, 1] <= y1) & (bounds[:, 3] >= y0))
+        if not visible.any():
+            return 0
+
+        if visible.sum() * self.block_size > self.max_line_points:
+            return self.draw_cells(surface, zoom, offset, level_index, (x0, y0, x1, y1))
+
+        # One draw call per run of consecutive visible blocks
+        edges = np.diff(np.concatenate([[0], visible.astype(np.int8), [0]]))
+        run_starts = np.flatnonzero(edges == 1)
+        run_ends = np.flatnonzero(edges == -1)
+        scale = np.float32(zoom)
+        shift = np.asarray(offset, dtype=np.float32)
+        for first_block, end_block in zip(run_starts, run_ends):
+            first = first_block * self.block_size
+            end = min(end_block * self.block_size + 1, len(level))
+            screen = level[first:end] * scale + shift
+            if len(screen) >= 2:
+                pygame.draw.lines(surface, self.color, False, screen.tolist(), self.width)
+                self.last_drawn_points += len(screen)
+        return self.last_drawn_points
+
+    def draw_cells(self, surface: pygame.Surface, zoom: float, offset: Tuple[float, float],
+                   level_index: int, view: Tuple[float, float, float, float]) -> int:
+        """One pixel per occupied cell in view; cells are at most tolerance pixels wide"""
+        cells, cell = self.cells[level_index], self.cell_sizes[level_index]
+        x0, y0, x1, y1 = view
+        first, end = np.searchsorted(cells[:, 0], [math.floor(x0 / cell), math.ceil(x1 / cell)])
+        cells = cells[first:end]
+        cells = cells[(cells[:, 1] >= math.floor(y0 / cell)) & (cells[:, 1] <= math.ceil(y1 / cell))]
+        xs = ((cells[:, 0] + 0.5) * (cell * zoom) + offset[0]).astype(np.int32)
+        ys = ((cells[:, 1] + 0.5) * (cell * zoom) + offset[1]).astype(np.int32)
+        inside = (xs >= 0) & (xs < surface.get_width()) & (ys >= 0) & (ys < surface.get_height())
+        xs, ys = xs[inside], ys[inside]
+        pixels = pygame.surfarray.pixels3d(surface)
+        try:
+            pixels[xs, ys] = self.color
+            for step in range(1, self.width):
+                # Thicker lines: repeat the pixels to the right and below
+                pixels[np.minimum(xs + step, surface.get_width() - 1), ys] = self.color
+                pixels[xs, np.minimum(ys + step, surface.get_height() - 1)] = self.color
+        finally:
+            del pixels  # Unlocks the surface
+        self.last_drawn_points = len(xs)
+        return self.last_drawn_points
+
+    def stats(self) -> dict:
+        return {'name': self.name, 'points': self.point_count,
+                'levels': [len(level) for level in self.levels]}
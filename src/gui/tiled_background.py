@@ -0,0 +1,253 @@
+from typing import Dict, List, Tuple, Optional, Sequence
+from collections import OrderedDict
+import json
+import math
+import os
+import numpy as np
+import pygame
+
+
+class TiledBackground:
+    """
+    Background image stored on disk as a memory-mapped tile pyramid.
+
+    Level 0 holds the full-resolution image and every further level halves it,
+    until one tile covers the whole image. Each level is a .npy file laid out
+    as (rows, cols, tile, tile, 3) so one tile is one contiguous block, and only
+    the tiles the viewport needs are paged in. Decoded tiles are kept in a
+    bounded LRU cache of pygame surfaces.
+    """
+
+    def __init__(self, cache_dir: str, max_tiles: int = 64) -> None:
+        with open(os.path.join(cache_dir, "meta.json")) as f:
+            meta = json.load(f)
+        self.cache_dir = cache_dir
+        self.width = meta['width']
+        self.height = meta['height']
+        self.tile_size = meta['tile_size']
+        self.level_sizes = [tuple(size) for size in meta['levels']]  # (width, height)
+        self.levels = [
+            np.load(os.path.join(cache_dir, f"level_{level}.npy"), mmap_mode='r')
+            for level in range(len(self.level_sizes))
+        ]
+        self.max_tiles = max_tiles
+        self.tile_cache = OrderedDict()  # (level, col, row) -> pygame.Surface
+
+    @classmethod
+    def open(cls, image_path: str, cache_dir: Optional[str] = None,
+             tile_size: int = 512, max_tiles: int = 64,
+             source: Optional[np.ndarray] = None) -> 'TiledBackground':
+        """Open the tile pyramid for image_path, converting the image first if needed"""
+        cache_dir = cache_dir or tile_cache_dir(image_path)
+        if not pyramid_is_current(image_path, cache_dir, tile_size):
+            if source is None:
+                source = load_image_array(image_path)
+            build_pyramid(source, cache_dir, tile_size, image_path)
+        return cls(cache_dir, max_tiles=max_tiles)
+
+    def get_tile(self, level: int, col: int, row: int) -> pygame.Surface:
+        """Return one tile as a surface, cropped to the image edge"""
+        key = (level, col, row)
+        surface = self.tile_cache.get(key)
+        if surface is not None:
+            self.tile_cache.move_to_end(key)
+            return surface
+
+        level_width, level_height = self.level_sizes[level]
+        w = min(self.tile_size, level_width - col * self.tile_size)
+        h = min(self.tile_size, level_height - row * self.tile_size)
+        pixels = np.ascontiguousarray(self.levels[level][row, col, :h, :w])
+        surface = pygame.image.frombuffer(pixels.tobytes(), (w, h), 'RGB')
+
+        self.tile_cache[key] = surface
+        if len(self.tile_cache) > self.max_tiles:
+            self.tile_cache.popitem(last=False)
+        return surface
+
+    def choose_level(self, screen_pixels_per_image_pixel: float) -> int:
+        """Coarsest level that still has at least one texel per screen pixel"""
+        if screen_pixels_per_image_pixel <= 0:
+            return len(self.levels) - 1
+        level = int(math.floor(math.log2(1.0 / screen_pixels_per_image_pixel)))
+        return max(0, min(level, len(self.levels) - 1))
+
+    def draw(self, surface: pygame.Surface, world_size: Tuple[float, float],
+             zoom: float, offset: Sequence[float]) -> None:
+        """
+        Draw the visible part of the image onto surface. The image covers the
+        world rect (0, 0, *world_size), shown at zoom and offset like TrackCanvas.
+        """
+        view_width, view_height = surface.get_size()
+        scale_x = world_size[0] * zoom / self.width  # Screen pixels per image pixel
+        scale_y = world_size[1] * zoom / self.height
+        level = self.choose_level(min(scale_x, scale_y))
+        factor = 2 ** level
+        level_width, level_height = self.level_sizes[level]
+
+        # Visible image rect in level pixels
+        left = max(0.0, -offset[0] / scale_x / factor)
+        top = max(0.0, -offset[1] / scale_y / factor)
+        right = min(level_width, (view_width - offset[0]) / scale_x / factor)
+        bottom = min(level_height, (view_height - offset[1]) / scale_y / factor)
+        if right <= left or bottom <= top:
+            return
+
+        t = self.tile_size
+        for row in range(int(top // t), int(math.ceil(bottom / t))):
+            for col in range(int(left // t), int(math.ceil(right / t))):
+                tile = self.get_tile(level, col, row)
+                # Round both edges so neighbouring tiles meet without seams
+                x0 = int(math.floor(offset[0] + col * t * factor * scale_x))
+                y0 = int(math.floor(offset[1] + row * t * factor * scale_y))
+                x1 = int(math.floor(offset[0] + (col * t + tile.get_width()) * factor * scale_x))
+                y1 = int(math.floor(offset[1] + (row * t + tile.get_height()) * factor * scale_y))
+                if x1 <= x0 or y1 <= y0:
+                    continue
+                surface.blit(pygame.transform.scale(tile, (x1 - x0, y1 - y0)), (x0, y0))
+
+    def preview(self, size: Tuple[int, int]) -> pygame.Surface:
+        """Whole image scaled to size, read from the smallest level that is large enough"""
+        level = self.choose_level(min(size[0] / self.width, size[1] / self.height))
+        level_width, level_height = self.level_sizes[level]
+        pixels = read_level(self.levels[level], level_width, level_height)
+        image = pygame.image.frombuffer(pixels.tobytes(), (level_width, level_height), 'RGB')
+        return pygame.transform.scale(image, size)
+
+
+def draw_scaled_image(surface: pygame.Surface, image: pygame.Surface, world_size: Tuple[float, float],
+                      zoom: float, offset: Sequence[float]) -> None:
+    """
+    TiledBackground.draw for an image held in memory: only the part of the
+    image that lands on surface is scaled, so the cost follows the surface
+    size rather than the zoom.
+    """
+    view_width, view_height = surface.get_size()
+    scale_x = world_size[0] * zoom / image.get_width()  # Screen pixels per image pixel
+    scale_y = world_size[1] * zoom / image.get_height()
+
+    # Visible image rect, widened to whole image pixels
+    left = max(0, int(math.floor(-offset[0] / scale_x)))
+    top = max(0, int(math.floor(-offset[1] / scale_y)))
+    right = min(image.get_width(), int(math.ceil((view_width - offset[0]) / scale_x)))
+    bottom = min(image.get_height(), int(math.ceil((view_height - offset[1]) / scale_y)))
+    if right <= left or bottom <= top:
+        return
+
+    # Edges rounded the same way wherever the view starts, so export tiles meet without seams
+    x0 = int(math.floor(offset[0] + left * scale_x))
+    y0 = int(math.floor(offset[1] + top * scale_y))
+    x1 = int(math.floor(offset[0] + right * scale_x))
+    y1 = int(math.floor(offset[1] + bottom * scale_y))
+    if x1 <= x0 or y1 <= y0:
+        return
+    region = image.subsurface((left, top, right - left, bottom - top))
+    surface.blit(pygame.transform.scale(region, (x1 - x0, y1 - y0)), (x0, y0))
+
+
+def tile_cache_dir(image_path: str) -> str:
+    return image_path + ".tiles"
+
+
+def pyramid_is_current(image_path: str, cache_dir: str, tile_size: int) -> bool:
+    """True if cache_dir holds a pyramid built from the current version of image_path"""
+    meta_path = os.path.join(cache_dir, "meta.json")
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path) as f:
+        meta = json.load(f)
+    stat = os.stat(image_path)
+    return (meta.get('tile_size') == tile_size and
+            meta.get('source_size') == stat.st_size and
+            meta.get('source_mtime') == stat.st_mtime)
+
+
+def load_image_array(image_path: str) -> np.ndarray:
+    """Load an image as an (H, W, 3) uint8 array; .npy files are memory-mapped"""
+    if image_path.endswith('.npy'):
+        return np.load(image_path, mmap_mode='r')
+    return surface_array(pygame.image.load(image_path))
+
+
+def surface_array(surface: pygame.Surface) -> np.ndarray:
+    """(H, W, 3) uint8 pixels of a surface, a view where the pixel format allows one"""
+    try:
+        # Reference the surface pixels directly instead of copying them
+        return pygame.surfarray.pixels3d(surface).transpose(1, 0, 2)
+    except ValueError:
+        # Palette and other 8/16-bit surfaces can't be referenced as RGB
+        return pygame.surfarray.array3d(surface).transpose(1, 0, 2)
+
+
+def read_level(level: np.ndarray, width: int, height: int) -> np.ndarray:
+    """Reassemble a tiled level into a contiguous (H, W, 3) array"""
+    rows, cols, t = level.shape[0], level.shape[1], level.shape[2]
+    full = np.asarray(level).transpose(0, 2, 1, 3, 4).reshape(rows * t, cols * t, 3)
+    return np.ascontiguousarray(full[:height, :width])
+
+
+def build_pyramid(source: np.ndarray, cache_dir: str, tile_size: int = 512,
+                  image_path: Optional[str] = None) -> None:
+    """
+    Write source (an (H, W, 3) array, possibly memory-mapped) as a tile pyramid.
+    Works one tile at a time so memory stays at a few tiles per level.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    t = tile_size
+    height, width = source.shape[:2]
+    sizes = []
+
+    previous = None
+    level = 0
+    level_width, level_height = width, height
+    while True:
+        rows, cols = math.ceil(level_height / t), math.ceil(level_width / t)
+        tiles = np.lib.format.open_memmap(
+            os.path.join(cache_dir, f"level_{level}.npy"), mode='w+',
+            dtype=np.uint8, shape=(rows, cols, t, t, 3)
+        )
+        for row in range(rows):
+            for col in range(cols):
+                if previous is None:
+                    block = source[row * t:(row + 1) * t, col * t:(col + 1) * t, :3]
+                else:
+                    block = downsample_block(previous, sizes[-1], row, col, t)
+                tiles[row, col, :block.shape[0], :block.shape[1]] = block
+        tiles.flush()
+        sizes.append((level_width, level_height))
+
+        if max(level_width, level_height) <= t:
+            break
+        previous = tiles
+        level += 1
+        level_width, level_height = max(1, level_width // 2), max(1, level_height // 2)
+
+    meta = {
+        'width': width,
+        'height': height,
+        'tile_size': t,
+        'levels': sizes,
+    }
+    if image_path is not None and os.path.exists(image_path):
+        stat = os.stat(image_path)
+        meta['source_size'] = stat.st_size
+        meta['source_mtime'] = stat.st_mtime
+    with open(os.path.join(cache_dir, "meta.json"), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+def downsample_block(previous: np.ndarray, previous_size: Tuple[int, int],
+                     row: int, col: int, t: int) -> np.ndarray:
+    """2x2 box-filtered tile (row, col) of the next level, read from the tiles below it"""
+    prev_width, prev_height = previous_size
+    rows, cols = previous.shape[:2]
+    block = np.zeros((2 * t, 2 * t, 3), dtype=np.float32)
+    for dy in range(2):
+        for dx in range(2):
+            r, c = 2 * row + dy, 2 * col + dx
+            if r < rows and c < cols:
+                block[dy * t:(dy + 1) * t, dx * t:(dx + 1) * t] = previous[r, c]
+    # Only full 2x2 groups of valid source pixels make it into the next level
+    h = min(2 * t, prev_height - 2 * row * t) // 2
+    w = min(2 * t, prev_width - 2 * col * t) // 2
+    block = block[:2 * h, :2 * w].reshape(h, 2, w, 2, 3).mean(axis=(1, 3))
+    return np.rint(block).astype(np.uint8)
@@ -1,8 +1,15 @@
-from typing import Optional, Tuple, List, Dict, Union, Any
+from typing import Optional, Tuple, List, Dict, Union, Any, Sequence
 import pygame
 from models.track_element import TrackElement
+from utils.geometry import PIXELS_PER_METER, TRACK_WIDTH, straight_element, curve_element, element_polyline
+from utils.spatial import SegmentIndex
+from src.gui.tiled_background import (TiledBackground, draw_scaled_image, pyramid_is_current, surface_array,
+                                      tile_cache_dir)
+from src.gui.telemetry_overlay import TelemetryOverlay
 import numpy as np
 import math
+from contextlib import nullcontext
+import threading
 
 class TrackCanvas:
     def __init__(self, screen: pygame.Surface, width: int, height: int) -> None:
@@ -14,6 +21,7 @@ class TrackCanvas:
         self.border_color = (200, 200, 200)
         self.track_elements = []
         self.undo_stack = []  # Stack for undo functionality
+        self.keep_undo = True  # Off for generator canvases, which never undo
         
         # Track drawing properties
         self.current_pos = (width // 2, height // 2)  # Start from center
@@ -22,8 +30,8 @@ class TrackCanvas:
         self.right_lane_color = (255, 255, 0)  # Yellow
         self.track_width = 1  # Center line width in pixels (reduced from 2)
         self.lane_width = 1  # Side lane width in pixels
-        self.track_total_width = 0.75  # Track width in meters (reduced from 1.5)
-        self.pixels_per_meter = 8  # Scale factor (reduced from 10)
+        self.track_total_width = TRACK_WIDTH  # Track width in meters (reduced from 1.5)
+        self.pixels_per_meter = PIXELS_PER_METER  # Scale factor (reduced from 10)
         self.lane_offset = (self.track_total_width / 2) * self.pixels_per_meter  # Distance from center to each lane
         self.current_direction = 270  # Start pointing upward (in degrees)
         self.waiting_for_start_point = False
@@ -33,6 +41,15 @@ class TrackCanvas:
         self.temp_angle_line = None
         self.background_image = None
         self.background_rect = None
+        self.tiled_background = None  # Tile pyramid for very large images
+        self.tiled_background_threshold = 4096  # Images wider/taller than this get tiled
+        self.tile_size = 512
+        self.max_background_tiles = 64  # Bound on decoded tiles kept in memory
+        self.background_loading = None  # Path being decoded by load_background_async
+        self.pending_background = None  # (path, result) handed over by the loader thread
+        self.telemetry = None  # TelemetryOverlay of a driven lap, drawn under the track
+        self.telemetry_loading = None  # Path being read by load_telemetry_async
+        self.pending_telemetry = None  # (path, overlay) handed over by the loader thread
         self.angle_input_active = False
         self.current_angle_str = ""
         self.font = pygame.font.SysFont('Arial', 16)
@@ -45,6 +62,8 @@ class TrackCanvas:
         self.zoom_speed = 0.1
         self.pan_start = None
         self.offset = [0, 0]  # [x, y] offset for panning
+        self.grid_surface = None  # Transparent grid layer, redrawn only when zoom/pan change it
+        self.grid_key = None
 
         # Add description text box
         self.description_font = pygame.font.SysFont('Arial', 14)
@@ -52,151 +71,259 @@ class TrackCanvas:
         self.description_active = False
         self.description_rect = pygame.Rect(10, self.height - 100, self.width - 20, 80)
 
+        # Redraw bookkeeping for the event-driven main loop
+        self.dirty = True
+        self.profiler = None  # Optional FrameProfiler timing each draw layer
+        self.hit_index = None  # Lazily built SegmentIndex over the centerline
+        self.hit_index_elements = None  # Element index of every indexed segment
+        self.revision = 0  # Bumped on every track edit, e.g. for autosave
+        self.journal = None  # Optional EditJournal recording every edit
+
     def add_straight_segment(self, length: float = 100) -> None:
         start_pos = self.current_pos
-        # Calculate end position based on current direction
-        rad = math.radians(self.current_direction)
 
         print(f"Starting straight at pos: {start_pos}, angle: {self.current_direction}")
-        dx = length * math.cos(rad)
-        dy = length * math.sin(rad)
-        end_pos = (start_pos[0] + dx, start_pos[1] + dy)
-        
-        new_element = {
-            'type': 'straight',
-            'start': start_pos,
-            'end': end_pos,
-        }
+        new_element, end_pos = straight_element(start_pos, self.current_direction, length)
         self.track_elements.append(new_element)
-        self.undo_stack.append(('add', new_element))
+        if self.keep_undo:
+            self.undo_stack.append(('add', new_element, (start_pos, self.current_direction)))
         self.current_pos = end_pos
+        self.track_changed()
+        self.record_edit('straight', length=length)
 
         print(f"End of straight at pos: {end_pos}, angle: {self.current_direction}")
 
     def add_curve_segment(self, direction: str = 'right', angle: float = 180, radius: float = 50) -> None:
-        start_pos = self.current_pos
-        start_angle = self.current_direction
-        start_rad = math.radians(start_angle)
-        
-        if direction == 'right':
-            # For right turns, center is 90° clockwise from direction
-            center = (
-                start_pos[0] + radius * math.sin(start_rad),  # x = x0 - r * cos(θ)
-                start_pos[1] + radius * math.cos(start_rad)   # y = y0 - r * sin(θ)
-            )
-            
-            # Right turns increase angle clockwise
-            start_angle_draw = start_rad
-            end_angle_draw = start_rad + math.radians(angle)
-            end_angle = (start_angle + angle) % 360
-            
-        else:  # left
-            # For left turns, center is 90° counter-clockwise from direction
-            center = (
-                start_pos[0] - radius * math.sin(start_rad),  # x = x0 + r * cos(θ)
-                start_pos[1] - radius * math.cos(start_rad)   # y = y0 + r * sin(θ)
-            )
-            
-            # Left turns decrease angle counter-clockwise
-            start_angle_draw = start_rad  # Start at current direction + 180°
-            end_angle_draw = start_angle_draw - math.radians(angle)  # Counter-clockwise
-            end_angle = (start_angle - angle) % 360
-        
-        # Calculate end position
-        end_rad = math.radians(end_angle)
-        if direction == 'right':
-            end_pos = (
-                center[0] + radius * math.sin(math.radians(angle - start_angle)),
-                center[1] - radius * math.cos(math.radians(angle - start_angle))
-            )
-        else:
-            end_pos = (
-                center[0] + radius * math.cos(math.radians(angle - (90 - start_angle))),
-                center[1] - radius * math.sin(math.radians(angle - (90 - start_angle)))
-            )
+        # Center, draw angles and end pose are computed in utils.geometry so the
+        # headless tools reproduce exactly what the canvas builds
+        new_element, end_pos, end_angle = curve_element(
+            self.current_pos, self.current_direction, direction, angle, radius
+        )
         
         print(f"Curve ends at pos: {end_pos}, angle: {end_angle}")
         
-        # Store the curve element
-        new_element = {
-            'type': 'curve',
-            'start': start_pos,
-            'center': center,
-            'radius': radius,
-            'start_angle': start_angle_draw,
-            'end_angle': end_angle_draw,
-            'direction': direction
-        }
-        
         # Update track state
         self.track_elements.append(new_element)
-        self.undo_stack.append(('add', new_element))
+        if self.keep_undo:
+            self.undo_stack.append(('add', new_element, (self.current_pos, self.current_direction)))
         self.current_pos = end_pos
         self.current_direction = end_angle
+        self.track_changed()
+        self.record_edit('curve', direction=direction, angle=angle, radius=radius)
+
+    def track_changed(self) -> None:
+        """Bookkeeping after track_elements changed"""
+        self.dirty = True
+        self.hit_index = None
+        self.revision += 1
+
+    def record_edit(self, op: str, **args) -> None:
+        if self.journal is not None:
+            self.journal.record(op, **args)
+
+    def set_pose(self, pos: Tuple[float, float], direction: float) -> None:
+        """Move the point and heading the next segment starts from"""
+        self.current_pos = (float(pos[0]), float(pos[1]))
+        self.current_direction = float(direction)
+        self.dirty = True
+        self.record_edit('pose', pos=list(self.current_pos), direction=self.current_direction)
 
     def undo(self) -> None:
         if self.undo_stack:
-            action, element = self.undo_stack.pop()
+            self.track_changed()
+            action, element, pose = self.undo_stack.pop()
             if action == 'add':
                 self.track_elements.pop()
-                # Reset position to previous element's end or center if no elements left
-                if self.track_elements:
-                    last_element = self.track_elements[-1]
-                    if last_element['type'] == 'straight':
-                        self.current_pos = last_element['end']
-                        dx = last_element['end'][0] - last_element['start'][0]
-                        dy = last_element['end'][1] - last_element['start'][1]
-                        self.current_direction = math.degrees(math.atan2(dy, dx))
-                    else:  # curve
-                        self.current_pos = last_element['end']
-                        self.current_direction = last_element['end_angle']
-                else:
-                    self.current_pos = (self.width // 2, self.height // 2)
-                    self.current_direction = 270
+                # Go back to where the removed element started (curves have no 'end' to read)
+                self.current_pos, self.current_direction = pose
+            self.record_edit('undo')
 
     def clear_track(self) -> None:
         self.track_elements = []
         self.undo_stack = []
         self.current_pos = (self.width // 2, self.height // 2)
         self.current_direction = 270
+        self.track_changed()
+        self.record_edit('clear')
+
+    def import_elements(self, elements: List[Dict[str, Any]], poses: List[List[float]]) -> None:
+        """
+        Replace the track with fitted elements. poses holds (x, y, heading)
+        at the start of every element plus the end pose, as
+        track_import.fit_track returns them; undo removes them one by one.
+        """
+        # JSON turns the point tuples into lists
+        self.track_elements = [{key: tuple(value) if isinstance(value, list) else value
+                                for key, value in element.items()} for element in elements]
+        self.undo_stack = []
+        if self.keep_undo:
+            self.undo_stack = [('add', element, ((pose[0], pose[1]), pose[2]))
+                               for element, pose in zip(self.track_elements, poses)]
+        self.current_pos = (float(poses[-1][0]), float(poses[-1][1]))
+        self.current_direction = float(poses[-1][2])
+        self.track_changed()
+        self.record_edit('import', elements=elements, poses=poses)
+
+    def import_track(self, path: str) -> bool:
+        """Fit straights and arcs to a GPX or NPY track and replace the track with them"""
+        # Imported lazily: the importer pulls in the headless export modules
+        from src.export.track_import import fit_track, read_track_points
+        settings = {'canvas_size': [self.width, self.height], 'pixels_per_meter': self.pixels_per_meter}
+        try:
+            result = fit_track(read_track_points(path, settings), settings)
+        except Exception as e:
+            print(f"Error importing track: {e}")
+            return False
+        self.import_elements(result['elements'], result['poses'])
+        fit = result['fit']
+        print(f"Imported {path}: {fit['straights']} straights, {fit['curves']} curves, "
+              f"fit error rms {fit['rms_error']:.2f} px, max {fit['max_error']:.2f} px")
+        return True
 
     def set_waiting_for_start(self, waiting: bool) -> None:
         self.waiting_for_start_point = waiting
         self.waiting_for_angle = False
         self.temp_start_pos = None
+        self.dirty = True
         if waiting:
             self.clear_track()
 
     def start_angle_selection(self) -> None:
         self.waiting_for_angle = True
         self.temp_start_pos = self.current_pos
+        self.dirty = True
 
     def load_background(self, image_path: str) -> bool:
         try:
-            # Load and scale the image to fit the canvas
-            original_image = pygame.image.load(image_path)
-            self.background_image = pygame.transform.scale(original_image, (self.width, self.height))
-            self.background_rect = self.background_image.get_rect()
-            self.background_image_path = image_path  # Store the path
+            self.background_loading = None  # Supersedes a pending asynchronous load
+            self.set_background(image_path, *self.read_background(image_path))
             return True
         except Exception as e:
             print(f"Error loading background image: {e}")
             return False
 
+    def read_background(self, image_path: str) -> Tuple[Optional[TiledBackground], pygame.Surface]:
+        """Decode (or tile) an image and build its canvas-sized copy; changes no canvas state"""
+        tiled_background = None
+        cache_dir = tile_cache_dir(image_path)
+        if image_path.endswith('.npy') or pyramid_is_current(image_path, cache_dir, self.tile_size):
+            tiled_background = TiledBackground.open(
+                image_path, cache_dir, self.tile_size, self.max_background_tiles)
+        else:
+            original_image = pygame.image.load(image_path)
+            if max(original_image.get_size()) > self.tiled_background_threshold:
+                # Convert once into a tile pyramid on disk, then drop the full image
+                source = surface_array(original_image)
+                tiled_background = TiledBackground.open(
+                    image_path, cache_dir, self.tile_size, self.max_background_tiles,
+                    source=source)
+                del source
+            else:
+                # Load and scale the image to fit the canvas
+                return None, pygame.transform.scale(original_image, (self.width, self.height))
+
+        # Canvas-sized copy for exports that blit background_image directly
+        return tiled_background, tiled_background.preview((self.width, self.height))
+
+    def set_background(self, image_path: str, tiled_background: Optional[TiledBackground],
+                       background_image: pygame.Surface) -> None:
+        self.tiled_background = tiled_background
+        self.background_image = background_image
+        self.background_rect = self.background_image.get_rect()
+        self.background_image_path = image_path  # Store the path
+        self.dirty = True
+
+    def load_background_async(self, image_path: str) -> None:
+        """
+        Decode the image on a worker thread. A placeholder is drawn until
+        update() installs the result, and a posted event wakes the main loop.
+        """
+        self.background_loading = image_path
+        self.dirty = True
+
+        def load() -> None:
+            try:
+                result = self.read_background(image_path)
+            except Exception as e:
+                print(f"Error loading background image: {e}")
+                result = None
+            self.pending_background = (image_path, result)
+            try:
+                pygame.event.post(pygame.event.Event(pygame.USEREVENT, {'background': image_path}))
+            except pygame.error:
+                pass  # No event queue (headless use); update() still picks it up
+
+        threading.Thread(target=load, name="background-loader", daemon=True).start()
+
+    def telemetry_origin(self) -> Tuple[float, float]:
+        """Where the first telemetry point goes: the track start, or the canvas center"""
+        if self.track_elements:
+            return tuple(self.track_elements[0]['start'])
+        return (self.width / 2, self.height / 2)
+
+    def read_telemetry(self, path: str) -> TelemetryOverlay:
+        """Load and decimate a log at the canvas scale; changes no canvas state"""
+        return TelemetryOverlay.from_file(path, self.pixels_per_meter, self.telemetry_origin())
+
+    def load_telemetry(self, path: str) -> bool:
+        try:
+            self.telemetry_loading = None  # Supersedes a pending asynchronous load
+            self.set_telemetry(self.read_telemetry(path))
+            return True
+        except Exception as e:
+            print(f"Error loading telemetry: {e}")
+            return False
+
+    def set_telemetry(self, overlay: Optional[TelemetryOverlay]) -> None:
+        self.telemetry = overlay
+        self.dirty = True
+        if overlay is not None:
+            print(f"Loaded telemetry {overlay.name}: {overlay.point_count} points, "
+                  f"levels {[len(level) for level in overlay.levels]}")
+
+    def load_telemetry_async(self, path: str) -> None:
+        """Read and decimate the log on a worker thread; update() installs it"""
+        self.telemetry_loading = path
+
+        def load() -> None:
+            try:
+                overlay = self.read_telemetry(path)
+            except Exception as e:
+                print(f"Error loading telemetry: {e}")
+                overlay = None
+            self.pending_telemetry = (path, overlay)
+            try:
+                pygame.event.post(pygame.event.Event(pygame.USEREVENT, {'telemetry': path}))
+            except pygame.error:
+                pass  # No event queue (headless use); update() still picks it up
+
+        threading.Thread(target=load, name="telemetry-loader", daemon=True).start()
+
     def set_angle_input(self, active: bool) -> None:
         self.angle_input_active = active
+        self.dirty = True
         if active:
             self.current_angle_str = str(int(self.current_direction))
         else:
             try:
                 if self.current_angle_str:
                     new_angle = float(self.current_angle_str)
-                    self.current_direction = new_angle
+                    self.set_pose(self.current_pos, new_angle)
             except ValueError:
                 pass
             self.current_angle_str = ""
 
+    def is_interacting(self) -> bool:
+        """True while the canvas needs continuous redraws (pan, angle selection, crosshair)"""
+        return (self.pan_start is not None or
+                self.waiting_for_angle or
+                self.waiting_for_start_point)
+
     def handle_event(self, event: pygame.event.Event) -> None:
+        # Plain mouse motion only changes the picture during an interaction
+        if event.type != pygame.MOUSEMOTION or self.is_interacting():
+            self.dirty = True
+
         # Handle zooming with mouse wheel
         if event.type == pygame.MOUSEWHEEL:
             if self.surface.get_rect().collidepoint(pygame.mouse.get_pos()):
@@ -228,13 +355,12 @@ class TrackCanvas:
             
             if self.surface.get_rect().collidepoint(screen_pos):
                 if self.waiting_for_start_point:
-                    self.current_pos = world_pos
-                    self.current_direction = self.start_direction
+                    self.set_pose(world_pos, self.start_direction)
                     self.waiting_for_start_point = False
                 elif self.waiting_for_angle:
                     dx = world_pos[0] - self.current_pos[0]
                     dy = world_pos[1] - self.current_pos[1]
-                    self.current_direction = math.degrees(math.atan2(dy, dx))
+                    self.set_pose(self.current_pos, math.degrees(math.atan2(dy, dx)))
                     self.waiting_for_angle = False
                     self.temp_start_pos = None
 
@@ -270,10 +396,30 @@ class TrackCanvas:
                 self.description += event.unicode
 
     def update(self) -> None:
-        pass
+        # Install a background decoded by load_background_async
+        pending = self.pending_background
+        if pending is not None:
+            self.pending_background = None
+            image_path, result = pending
+            if image_path == self.background_loading:
+                self.background_loading = None
+                if result is not None:
+                    self.set_background(image_path, *result)
+                self.dirty = True
+
+        # Install a log read by load_telemetry_async
+        pending = self.pending_telemetry
+        if pending is not None:
+            self.pending_telemetry = None
+            path, overlay = pending
+            if path == self.telemetry_loading:
+                self.telemetry_loading = None
+                if overlay is not None:
+                    self.set_telemetry(overlay)
 
     def draw_parallel_line(self, start: Tuple[float, float], end: Tuple[float, float], 
-                         offset: float, color: Tuple[int, int, int], width: int) -> None:
+                         offset: float, color: Tuple[int, int, int], width: int,
+                         surface: Optional[pygame.Surface] = None) -> None:
         """Draw a line parallel to the given line at specified offset"""
         dx = end[0] - start[0]
         dy = end[1] - start[1]
@@ -290,11 +436,13 @@ class TrackCanvas:
         end_parallel = (end[0] + offset_x, end[1] + offset_y)
         
         # Draw the parallel line
-        pygame.draw.line(self.surface, color, start_parallel, end_parallel, width)
+        pygame.draw.line(self.surface if surface is None else surface, color,
+                         start_parallel, end_parallel, width)
 
     def draw_parallel_arc(self, center: Tuple[float, float], radius: float, 
                          start_angle: float, end_angle: float, offset: float,
-                         color: Tuple[int, int, int], width: int, direction: str) -> None:
+                         color: Tuple[int, int, int], width: int, direction: str,
+                         surface: Optional[pygame.Surface] = None) -> None:
         """Draw an arc parallel to the given arc at specified offset"""
         # Adjust radius based on offset and direction
         if direction == 'right':
@@ -302,13 +450,14 @@ class TrackCanvas:
         else:
             new_radius = radius - offset if offset > 0 else radius + abs(offset)
         
+        # Floor rather than let Rect truncate, so negative corners (export tiles) land like positive ones
         rect = pygame.Rect(
-            center[0] - new_radius,
-            center[1] - new_radius,
+            math.floor(center[0] - new_radius),
+            math.floor(center[1] - new_radius),
             new_radius * 2,
             new_radius * 2
         )
-        pygame.draw.arc(self.surface, color, rect, start_angle, end_angle, width)
+        pygame.draw.arc(self.surface if surface is None else surface, color, rect, start_angle, end_angle, width)
 
     def draw_dotted_line(self, surface: pygame.Surface, color: Tuple[int, int, int],
                         start_pos: Tuple[float, float], end_pos: Tuple[float, float],
@@ -334,25 +483,67 @@ class TrackCanvas:
             
             pygame.draw.line(surface, color, (start_x, start_y), (end_x, end_y), width)
 
+    def profile_phase(self, name: str):
+        """Timing context for one draw layer, a no-op without a profiler"""
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.phase(f"canvas.{name}")
+
     def draw(self) -> None:
+        with self.profile_phase('background'):
+            self.draw_background()
+        with self.profile_phase('grid'):
+            self.draw_grid()
+        if self.telemetry is not None:
+            with self.profile_phase('telemetry'):
+                self.telemetry.draw(self.surface, self.zoom_level, self.offset)
+        with self.profile_phase('track'):
+            self.draw_track()
+        with self.profile_phase('overlays'):
+            self.draw_overlays()
+
+        # Draw surface to screen
+        self.screen.blit(self.surface, (0, 0))
+        self.dirty = False
+
+    def draw_background(self) -> None:
         # Draw background image if available, otherwise fill with white
-        if self.background_image:
-            scaled_image = pygame.transform.scale(
-                self.background_image,
-                (int(self.width * self.zoom_level), int(self.height * self.zoom_level))
-            )
-            self.surface.blit(scaled_image, self.offset)
+        if self.tiled_background is not None:
+            # Only the tiles in view are paged in, at the level matching the zoom
+            self.surface.fill((255, 255, 255))
+            self.tiled_background.draw(self.surface, (self.width, self.height),
+                                       self.zoom_level, self.offset)
+        elif self.background_image:
+            self.surface.fill((255, 255, 255))
+            draw_scaled_image(self.surface, self.background_image, (self.width, self.height),
+                              self.zoom_level, self.offset)
+        elif self.background_loading:
+            # Placeholder while load_background_async decodes the image
+            self.surface.fill((235, 235, 235))
+            text = self.font.render("Loading background...", True, (120, 120, 120))
+            self.surface.blit(text, text.get_rect(center=(self.width // 2, self.height // 2)))
         else:
             self.surface.fill((255, 255, 255))
         
+    def draw_grid(self) -> None:
         # Draw grid with zoom
         grid_size = 50 * self.zoom_level
         grid_color = (230, 230, 230, 128)
-        grid_surface = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
         
         # Calculate grid lines with offset
         start_x = self.offset[0] % grid_size
         start_y = self.offset[1] % grid_size
+
+        # Reuse the layer: same spacing and phase give the same lines
+        key = (int(grid_size), int(start_x - grid_size), int(start_y - grid_size))
+        if self.grid_surface is None:
+            self.grid_surface = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
+        grid_surface = self.grid_surface
+        if key == self.grid_key:
+            self.surface.blit(grid_surface, (0, 0))
+            return
+        self.grid_key = key
+        grid_surface.fill((0, 0, 0, 0))
         
         for x in range(int(start_x - grid_size), self.width, int(grid_size)):
             pygame.draw.line(grid_surface, grid_color, (x, 0), (x, self.height))
@@ -362,33 +553,47 @@ class TrackCanvas:
         
         self.surface.blit(grid_surface, (0, 0))
 
-        # Draw track elements with parallel lanes
-        for element in self.track_elements:
+    def draw_track(self, surface: Optional[pygame.Surface] = None, zoom: Optional[float] = None,
+                   offset: Optional[Sequence[float]] = None,
+                   elements: Optional[List[Dict[str, Any]]] = None) -> None:
+        """
+        Draw track elements with parallel lanes. Defaults to the canvas view;
+        exports pass their own surface, zoom, offset and element snapshot.
+        """
+        surface = self.surface if surface is None else surface
+        zoom = self.zoom_level if zoom is None else zoom
+        offset = self.offset if offset is None else offset
+        elements = self.track_elements if elements is None else elements
+
+        def to_screen(pos: Tuple[float, float]) -> Tuple[float, float]:
+            return (pos[0] * zoom + offset[0], pos[1] * zoom + offset[1])
+
+        for element in elements:
             if element['type'] == 'straight':
-                start = self.world_to_screen(element['start'])
-                end = self.world_to_screen(element['end'])
+                start = to_screen(element['start'])
+                end = to_screen(element['end'])
                 
                 # Draw center dotted line
-                self.draw_dotted_line(self.surface, self.track_color,
+                self.draw_dotted_line(surface, self.track_color,
                                     start, end,
-                                    max(1, int(self.track_width * self.zoom_level)),
-                                    dash_length=max(3, int(5 * self.zoom_level)))
+                                    max(1, int(self.track_width * zoom)),
+                                    dash_length=max(3, int(5 * zoom)))
                 
                 # Draw parallel lanes
-                offset = self.lane_offset * self.zoom_level
-                self.draw_parallel_line(start, end, offset, self.right_lane_color,
-                                     max(1, int(self.lane_width * self.zoom_level)))
-                self.draw_parallel_line(start, end, -offset, self.left_lane_color,
-                                     max(1, int(self.lane_width * self.zoom_level)))
+                lane_offset = self.lane_offset * zoom
+                self.draw_parallel_line(start, end, lane_offset, self.right_lane_color,
+                                     max(1, int(self.lane_width * zoom)), surface)
+                self.draw_parallel_line(start, end, -lane_offset, self.left_lane_color,
+                                     max(1, int(self.lane_width * zoom)), surface)
                 
             elif element['type'] == 'curve':
-                center = self.world_to_screen(element['center'])
-                radius = element['radius'] * self.zoom_level
+                center = to_screen(element['center'])
+                radius = element['radius'] * zoom
                 
                 # Draw center dotted arc
                 rect = pygame.Rect(
-                    center[0] - radius,
-                    center[1] - radius,
+                    math.floor(center[0] - radius),
+                    math.floor(center[1] - radius),
                     radius * 2,
                     radius * 2
                 )
@@ -400,21 +605,22 @@ class TrackCanvas:
                 for i in range(0, len(angle_range)-1, 2):
                     a1 = angle_range[i]
                     a2 = min(angle_range[i+1], end_angle)
-                    pygame.draw.arc(self.surface, self.track_color,
+                    pygame.draw.arc(surface, self.track_color,
                                   rect, a1, a2,
-                                  max(1, int(self.track_width * self.zoom_level)))
+                                  max(1, int(self.track_width * zoom)))
                 
                 # Draw parallel lanes
-                offset = self.lane_offset * self.zoom_level
+                lane_offset = self.lane_offset * zoom
                 self.draw_parallel_arc(center, radius, start_angle, end_angle,
-                                    offset, self.right_lane_color,
-                                    max(1, int(self.lane_width * self.zoom_level)),
-                                    element['direction'])
+                                    lane_offset, self.right_lane_color,
+                                    max(1, int(self.lane_width * zoom)),
+                                    element['direction'], surface)
                 self.draw_parallel_arc(center, radius, start_angle, end_angle,
-                                    -offset, self.left_lane_color,
-                                    max(1, int(self.lane_width * self.zoom_level)),
-                                    element['direction'])
+                                    -lane_offset, self.left_lane_color,
+                                    max(1, int(self.lane_width * zoom)),
+                                    element['direction'], surface)
 
+    def draw_overlays(self) -> None:
         # Draw border
         pygame.draw.rect(self.surface, self.border_color, (0, 0, self.width, self.height), 2)
         
@@ -465,9 +671,6 @@ class TrackCanvas:
         
         self.surface.blit(text, (self.description_rect.x + 5, self.description_rect.y + 5))
 
-        # Draw surface to screen
-        self.screen.blit(self.surface, (0, 0))
-
     def get_track_points(self) -> Optional[np.ndarray]:
         if not self.track_elements:
             return None
@@ -508,6 +711,7 @@ class TrackCanvas:
         zoom_factor = self.zoom_level / old_zoom
         self.offset[0] = mouse_x - (mouse_x - self.offset[0]) * zoom_factor
         self.offset[1] = mouse_y - (mouse_y - self.offset[1]) * zoom_factor
+        self.dirty = True
 
     def world_to_screen(self, pos: Tuple[float, float]) -> Tuple[float, float]:
         """Convert world coordinates to screen coordinates"""
@@ -520,3 +724,55 @@ class TrackCanvas:
         x = (pos[0] - self.offset[0]) / self.zoom_level
         y = (pos[1] - self.offset[1]) / self.zoom_level
         return (x, y)
+
+    def world_to_screen_array(self, points: np.ndarray) -> np.ndarray:
+        """Vectorized world_to_screen for an (N, 2) array of points"""
+        points = np.asarray(points, dtype=np.float64)
+        return points * self.zoom_level + np.asarray(self.offset, dtype=np.float64)
+
+    def screen_to_world_array(self, points: np.ndarray) -> np.ndarray:
+        """Vectorized screen_to_world for an (N, 2) array of points"""
+        points = np.asarray(points, dtype=np.float64)
+        return (points - np.asarray(self.offset, dtype=np.float64)) / self.zoom_level
+
+    def get_hit_index(self) -> Optional[SegmentIndex]:
+        """Spatial index over the drawn centerline, rebuilt after the track changes"""
+        if not self.track_elements:
+            return None
+        if self.hit_index is None:
+            starts, ends, element_ids = [], [], []
+            for i, element in enumerate(self.track_elements):
+                points = element_polyline(element, max_step=2.0)
+                if len(points) < 2:
+                    continue
+                starts.append(points[:-1])
+                ends.append(points[1:])
+                element_ids.append(np.full(len(points) - 1, i))
+            if not starts:
+                return None
+            # Cover the whole canvas so cursor queries never leave the grid
+            self.hit_index = SegmentIndex(np.concatenate(starts), np.concatenate(ends),
+                                          margin=4 * self.lane_offset,
+                                          bounds=(0, 0, self.width, self.height))
+            self.hit_index_elements = np.concatenate(element_ids)
+        return self.hit_index
+
+    def nearest_on_track(self, world_points: np.ndarray) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Project world points onto the centerline. Returns the SegmentIndex.query
+        arrays plus 'element', the index into track_elements of each hit.
+        """
+        index = self.get_hit_index()
+        if index is None:
+            return None
+        result = index.query(world_points)
+        result['element'] = self.hit_index_elements[result['segment']]
+        return result
+
+    def element_at(self, screen_pos: Tuple[float, float], tolerance: float = 8) -> Optional[int]:
+        """Index of the track element under screen_pos, within tolerance screen pixels"""
+        world_pos = self.screen_to_world_array(np.array([screen_pos]))
+        result = self.nearest_on_track(world_pos)
+        if result is None or result['distance'][0] * self.zoom_level > tolerance:
+            return None
+        return int(result['element'][0])
@@ -0,0 +1,50 @@
+import math
+import numpy as np
+import pytest
+from src.data_generation.augmentation import TrackAugmenter, params_elements
+from utils.geometry import element_polyline
+
+BASE = {'segments': [
+    {'type': 'straight', 'length': 80},
+    {'type': 'curve', 'direction': 'right', 'angle': 90, 'radius': 50},
+    {'type': 'curve', 'direction': 'left', 'angle': 45, 'radius': 35},
+    {'type': 'straight', 'length': 60},
+]}
+
+
+def dense(elements, offset):
+    return np.concatenate([element_polyline(element, offset, max_step=0.5) for element in elements])
+
+
+def max_gap(a, b):
+    """Hausdorff distance between two point sets"""
+    distances = np.hypot(*(a[:, None] - b[None]).transpose(2, 0, 1))
+    return max(distances.min(axis=1).max(), distances.min(axis=0).max())
+
+
+def transform(points, augmentation, center):
+    """The rigid transform (plus uniform scale) a variant records, applied to points"""
+    points = points.copy()
+    if augmentation['mirror']:
+        points[:, 0] = 2 * center[0] - points[:, 0]
+    rad = math.radians(augmentation['rotation'])
+    rotation = np.array([[math.cos(rad), -math.sin(rad)], [math.sin(rad), math.cos(rad)]])
+    points = center + (points - center) @ rotation.T
+    points = center + (points - center) * augmentation['scale']
+    return points + np.asarray(augmentation['shift'])
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_variant_is_the_recorded_transform_of_its_base(seed):
+    augmenter = TrackAugmenter(seed=seed)
+    variant = augmenter.random_variant(BASE)
+    augmentation = variant['augmentation']
+    center = np.asarray(augmenter.center, dtype=float)
+    base = params_elements(BASE, augmenter.center, augmenter.default_direction)
+    elements = params_elements(variant, augmenter.center, augmenter.default_direction)
+
+    assert max_gap(transform(dense(base, 0.0), augmentation, center), dense(elements, 0.0)) < 0.5
+    # Lanes keep their pixel offset, and a mirror swaps the right and left lane
+    lane = -3.0 if augmentation['mirror'] else 3.0
+    assert max_gap(transform(dense(base, 3.0 / augmentation['scale']), augmentation, center),
+                   dense(elements, lane)) < 0.5
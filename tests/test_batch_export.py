@@ -0,0 +1,42 @@
+import json
+import os
+from src.export.batch_export import artifact_path, batch_export
+
+PARAMS = {'segments': [
+    {'type': 'straight', 'length': 80},
+    {'type': 'curve', 'direction': 'right', 'angle': 90, 'radius': 50},
+    {'type': 'straight', 'length': 60},
+]}
+
+
+def write_params(dataset_dir, params, mtime):
+    path = os.path.join(dataset_dir, "processed", "track_000.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(params, f)
+    os.utime(path, (mtime, mtime))
+
+
+def test_source_change_invalidates_artifacts_not_reexported(tmp_path):
+    dataset_dir = str(tmp_path)
+    output_dir = os.path.join(dataset_dir, "exports")
+    cones_path = artifact_path(output_dir, 'cones', "track_000")
+
+    write_params(dataset_dir, PARAMS, 1000)
+    assert batch_export(dataset_dir, artifacts=['points', 'cones'], jobs=1)['exported'] == 1
+    with open(cones_path) as f:
+        old_cones = f.read()
+
+    # The source changes but only the points are rebuilt
+    changed = json.loads(json.dumps(PARAMS))
+    changed['segments'][0]['length'] = 120
+    write_params(dataset_dir, changed, 2000)
+    assert batch_export(dataset_dir, artifacts=['points'], jobs=1)['exported'] == 1
+
+    summary = batch_export(dataset_dir, artifacts=['points', 'cones'], jobs=1)
+    assert summary['exported'] == 1 and summary['skipped'] == 0
+    with open(cones_path) as f:
+        assert f.read() != old_cones
+
+    # Now everything is current
+    assert batch_export(dataset_dir, artifacts=['points', 'cones'], jobs=1)['skipped'] == 1
@@ -0,0 +1,87 @@
+import json
+import os
+import pygame
+import pytest
+from src.export.edit_journal import SNAPSHOT_FILE, EditJournal, canvas_state
+from src.gui.track_canvas import TrackCanvas
+
+
+@pytest.fixture
+def new_canvas():
+    pygame.init()
+    yield lambda: TrackCanvas(pygame.Surface((1280, 1000)), 1280, 1000)
+    pygame.quit()
+
+
+def state(canvas):
+    """canvas_state as it reads back from JSON"""
+    return json.loads(json.dumps(canvas_state(canvas)))
+
+
+def crash(journal):
+    """Drop the journal without the snapshot close() would write"""
+    journal.journal_file.close()
+    journal.journal_file = None
+
+
+def test_torn_last_line_is_dropped(tmp_path, new_canvas):
+    directory = str(tmp_path)
+    journal = EditJournal(directory, sync=False)
+    canvas = new_canvas()
+    journal.open(canvas)
+    canvas.add_straight_segment(100)
+    canvas.add_curve_segment('left', 90, 50)
+    expected = state(canvas)
+    canvas.add_straight_segment(40)
+    crash(journal)
+
+    path = journal.journal_path(0)
+    with open(path, 'rb') as f:
+        lines = f.readlines()
+    with open(path, 'r+b') as f:
+        f.truncate(len(lines[0]) + len(lines[1]) + len(lines[2]) // 2)
+
+    journal = EditJournal(directory, sync=False)
+    canvas = new_canvas()
+    assert journal.open(canvas) == 2
+    assert state(canvas) == expected
+    assert os.path.getsize(path) == len(lines[0]) + len(lines[1])
+
+    # New edits follow the recovered ones on a line of their own
+    canvas.add_straight_segment(40)
+    expected = state(canvas)
+    crash(journal)
+    canvas = new_canvas()
+    assert EditJournal(directory, sync=False).open(canvas) == 3
+    assert state(canvas) == expected
+
+
+def test_replay_starts_at_the_last_snapshot(tmp_path, new_canvas):
+    directory = str(tmp_path)
+    journal = EditJournal(directory, snapshot_interval=3, sync=False)
+    canvas = new_canvas()
+    journal.open(canvas)
+    canvas.add_straight_segment(100)
+    canvas.add_curve_segment('right', 90, 60)
+    canvas.add_straight_segment(50)  # Third edit: compacted into generation 1
+    canvas.undo()
+    canvas.add_curve_segment('left', 45, 80)
+    expected = state(canvas)
+    crash(journal)
+
+    with open(os.path.join(directory, SNAPSHOT_FILE)) as f:
+        snapshot = json.load(f)
+    assert snapshot['generation'] == 1
+    assert len(snapshot['state']['elements']) == 3
+    assert sorted(name for name in os.listdir(directory) if name.startswith("journal_")) == ["journal_1.jsonl"]
+
+    canvas = new_canvas()
+    journal = EditJournal(directory, snapshot_interval=3, sync=False)
+    assert journal.open(canvas) == 2  # Only the undo and the last curve
+    assert state(canvas) == expected
+    assert len(canvas.undo_stack) == 3
+
+    # The restored undo stack still works
+    canvas.undo()
+    assert len(canvas.track_elements) == 2
+    journal.close()
@@ -0,0 +1,109 @@
+import os
+import numpy as np
+from src.data_generation.point_store import OFFSETS_FILE, POINTS_FILE, PointStore
+
+
+def make_store(directory, count=3):
+    with PointStore(directory, columns={'num_segments': 'int32'}) as store:
+        for i in range(count):
+            store.append(np.arange(2 * (i + 2), dtype=np.float32).reshape(-1, 2),
+                         name=f"track_{i}", num_segments=i)
+    return directory
+
+
+def check_intact(store, count=3):
+    assert len(store) == count
+    assert store.names == [f"track_{i}" for i in range(count)]
+    assert store.column('num_segments').tolist() == list(range(count))
+    for i in range(count):
+        assert store[i].tolist() == np.arange(2 * (i + 2)).reshape(-1, 2).tolist()
+
+
+def test_round_trip(tmp_path):
+    store = PointStore(make_store(str(tmp_path)))
+    check_intact(store)
+    points, offsets = store.gather([2, 0])
+    assert offsets.tolist() == [0, 4, 6]
+    assert points[4:].tolist() == store[0].tolist()
+
+
+def file_sizes(directory):
+    return {name: os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)}
+
+
+def test_reading_ignores_torn_points_without_writing(tmp_path):
+    directory = make_store(str(tmp_path))
+    # Points and names of an append that never committed its offset
+    with open(os.path.join(directory, POINTS_FILE), 'ab') as f:
+        np.ones((5, 2), dtype=np.float32).tofile(f)
+    with open(os.path.join(directory, "names.txt"), 'a') as f:
+        f.write("track_3\n")
+    sizes = file_sizes(directory)
+    store = PointStore(directory)
+    check_intact(store)
+    assert store.points.shape == (2 + 3 + 4, 2)
+    assert file_sizes(directory) == sizes
+
+    # The first append cuts the torn tail off
+    store.append(np.zeros((2, 2)), name="track_3", num_segments=3)
+    store.close()
+    assert os.path.getsize(os.path.join(directory, POINTS_FILE)) == (2 + 3 + 4 + 2) * 2 * 4
+    reopened = PointStore(directory)
+    assert reopened.names[-1] == "track_3"
+    assert reopened[3].tolist() == [[0, 0], [0, 0]]
+
+
+def test_reading_ignores_torn_offset(tmp_path):
+    directory = make_store(str(tmp_path))
+    with open(os.path.join(directory, OFFSETS_FILE), 'ab') as f:
+        f.write(b"\x01\x02\x03")
+    check_intact(PointStore(directory))
+    assert os.path.getsize(os.path.join(directory, OFFSETS_FILE)) == 3 * 8 + 3
+
+    with PointStore(directory) as store:
+        store.append(np.zeros((2, 2)), name="track_3", num_segments=3)
+    assert os.path.getsize(os.path.join(directory, OFFSETS_FILE)) == 4 * 8
+
+
+def test_recover_drops_offsets_past_the_points(tmp_path):
+    directory = make_store(str(tmp_path))
+    with open(os.path.join(directory, OFFSETS_FILE), 'ab') as f:
+        np.asarray([1000], dtype=np.int64).tofile(f)
+    store = PointStore(directory)
+    check_intact(store)
+
+    # The store stays appendable after recovery
+    store.append(np.zeros((2, 2)), name="track_3", num_segments=3)
+    store.close()
+    reopened = PointStore(directory)
+    assert len(reopened) == 4
+    assert reopened.names[-1] == "track_3"
+    assert reopened[3].tolist() == [[0, 0], [0, 0]]
+
+
+def test_read_during_a_half_written_append(tmp_path):
+    directory = make_store(str(tmp_path))
+    writer = PointStore(directory)
+    writer.append(np.full((3, 2), 7), name="track_3", num_segments=3)
+
+    # Everything of the next append but its offset has reached the disk
+    files = writer.write_files
+    np.full((4, 2), 8, dtype=np.float32).tofile(files['points'])
+    np.asarray([4], dtype=np.int32).tofile(files['column_num_segments'])
+    files['names'].write("track_4\n")
+    for f in files.values():
+        f.flush()
+
+    reader = PointStore(directory)
+    assert len(reader) == 4
+    assert reader.names[-1] == "track_3"
+    assert reader.column('num_segments').tolist() == [0, 1, 2, 3]
+    assert reader[3].tolist() == np.full((3, 2), 7).tolist()
+
+    # The writer commits the append; a reader opened afterwards sees it whole
+    np.asarray([int(writer.offsets[-1]) + 4], dtype=np.int64).tofile(files['offsets'])
+    writer.close()
+    reader = PointStore(directory)
+    assert len(reader) == 5
+    assert reader.names[-1] == "track_4"
+    assert reader[4].tolist() == np.full((4, 2), 8).tolist()
@@ -0,0 +1,47 @@
+import threading
+import pytest
+from src.data_generation.service import GenerationService, ServiceClient
+
+
+def test_every_worker_is_warm_and_requests_are_seeded():
+    with GenerationService(port=0, workers=2) as service:
+        client = ServiceClient(service.url)
+        metrics = client.metrics()
+        assert metrics['warm_workers'] == 2
+        assert metrics['units'] == 0  # Warmed up before any request
+
+        first = client.generate(5, seed=4)
+        second = client.generate(5, seed=4)
+        assert len(first['tracks']) == 5
+        assert [track['params'] for track in first['tracks']] == \
+            [track['params'] for track in second['tracks']]
+
+
+def test_concurrent_requests_share_work_units():
+    # A long batch window so the requests below land in the same units
+    with GenerationService(port=0, workers=1, batch_window=0.5) as service:
+        client = ServiceClient(service.url)
+        replies = []
+        threads = [threading.Thread(target=lambda seed=seed: replies.append(client.generate(2, seed=seed)))
+                   for seed in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(replies) == 6 and all(len(reply['tracks']) == 2 for reply in replies)
+
+        metrics = client.metrics()
+        assert metrics['requests'] == 6 and metrics['samples'] == 12
+        assert metrics['mean_unit_requests'] > 1
+
+
+def test_bad_input_is_rejected_with_400():
+    bodies = [{'count': 0}, {'count': 2, 'colour': 'red'}, {'seed': -1},
+              {'ranges': {'num_segments': [5, 2]}}]
+    with GenerationService(port=0, workers=1) as service:
+        client = ServiceClient(service.url)
+        for body in bodies:
+            with pytest.raises(RuntimeError, match=r"\(400\)"):
+                client.request("POST", "/generate", body)
+        metrics = client.metrics()
+        assert metrics['rejected'] == len(bodies) and metrics['requests'] == 0
@@ -0,0 +1,59 @@
+import json
+import os
+from src.data_generation.shards import MANIFEST_FILE, check_shards, merge_shards
+from src.data_generation.point_store import PointStore
+from src.data_generation.track_generator import TrackDataGenerator
+
+SEED = 11
+SAMPLES = 6
+
+
+def make_shards(tmp_path, shard_count=2):
+    shard_dirs = []
+    for index in range(shard_count):
+        shard_dir = str(tmp_path / f"shard_{index}")
+        TrackDataGenerator(shard_dir, seed=SEED, shard_index=index,
+                           shard_count=shard_count).generate_shard(SAMPLES)
+        shard_dirs.append(shard_dir)
+    return shard_dirs
+
+
+def test_merge_combines_shards(tmp_path):
+    shard_dirs = make_shards(tmp_path)
+    output_dir = str(tmp_path / "merged")
+    report = merge_shards(shard_dirs, output_dir)
+    assert report['errors'] == []
+    assert report['merged'] == SAMPLES
+    assert report['indexed'] == SAMPLES
+
+    # Sample-number order, whatever the sharding
+    store = PointStore(os.path.join(output_dir, "points"))
+    assert store.names == [f"track_{SEED}_{n:08d}" for n in range(SAMPLES)]
+    assert len(os.listdir(os.path.join(output_dir, "processed"))) == SAMPLES
+
+
+def test_merge_matches_unsharded(tmp_path):
+    output_dir = str(tmp_path / "merged")
+    merge_shards(make_shards(tmp_path, 3), output_dir)
+    single = str(tmp_path / "single")
+    TrackDataGenerator(single, seed=SEED).generate_shard(SAMPLES)
+    for name in sorted(os.listdir(os.path.join(single, "processed"))):
+        with open(os.path.join(single, "processed", name)) as f, \
+                open(os.path.join(output_dir, "processed", name)) as g:
+            assert json.load(f)['segments'] == json.load(g)['segments']
+
+
+def test_check_rejects_missing_and_repeated_shards(tmp_path):
+    shard_dirs = make_shards(tmp_path)
+    assert check_shards(shard_dirs[:1])['errors']
+    assert check_shards(shard_dirs[:1], allow_partial=True)['errors'] == []
+    assert check_shards([shard_dirs[0], shard_dirs[0]])['errors']
+
+
+def test_check_rejects_changed_files(tmp_path):
+    shard_dirs = make_shards(tmp_path)
+    with open(os.path.join(shard_dirs[1], MANIFEST_FILE)) as f:
+        sample_id, entry = next(iter(json.load(f)['samples'].items()))
+    os.remove(os.path.join(shard_dirs[1], entry['files']['description']))
+    assert check_shards(shard_dirs)['errors']
+    assert merge_shards(shard_dirs, str(tmp_path / "merged"))['merged'] == 0
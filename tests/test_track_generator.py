@@ -0,0 +1,59 @@
+import os
+import pytest
+from src.data_generation.point_store import PointStore
+from src.data_generation.track_generator import TrackDataGenerator
+from src.data_generation.track_index import INDEX_FILE, TrackIndex
+
+SAMPLES = 12
+
+
+def sample_ids(output_dir, directory):
+    return sorted(os.path.splitext(name)[0] for name in os.listdir(os.path.join(output_dir, directory)))
+
+
+def check_output(output_dir, count):
+    """Every sample has its own image, params, description, index row and point row"""
+    ids = sample_ids(output_dir, "processed")
+    assert len(ids) == count
+    assert sample_ids(output_dir, "raw_tracks") == ids
+    assert sample_ids(output_dir, "descriptions") == ids
+
+    index = TrackIndex(os.path.join(output_dir, INDEX_FILE))
+    assert len(index) == count
+    index.close()
+    store = PointStore(os.path.join(output_dir, "points"))
+    assert sorted(store.names) == ids
+    assert all(len(points) > 1 for points in store)
+
+
+def test_constructor_creates_output_dirs(tmp_path):
+    generator = TrackDataGenerator(str(tmp_path / "data"))
+    for directory in (generator.raw_tracks_dir, generator.processed_dir, generator.descriptions_dir):
+        assert os.path.isdir(directory)
+
+
+def test_unseeded_ids_are_unique(tmp_path):
+    generator = TrackDataGenerator(str(tmp_path))
+    keys = [generator.unseeded_track_params()['timestamp'] for _ in range(50)]
+    assert len(set(keys)) == len(keys)
+
+
+@pytest.mark.parametrize("method", ["generate_dataset", "generate_dataset_parallel",
+                                    "generate_dataset_async"])
+def test_generate_writes_every_sample(tmp_path, method):
+    output_dir = str(tmp_path / "data")
+    getattr(TrackDataGenerator(output_dir), method)(SAMPLES)
+    check_output(output_dir, SAMPLES)
+
+
+def test_variants_count_towards_samples(tmp_path):
+    output_dir = str(tmp_path / "data")
+    TrackDataGenerator(output_dir).generate_dataset(SAMPLES, variants_per_track=2)
+    check_output(output_dir, SAMPLES)
+
+
+def test_seeded_samples_are_reproducible(tmp_path):
+    first = TrackDataGenerator(str(tmp_path / "a"), seed=3)
+    second = TrackDataGenerator(str(tmp_path / "b"), seed=3)
+    for number in range(10):
+        assert first.seeded_track_params(number) == second.seeded_track_params(number)
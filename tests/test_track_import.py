@@ -0,0 +1,72 @@
+import math
+import numpy as np
+import pytest
+from src.export.track_import import DEFAULT_SETTINGS, fit_track
+from utils.geometry import curve_element, element_polyline
+
+
+def straight_arc_straight(turn, first=100.0, radius=60.0, angle=90.0, last=80.0, spacing=0.5):
+    """Dense polyline heading +x (y down): a straight, a turn on screen, a straight"""
+    sign = 1 if turn == 'right' else -1  # Right turns on screen are clockwise: heading grows
+    start = np.array([0.0, 0.0])
+    entry = start + [first, 0.0]
+    center = entry + [0.0, sign * radius]
+    sweep = math.radians(angle)
+    arc = [center + radius * np.array([math.sin(t), -sign * math.cos(t)])
+           for t in np.linspace(0, sweep, int(radius * sweep / spacing) + 1)]
+    heading = sign * sweep
+    exit_point = arc[-1] + last * np.array([math.cos(heading), math.sin(heading)])
+    lines = [np.linspace(start, entry, int(first / spacing) + 1), np.array(arc),
+             np.linspace(arc[-1], exit_point, int(last / spacing) + 1)]
+    return np.concatenate([lines[0], lines[1][1:], lines[2][1:]])
+
+
+def check_primitives(result, turn, length, radius, angle):
+    """Pixel and degree tolerances on the fitted primitives"""
+    kinds = [primitive['type'] for primitive in result['primitives']]
+    assert kinds == ['straight', 'curve', 'straight']
+    first, curve, last = result['primitives']
+    assert first['length'] == pytest.approx(100, abs=length)
+    assert last['length'] == pytest.approx(80, abs=length)
+    assert curve['radius'] == pytest.approx(60, abs=radius)
+    assert curve['angle'] == pytest.approx(90, abs=angle)
+    assert curve['direction'] == turn
+
+
+@pytest.mark.parametrize("turn", ['right', 'left'])
+def test_straight_arc_straight_round_trip(turn):
+    result = fit_track(straight_arc_straight(turn))
+    check_primitives(result, turn, length=0.5, radius=0.1, angle=0.5)
+    assert result['fit']['max_error'] < 0.1
+    headings = [(pose[2] + 180) % 360 - 180 for pose in result['poses']]
+    exit_heading = 90 if turn == 'right' else -90
+    assert headings == pytest.approx([0, 0, exit_heading, exit_heading], abs=0.5)
+
+
+@pytest.mark.parametrize("turn", ['right', 'left'])
+@pytest.mark.parametrize("seed", range(3))
+def test_round_trip_with_noise(turn, seed):
+    points = straight_arc_straight(turn, spacing=2.0)
+    points = points + np.random.default_rng(seed).normal(0, 0.15, points.shape)
+    result = fit_track(points)
+    # Near a tangent join a line and the arc differ by less than the noise,
+    # so the boundaries (and with them lengths and angle) move a few pixels
+    check_primitives(result, turn, length=8.0, radius=1.5, angle=10.0)
+    assert result['fit']['max_error'] < DEFAULT_SETTINGS['tolerance']
+
+
+def test_direction_conventions():
+    # The summary names the turn like curve_element does...
+    element, _, _ = curve_element((0.0, 0.0), 0, 'right', 90, 60)
+    points = element_polyline(element, max_step=0.5)[::-1]  # Drawn end to start
+    result = fit_track(points)
+    assert [primitive['direction'] for primitive in result['primitives']] == ['right']
+
+    # ...while the element names the lane side: positive offsets are on the
+    # same side of travel as on straights, outside a right turn
+    result = fit_track(straight_arc_straight('right'))
+    straight, arc, _ = result['elements']
+    assert arc['direction'] == 'left'
+    lane = element_polyline(straight, offset=5.0)
+    arc_lane = element_polyline(arc, offset=5.0)
+    assert min(np.hypot(*(arc_lane - lane[-1]).T)) == pytest.approx(0, abs=0.5)
@@ -0,0 +1,39 @@
+import math
+import sqlite3
+from src.data_generation.track_index import TrackIndex
+from utils.geometry import PIXELS_PER_METER
+
+PARAMS = {'segments': [
+    {'type': 'straight', 'length': 80},
+    {'type': 'curve', 'direction': 'right', 'angle': 90, 'radius': 40},
+]}
+
+
+def test_lengths_are_indexed_in_meters(tmp_path):
+    index = TrackIndex(str(tmp_path / "index.sqlite"))
+    index.add("track_0", PARAMS)
+    index.flush()
+    record = index.get("track_0")
+    curve = 40 * math.pi / 2
+    assert record['straight_length'] == 80 / PIXELS_PER_METER
+    assert math.isclose(record['total_length'], (80 + curve) / PIXELS_PER_METER)
+    assert record['min_radius'] == record['max_radius'] == 40 / PIXELS_PER_METER
+    assert index.query(["total_length > 15"]) == ["track_0"]
+    assert index.query(["total_length > 100"]) == []
+
+
+def test_pixel_index_is_flagged_and_reset(tmp_path):
+    path = str(tmp_path / "index.sqlite")
+    index = TrackIndex(path)
+    index.add("track_0", PARAMS)
+    index.close()
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA user_version = 0")
+    connection.close()
+
+    index = TrackIndex(path)
+    assert index.outdated
+    index.reset()
+    assert len(index) == 0 and not index.outdated
+    index.close()
+    assert not TrackIndex(path).outdated
@@ -1,2 +1,5 @@
 # This makes the utils directory a Python package
-from .calculations import calculate_curve_radius, calculate_track_length, check_track_rules
+from .calculations import calculate_curve_radius, calculate_track_length, check_track_rules, segment_metrics
+from .geometry import (straight_element, curve_element, build_track_elements, element_polyline,
+                       resample_polyline, track_polyline, track_cones, element_bounds, track_bounds)
+from .spatial import SegmentIndex
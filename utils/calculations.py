@@ -15,3 +15,28 @@ def check_track_rules(track):
     To be implemented with specific competition rules
     """
     pass
+
+def segment_metrics(segments):
+    """
+    Summary numbers for generator-style segment params. Lengths are in the
+    units of the params (straight length, curve radius times angle).
+    """
+    straights = [s for s in segments if s['type'] == 'straight']
+    curves = [s for s in segments if s['type'] != 'straight']
+    straight_length = sum(s['length'] for s in straights)
+    curve_length = sum(s['radius'] * math.radians(s['angle']) for s in curves)
+    radii = [s['radius'] for s in curves]
+    return {
+        'num_segments': len(segments),
+        'num_straights': len(straights),
+        'num_curves': len(curves),
+        'num_left_turns': sum(1 for s in curves if s['direction'] == 'left'),
+        'num_right_turns': sum(1 for s in curves if s['direction'] == 'right'),
+        'straight_length': straight_length,
+        'curve_length': curve_length,
+        'total_length': straight_length + curve_length,
+        'min_radius': min(radii) if radii else None,
+        'max_radius': max(radii) if radii else None,
+        # Net heading change in degrees, right turns positive
+        'net_turn': sum(s['angle'] if s['direction'] == 'right' else -s['angle'] for s in curves),
+    }
@@ -0,0 +1,186 @@
+import math
+from typing import Dict, List, Tuple, Any
+
+import numpy as np
+
+# Pure track geometry shared by the GUI canvas and the headless tools.
+# Elements are the same dicts TrackCanvas stores in track_elements.
+
+Point = Tuple[float, float]
+
+# Track scale shared by the editor canvas and the headless tools
+TRACK_WIDTH = 0.75  # Meters between the lane boundaries
+PIXELS_PER_METER = 8
+LANE_OFFSET = TRACK_WIDTH / 2 * PIXELS_PER_METER  # Pixels from centerline to each lane boundary
+
+
+def straight_element(start_pos: Point, direction: float, length: float) -> Tuple[Dict[str, Any], Point]:
+    """Build a straight element starting at start_pos heading direction (degrees)"""
+    rad = math.radians(direction)
+    end_pos = (start_pos[0] + length * math.cos(rad), start_pos[1] + length * math.sin(rad))
+    element = {
+        'type': 'straight',
+        'start': start_pos,
+        'end': end_pos,
+    }
+    return element, end_pos
+
+
+def curve_element(start_pos: Point, direction: float, turn: str = 'right',
+                  angle: float = 180, radius: float = 50) -> Tuple[Dict[str, Any], Point, float]:
+    """Build a curve element, returning (element, end_pos, end_direction)"""
+    start_rad = math.radians(direction)
+
+    if turn == 'right':
+        center = (
+            start_pos[0] + radius * math.sin(start_rad),
+            start_pos[1] + radius * math.cos(start_rad)
+        )
+        start_angle_draw = start_rad
+        end_angle_draw = start_rad + math.radians(angle)
+        end_direction = (direction + angle) % 360
+        end_pos = (
+            center[0] + radius * math.sin(math.radians(angle - direction)),
+            center[1] - radius * math.cos(math.radians(angle - direction))
+        )
+    else:  # left
+        center = (
+            start_pos[0] - radius * math.sin(start_rad),
+            start_pos[1] - radius * math.cos(start_rad)
+        )
+        start_angle_draw = start_rad
+        end_angle_draw = start_angle_draw - math.radians(angle)
+        end_direction = (direction - angle) % 360
+        end_pos = (
+            center[0] + radius * math.cos(math.radians(angle - (90 - direction))),
+            center[1] - radius * math.sin(math.radians(angle - (90 - direction)))
+        )
+
+    element = {
+        'type': 'curve',
+        'start': start_pos,
+        'center': center,
+        'radius': radius,
+        'start_angle': start_angle_draw,
+        'end_angle': end_angle_draw,
+        'direction': turn
+    }
+    return element, end_pos, end_direction
+
+
+def build_track_elements(segments: List[Dict[str, Any]], start_pos: Point,
+                         start_direction: float) -> List[Dict[str, Any]]:
+    """Turn generator-style segment params into track elements"""
+    elements = []
+    pos = start_pos
+    direction = start_direction
+    for segment in segments:
+        if segment['type'] == 'straight':
+            element, pos = straight_element(pos, direction, segment['length'])
+        else:  # curve
+            element, pos, direction = curve_element(
+                pos, direction, segment['direction'], segment['angle'], segment['radius']
+            )
+        elements.append(element)
+    return elements
+
+
+def arc_span(element: Dict[str, Any]) -> Tuple[float, float]:
+    """Start/stop angle of a curve as pygame.draw.arc sweeps it (stop wrapped past start)"""
+    start = element['start_angle']
+    stop = element['end_angle']
+    if stop < start:
+        stop += 2 * math.pi
+    return start, stop
+
+
+def element_polyline(element: Dict[str, Any], offset: float = 0.0,
+                     max_step: float = 1.0) -> np.ndarray:
+    """
+    Sample an element as drawn on the canvas, shifted sideways by offset.
+    Positive offsets give the right lane, negative ones the left lane, and
+    arcs follow pygame.draw.arc conventions so the result matches TrackCanvas.draw.
+    """
+    if element['type'] == 'straight':
+        start = np.asarray(element['start'], dtype=np.float64)
+        end = np.asarray(element['end'], dtype=np.float64)
+        delta = end - start
+        length = math.hypot(delta[0], delta[1])
+        if length == 0:
+            return start[None, :]
+        normal = np.array([-delta[1], delta[0]]) / length
+        return np.stack([start + normal * offset, end + normal * offset])
+
+    if element['direction'] == 'right':
+        radius = element['radius'] + offset
+    else:
+        radius = element['radius'] - offset
+    start, stop = arc_span(element)
+    num_points = max(2, int(math.ceil(abs(radius) * (stop - start) / max_step)) + 1)
+    angles = np.linspace(start, stop, num_points)
+    center = element['center']
+    return np.stack([center[0] + radius * np.cos(angles),
+                     center[1] - radius * np.sin(angles)], axis=1)
+
+
+def resample_polyline(points: np.ndarray, spacing: float) -> np.ndarray:
+    """Points spaced spacing apart along a polyline, including its first point"""
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) < 2:
+        return points.copy()
+    steps = np.hypot(*np.diff(points, axis=0).T)
+    distance = np.concatenate([[0.0], np.cumsum(steps)])
+    targets = np.arange(0.0, distance[-1] + 1e-9, spacing)
+    return np.stack([np.interp(targets, distance, points[:, 0]),
+                     np.interp(targets, distance, points[:, 1])], axis=1)
+
+
+def track_polyline(elements: List[Dict[str, Any]], offset: float = 0.0,
+                   max_step: float = 1.0) -> np.ndarray:
+    """All elements' polylines (see element_polyline) joined end to end"""
+    parts = [element_polyline(element, offset, max_step) for element in elements]
+    if not parts:
+        return np.zeros((0, 2))
+    return np.concatenate(parts)
+
+
+def track_cones(elements: List[Dict[str, Any]], lane_offset: float,
+                spacing: float) -> Dict[str, np.ndarray]:
+    """
+    Cone positions every spacing pixels along each lane boundary: 'left'
+    (blue in the editor) and 'right' (yellow).
+    """
+    cones = {'left': [], 'right': []}
+    for element in elements:
+        cones['right'].append(resample_polyline(element_polyline(element, lane_offset), spacing))
+        cones['left'].append(resample_polyline(element_polyline(element, -lane_offset), spacing))
+    return {side: np.concatenate(points) if points else np.zeros((0, 2))
+            for side, points in cones.items()}
+
+
+def element_bounds(element: Dict[str, Any]) -> Tuple[float, float, float, float]:
+    """
+    Exact (min_x, min_y, max_x, max_y) of an element as drawn: straights by
+    their end points, arcs by their end points plus every axis extreme
+    (multiples of 90 degrees) inside the swept span.
+    """
+    if element['type'] == 'straight':
+        (x0, y0), (x1, y1) = element['start'], element['end']
+        return min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)
+
+    start, stop = arc_span(element)
+    quarter = math.pi / 2
+    angles = [start, stop] + [k * quarter for k in range(math.ceil(start / quarter),
+                                                         math.floor(stop / quarter) + 1)]
+    cx, cy = element['center']
+    radius = element['radius']
+    xs = [cx + radius * math.cos(angle) for angle in angles]
+    ys = [cy - radius * math.sin(angle) for angle in angles]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def track_bounds(elements: List[Dict[str, Any]]) -> Tuple[float, float, float, float]:
+    """Union of element_bounds over a track"""
+    boxes = np.array([element_bounds(element) for element in elements])
+    return (float(boxes[:, 0].min()), float(boxes[:, 1].min()),
+            float(boxes[:, 2].max()), float(boxes[:, 3].max()))
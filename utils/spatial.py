@@ -0,0 +1,207 @@
+import math
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Nearest-segment queries over a polyline, vectorized over the query points.
+
+
+class SegmentIndex:
+    """
+    Uniform-grid index answering "which segment is nearest" for many points.
+
+    For every grid cell the index keeps the segments that can be nearest to
+    some point inside the cell: if the closest segment to the cell center is D
+    away and the cell's half diagonal is h, only segments within D + 2h of the
+    center qualify. Queries then test just those candidates. Points outside the
+    grid use temporary cells that grow with their distance from it.
+    """
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray,
+                 cell_size: Optional[float] = None, margin: float = 0.0,
+                 bounds: Optional[Tuple[float, float, float, float]] = None) -> None:
+        self.starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+        self.ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+        if len(self.starts) == 0:
+            raise ValueError("SegmentIndex needs at least one segment")
+        self.lengths = np.hypot(*(self.ends - self.starts).T)
+        # Arc length at the start of every segment, for projections onto the polyline
+        self.offsets = np.concatenate([[0.0], np.cumsum(self.lengths)[:-1]])
+
+        # Grid extent: the segments plus margin, grown to cover bounds
+        # (min_x, min_y, max_x, max_y) where most queries are expected
+        points = np.concatenate([self.starts, self.ends])
+        low = points.min(axis=0) - margin
+        high = points.max(axis=0) + margin
+        if bounds is not None:
+            low = np.minimum(low, bounds[:2])
+            high = np.maximum(high, bounds[2:])
+        extent = np.maximum(high - low, 1e-9)
+        if cell_size is None:
+            # Roughly a few segments per cell, capped at 256 x 256 cells
+            cells = min(256 * 256, max(16, 8 * len(self.starts)))
+            cell_size = math.sqrt(extent[0] * extent[1] / cells) or float(extent.max())
+        self.cell_size = max(float(cell_size), float(extent.max()) / 256)
+        self.origin = low
+        self.shape = (int(math.ceil(extent[1] / self.cell_size)) or 1,
+                      int(math.ceil(extent[0] / self.cell_size)) or 1)  # (rows, cols)
+        self.build_cells()
+
+    def build_cells(self, coarse_factor: int = 8) -> None:
+        """
+        Fill the per-cell candidate lists. A coarse grid is built first against
+        all segments; every fine cell then only tests its coarse parent's
+        candidates, which always include the segments nearest to the fine cell.
+        """
+        rows, cols = self.shape
+        cy, cx = np.mgrid[0:rows, 0:cols]
+        keys = np.stack([np.zeros(rows * cols, dtype=np.int64), cx.ravel(), cy.ravel()], axis=1)
+        self.cell_start, self.cell_segments = self.candidates_for_cells(
+            keys, self.cell_size, self.origin, coarse_factor)
+
+    def candidates_for_cells(self, keys: np.ndarray, base_size: float, origin: np.ndarray,
+                             coarse_factor: int = 8) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Candidate lists (CSR) for cells given as (level, col, row) keys, where a
+        level-l cell is base_size * 2**l wide and cells are aligned to origin.
+        """
+        sizes = base_size * 2.0 ** keys[:, 0]
+        centers = (keys[:, 1:] + 0.5) * sizes[:, None] + origin
+
+        # Coarse parents against every segment
+        parent_keys = np.stack([keys[:, 0], keys[:, 1] // coarse_factor, keys[:, 2] // coarse_factor], axis=1)
+        parent_keys, parent = np.unique(parent_keys, axis=0, return_inverse=True)
+        parent = parent.ravel()
+        parent_sizes = base_size * 2.0 ** parent_keys[:, 0] * coarse_factor
+        parent_centers = (parent_keys[:, 1:] + 0.5) * parent_sizes[:, None] + origin
+        n_segments = len(self.starts)
+        parent_start, parent_segments = self.cell_candidates(
+            parent_centers, parent_sizes, np.arange(len(parent_keys) + 1) * n_segments,
+            np.tile(np.arange(n_segments), len(parent_keys)))
+
+        # Cells inherit their parent's candidate range and filter it down
+        parent_counts = (parent_start[1:] - parent_start[:-1])[parent]
+        pair_start = np.concatenate([[0], np.cumsum(parent_counts)])
+        rank = np.arange(pair_start[-1]) - np.repeat(pair_start[:-1], parent_counts)
+        pairs = parent_segments[np.repeat(parent_start[parent], parent_counts) + rank]
+        return self.cell_candidates(centers, sizes, pair_start, pairs)
+
+    def cell_candidates(self, centers: np.ndarray, cell_size, pair_start: np.ndarray,
+                        pair_segment: np.ndarray, chunk: int = 2_000_000) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Filter (cell, segment) pairs, given in CSR form, down to the segments
+        within D + 2h of each cell center. Returns the filtered CSR arrays.
+        """
+        half_diagonal = np.broadcast_to(np.asarray(cell_size) * math.sqrt(2) / 2, (len(centers),))
+        counts = pair_start[1:] - pair_start[:-1]
+        kept_counts = np.zeros(len(centers), dtype=np.int64)
+        kept = []
+        first_cell = 0
+        while first_cell < len(centers):
+            # Take as many whole cells as fit in one chunk of pairs
+            last_cell = int(np.searchsorted(pair_start, pair_start[first_cell] + chunk, side='right')) - 1
+            last_cell = min(max(last_cell, first_cell + 1), len(centers))
+            lo, hi = pair_start[first_cell], pair_start[last_cell]
+            cell = np.repeat(np.arange(first_cell, last_cell), counts[first_cell:last_cell])
+            segment = pair_segment[lo:hi]
+            distance_sq, _ = segment_distance_sq(centers[cell], self.starts[segment], self.ends[segment])
+            distance = np.sqrt(distance_sq)
+            nearest = np.minimum.reduceat(distance, pair_start[first_cell:last_cell] - lo)
+            keep = distance <= nearest[cell - first_cell] + 2 * half_diagonal[cell]
+            kept.append(segment[keep])
+            kept_counts[first_cell:last_cell] = np.bincount(cell[keep] - first_cell,
+                                                            minlength=last_cell - first_cell)
+            first_cell = last_cell
+        return np.concatenate([[0], np.cumsum(kept_counts)]), np.concatenate(kept)
+
+    def query(self, points: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Nearest segment for each of the (N, 2) points. Returns arrays 'segment',
+        'distance', 'point' (closest point), 't' (0..1 along the segment) and
+        's' (arc length along the whole polyline).
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        segment = self.nearest_segments(points)
+        distance_sq, t = segment_distance_sq(points, self.starts[segment], self.ends[segment])
+        closest = self.starts[segment] + (self.ends[segment] - self.starts[segment]) * t[:, None]
+        return {
+            'segment': segment,
+            'distance': np.sqrt(distance_sq),
+            'point': closest,
+            't': t,
+            's': self.offsets[segment] + t * self.lengths[segment],
+        }
+
+    def nearest_segments(self, points: np.ndarray) -> np.ndarray:
+        rows, cols = self.shape
+        cell_xy = np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+        inside = ((cell_xy[:, 0] >= 0) & (cell_xy[:, 0] < cols) &
+                  (cell_xy[:, 1] >= 0) & (cell_xy[:, 1] < rows))
+        result = np.empty(len(points), dtype=np.int64)
+
+        query = np.flatnonzero(inside)
+        if len(query):
+            cell = cell_xy[query, 1] * cols + cell_xy[query, 0]
+            result[query] = self.nearest_candidates(points[query], cell,
+                                                    self.cell_start, self.cell_segments)
+        outside = np.flatnonzero(~inside)
+        if len(outside):
+            result[outside] = self.nearest_off_grid(points[outside])
+        return result
+
+    def nearest_off_grid(self, points: np.ndarray) -> np.ndarray:
+        """
+        Points outside the grid get temporary cells about 1/16 of their distance
+        to the grid wide, doubling in size level by level further out.
+        """
+        rows, cols = self.shape
+        high = self.origin + np.array([cols, rows]) * self.cell_size
+        gap = np.maximum(np.maximum(self.origin - points, points - high), 0).max(axis=1)
+        level = np.ceil(np.log2(np.maximum(gap, self.cell_size) / (16 * self.cell_size)))
+        level = np.maximum(level, 0).astype(np.int64)
+        size = self.cell_size * 2.0 ** level
+        keys = np.stack([level,
+                         np.floor((points[:, 0] - self.origin[0]) / size).astype(np.int64),
+                         np.floor((points[:, 1] - self.origin[1]) / size).astype(np.int64)], axis=1)
+        keys, cell = np.unique(keys, axis=0, return_inverse=True)
+        cell_start, cell_segments = self.candidates_for_cells(keys, self.cell_size, self.origin)
+        return self.nearest_candidates(points, cell.ravel(), cell_start, cell_segments)
+
+    def nearest_candidates(self, points: np.ndarray, cell: np.ndarray, cell_start: np.ndarray,
+                           cell_segments: np.ndarray, chunk: int = 2_000_000) -> np.ndarray:
+        """Best segment per point among its cell's candidates, in chunks of about chunk pairs"""
+        counts = cell_start[cell + 1] - cell_start[cell]
+        ends = np.cumsum(counts)
+        result = np.empty(len(points), dtype=np.int64)
+        first = 0
+        while first < len(points):
+            done = ends[first - 1] if first else 0
+            last = int(np.searchsorted(ends, done + chunk, side='right'))
+            last = min(max(last, first + 1), len(points))
+
+            block_counts = counts[first:last]
+            pair_query = np.repeat(np.arange(last - first), block_counts)
+            pair_first = np.cumsum(block_counts) - block_counts
+            pair_rank = np.arange(block_counts.sum()) - pair_first[pair_query]
+            pair_segment = cell_segments[cell_start[cell[first:last]][pair_query] + pair_rank]
+            distance_sq, _ = segment_distance_sq(points[first:last][pair_query],
+                                                 self.starts[pair_segment], self.ends[pair_segment])
+            best = np.minimum.reduceat(distance_sq, pair_first)
+            winners = np.flatnonzero(distance_sq == best[pair_query])
+            _, first_winner = np.unique(pair_query[winners], return_index=True)
+            result[first:last] = pair_segment[winners[first_winner]]
+            first = last
+        return result
+
+
+def segment_distance_sq(points: np.ndarray, starts: np.ndarray,
+                        ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Squared distance from points to segments (broadcasting) and the clamped projection t"""
+    px, py = points[..., 0], points[..., 1]
+    sx, sy = starts[..., 0], starts[..., 1]
+    dx, dy = ends[..., 0] - sx, ends[..., 1] - sy
+    rx, ry = px - sx, py - sy
+    length_sq = np.maximum(dx * dx + dy * dy, 1e-12)
+    t = np.clip((rx * dx + ry * dy) / length_sq, 0.0, 1.0)
+    ex, ey = rx - dx * t, ry - dy * t
+    return ex * ex + ey * ey, t